@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Benchmark of the reading of option values.
+
+Times the reads of options through the dictionary proxy of a job, with the
+decoded values cache and with the values decoded at each read, and the
+decoding alone. The value 'untyped' is stored without its type, as by earlier
+versions of wpipe, so that its type is guessed by literal_eval. Each read
+still queries the option row, so that a value changed by another process is
+seen: the cache only spares decoding again a stored string. Run with:
+
+    python scripts/bench_decoded_values.py [nreads]
+"""
+import os
+import sys
+import time
+import tempfile
+
+sys.argv[1:] = ['--sqlite'] + sys.argv[1:]  # the benchmark does not need a MySQL server
+
+import wpipe as wp  # noqa: E402
+from wpipe.proxies import BaseProxy  # noqa: E402
+from wpipe.proxies import core  # noqa: E402
+
+NREADS = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+OPTIONS = {'int': 42, 'float': 0.11, 'str': 'F158', 'untyped': 2.5e-3}
+
+
+def bench_reads(job, name):
+    start = time.perf_counter()
+    for _ in range(NREADS):
+        job.options[name]
+    return (time.perf_counter() - start) / NREADS
+
+
+def bench_decoding(job, name, decode):
+    row = job.option(name)._option
+    start = time.perf_counter()
+    for _ in range(NREADS):
+        decode(row)
+    return (time.perf_counter() - start) / NREADS
+
+
+if __name__ == '__main__':
+    _root = tempfile.mkdtemp()
+    os.chdir(_root)
+    wp.si.create_schema()
+    _job = wp.Pipeline(_root).dummy_job
+    _job.options = OPTIONS
+    _table = wp.si.Option.__table__
+    with wp.si.get_engine().begin() as _conn:
+        _conn.execute(wp.si.sa.update(_table).where(_table.c.name == 'untyped').values(value_type=None))
+    _cached = core.decoded_attribute
+    _uncached = BaseProxy.__new__.__globals__['decoded_attribute'] = \
+        lambda parent, attr_name: core.decode_value(getattr(parent, attr_name), parent.value_type)
+    print("%10s %22s %22s %22s %22s" % ('value', 'read uncached (us)', 'read cached (us)',
+                                        'decode uncached (us)', 'decode cached (us)'))
+    for _name in OPTIONS:
+        BaseProxy.__new__.__globals__['decoded_attribute'] = _uncached
+        _read_uncached = bench_reads(_job, _name)
+        BaseProxy.__new__.__globals__['decoded_attribute'] = _cached
+        _read_cached = bench_reads(_job, _name)
+        print("%10s %22.2f %22.2f %22.2f %22.2f" % (
+            _name, 1e6 * _read_uncached, 1e6 * _read_cached,
+            1e6 * bench_decoding(_job, _name, lambda row: _uncached(row, 'value')),
+            1e6 * bench_decoding(_job, _name, lambda row: _cached(row, 'value'))))
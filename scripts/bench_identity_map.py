@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+Benchmark of the wpipe object caches lookup time against their size.
+
+Compares the hash-indexed IdentityMap to the DataFrame-based cache it
+replaced, for caches of up to 100k entries. Run with:
+
+    python scripts/bench_identity_map.py
+"""
+import sys
+import time
+
+sys.argv.append('--sqlite')  # the benchmark does not need a MySQL server
+
+import pandas as pd  # noqa: E402
+from wpipe.core import IdentityMap  # noqa: E402
+
+SIZES = [1000, 10000, 100000]
+NLOOKUPS = 1000
+
+
+class Dummy:
+    pass
+
+
+def bench_identity_map(size):
+    cache = IdentityMap('option_id', ['optowner_id', 'name'], 'option')
+    objs = []
+    for i in range(size):
+        obj = Dummy()
+        objs.append(obj)
+        cache.add({'option_id': i, 'option': obj, 'optowner_id': i % 100, 'name': 'opt%d' % i})
+    start = time.perf_counter()
+    for i in range(0, size, size // NLOOKUPS):
+        cache.locate('keyid', i)
+        cache.locate('args', (i % 100, 'opt%d' % i))
+    return (time.perf_counter() - start) / NLOOKUPS
+
+
+def bench_dataframe(size):
+    cache = pd.DataFrame({'option_id': range(size),
+                          'option': [Dummy() for _ in range(size)],
+                          'optowner_id': [i % 100 for i in range(size)],
+                          'name': ['opt%d' % i for i in range(size)]})
+    start = time.perf_counter()
+    for i in range(0, size, size // NLOOKUPS):
+        cache.loc[cache['option_id'] == i, 'option'].iloc[0]
+        cache.loc[(cache['optowner_id'] == i % 100) & (cache['name'] == 'opt%d' % i), 'option'].iloc[0]
+    return (time.perf_counter() - start) / NLOOKUPS
+
+
+if __name__ == '__main__':
+    print("%10s %20s %20s" % ('entries', 'IdentityMap (us)', 'DataFrame (us)'))
+    for _size in SIZES:
+        print("%10d %20.2f %20.2f" % (_size, 1e6 * bench_identity_map(_size), 1e6 * bench_dataframe(_size)))
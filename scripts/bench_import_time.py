@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Benchmark of the wpipe importation time.
+
+Each run imports wpipe in a fresh interpreter and reports how long the import
+statement took and whether it connected to the database. Importing wpipe does
+not make the database engine nor construct DefaultUser and DefaultNode, so
+that short-lived task scripts do not pay for them unless they need them.
+By default it uses the in-memory sql database; set WPIPE_ENGINEURL to measure
+against a server, which does not need to be reachable. Run with:
+
+    python scripts/bench_import_time.py [nruns]
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+NRUNS = 10
+
+SNIPPET = """
+import sys, time, json
+start = time.perf_counter()
+import wpipe
+duration = time.perf_counter() - start
+print(json.dumps({'import': duration, 'connected': wpipe.si.core._ENGINE is not None}))
+"""
+
+
+def bench_import():
+    args = [sys.executable, '-c', SNIPPET]
+    if 'WPIPE_ENGINEURL' not in os.environ:
+        args.append('--sqlite')
+    output = subprocess.run(args, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    _nruns = int(sys.argv[1]) if len(sys.argv) > 1 else NRUNS
+    _results = [bench_import() for _ in range(_nruns)]
+    _durations = [_result['import'] for _result in _results]
+    print("%10s %20s %20s" % ('runs', 'median import (ms)', 'min import (ms)'))
+    print("%10d %20.1f %20.1f" % (_nruns, 1e3 * statistics.median(_durations), 1e3 * min(_durations)))
+    print("connected to the database at import: %s" % any(_result['connected'] for _result in _results))
@@ -38,5 +38,7 @@ setup(name='wpipe',
       package_dir={'': 'src'},
       install_requires=['numpy', 'pandas', 'tenacity', 'tables', 'sqlalchemy<2', 'pymysql',
                         'mysql-connector-python', 'mysqlclient', 'astropy', 'jinja2'],
-      scripts=['bin/wingspipe', 'bin/pbsconsumer.py', 'bin/slurmconsumer.py']
+      extras_require={'aio': ['greenlet', 'aiomysql', 'aiosqlite']},
+      scripts=['bin/wingspipe', 'bin/pbsconsumer.py', 'bin/slurmconsumer.py',
+               'bin/localconsumer.py']
       )
@@ -0,0 +1,52 @@
+"""
+Fixtures of the wpipe test suite
+
+The tests run against a SQLite database file made in a temporary directory,
+so that they need no database server.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = tempfile.mkdtemp(prefix='wpipe-tests-')
+
+os.environ['WPIPE_ENGINEURL'] = 'sqlite:///%s/wpipe.db' % ROOT
+os.environ.setdefault('WPIPE_USER', 'test')
+os.environ['WPIPE_NO_SCHEDULER'] = '1'
+# wpipe reads its pipeline and job from the command line arguments
+sys.argv = sys.argv[:1]
+os.chdir(ROOT)
+
+
+@pytest.fixture(scope='session')
+def wp():
+    from wpipe import sqlintf
+    sqlintf.create_schema()
+    import wpipe
+    return wpipe
+
+
+@pytest.fixture
+def pipeline(wp, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return wp.Pipeline(str(tmp_path))
+
+DATA = os.path.join(os.path.dirname(__file__), 'data')
+
+
+@pytest.fixture
+def task_pipeline(pipeline):
+    pipeline.attach_tasks(os.path.join(DATA, 'tasks'))
+    return pipeline
+
+
+@pytest.fixture
+def spawned(wp, monkeypatch):
+    # the tasks are recorded instead of running as processes
+    calls = []
+    monkeypatch.setattr(wp.Event, '_spawn',
+                        lambda self, task, my_pipe, stdouterr, memo_digest=None:
+                        calls.append((self, task, memo_digest)))
+    return calls
@@ -27,4 +27,4 @@ if __name__ == '__main__':
         for line in file:
             print(my_conf.parameters['suffix'] + line, end='')
     my_job.logprint("Edited file to add prefix to it")
-    my_job.child_event('add_proc').fire()  # , options={'submission_type': 'pbs'}).fire()
+    my_job.child_event('add_proc', options={'barrier_id': my_job.firing_event.options['barrier_id']}).fire()
@@ -18,5 +18,6 @@ if __name__ == '__main__':
         for line in file:
             print(line + " " + my_conf.parameters['proc_word'], end='')
     my_job.logprint("Edited file to make it proc")
-    my_conf.target.options["Configuration '" + my_conf.name + "' completed"] = True
     my_conf.target.options['Interactions'] += 1
+    if wp.Barrier(int(my_job.firing_event.options['barrier_id'])).arrive():
+        my_job.logprint("Last configuration of target "+my_conf.target.name+" completed")
@@ -16,12 +16,15 @@ if __name__ == '__main__':
         for my_dp in my_input.rawdataproducts:
             my_target = my_input.target(name=my_dp.filename)
             my_target.options['Interactions'] = 0
+            # fires target_completed once all configurations went through add_proc
+            my_barrier = my_job.barrier("target_id#"+str(my_target.target_id), len(my_target.configurations),
+                                        'target_completed')
             for my_conf in my_target.configurations:
-                my_target.options["Configuration '" + my_conf.name + "' completed"] = False
                 my_target.options['Interactions'] += 1
                 my_job.logprint("Starting target "+my_target.name+" config "+my_conf.name)
                 my_job.child_event('add_prefix', tag="config_id#"+str(my_conf.config_id),
                                    options={'config_id': my_conf.config_id,
+                                            'barrier_id': my_barrier.barrier_id,
                                             'submission_type': 'pbs',
                                             'job_time': 5}).fire()
                 # my_job.child_event('add_prefix', tag="config_id2_#" + str(my_conf.config_id),
@@ -0,0 +1,106 @@
+"""
+Tests of the asyncio interface, run with aiosqlite against the database file
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiosqlite')
+
+
+@pytest.fixture
+def aio(wp):
+    from wpipe import aio
+    return aio
+
+
+def _run(aio, coroutine):
+    async def run():
+        try:
+            return await coroutine
+        finally:
+            await aio.dispose_async_engine()
+    return asyncio.run(run())
+
+
+def _jobs(wp, task_pipeline, number):
+    task, = [task for task in task_pipeline.tasks if task.name == 'add_proc.py']
+    jobs = [task_pipeline.dummy_job.child_event('add_proc', tag=str(i))._generate_new_job(task)
+            for i in range(number)]
+    wp.si.flush_session()
+    wp.si.close_session()
+    return jobs
+
+
+def _stored(wp, table, column, row_id):
+    with wp.si.get_engine().connect() as conn:
+        return conn.execute(wp.si.sa.select(column).where(table.c.id == row_id)).scalar()
+
+
+async def _collect_ids(aio, pipeline, **filters):
+    return [job.job_id async for job in aio.Pipeline(pipeline).jobs_where(**filters)]
+
+
+def test_jobs_where_pages_by_id(wp, aio, task_pipeline):
+    from wpipe.Job import JOBINITSTATE
+    jobs = _jobs(wp, task_pipeline, 5)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('SELECT jobs.'):
+            statements.append(statement)
+
+    async def collect():
+        engine = aio.get_async_engine()
+        wp.si.sa.event.listen(engine.sync_engine, 'before_cursor_execute', record)
+        pipeline = aio.Pipeline(task_pipeline)
+        found = []
+        async for job in pipeline.jobs_where(state=JOBINITSTATE, task_name='add_proc.py', yield_per=2):
+            found.append(job.job_id)
+            # updating the jobs while iterating does not shift the pages
+            await job.set_state('Started')
+        return found
+
+    assert _run(aio, collect()) == [job.job_id for job in jobs]
+    assert len(statements) == 3
+    assert _run(aio, _collect_ids(aio, task_pipeline, state=JOBINITSTATE, task_name='add_proc.py')) == []
+    assert _run(aio, _collect_ids(aio, task_pipeline, state='Started')) == [job.job_id for job in jobs]
+
+
+def test_set_option_updates_or_inserts(wp, aio, pipeline):
+    job = pipeline.dummy_job
+    job.options = {'existing': 1}
+    option_id = job.option('existing').option_id
+    wp.si.flush_session()
+    wp.si.close_session()
+
+    async def update():
+        owner = aio.Job(job.job_id)
+        await owner.set_option('existing', 2)
+        await owner.set_option('added', 'value')
+        return await owner.options()
+
+    assert _run(aio, update()) == {'existing': 2, 'added': 'value'}
+    table = wp.si.Option.__table__
+    assert _stored(wp, table, table.c.value, option_id) == '2'
+    assert job.options['existing'] == 2 and job.options['added'] == 'value'
+    with wp.si.get_engine().connect() as conn:
+        assert conn.execute(wp.si.sa.select(wp.si.sa.func.count()).where(table.c.optowner_id == job.job_id).
+                            where(table.c.name == 'added')).scalar() == 1
+
+
+def test_set_state_updates_row_and_timestamp(wp, aio, task_pipeline):
+    job, = _jobs(wp, task_pipeline, 1)
+    optowners = wp.si.OptOwner.__table__
+    before = _stored(wp, optowners, optowners.c.timestamp, job.job_id)
+
+    async def update():
+        owner = aio.Job(job)
+        assert (await owner.refresh())['state'] == 'Initialized'
+        await owner.set_state('Running')
+        return owner.row['state'], await owner.state()
+
+    assert _run(aio, update()) == ('Running', 'Running')
+    jobs = wp.si.Job.__table__
+    assert _stored(wp, jobs, jobs.c.state, job.job_id) == 'Running'
+    assert _stored(wp, optowners, optowners.c.timestamp, job.job_id) > before
@@ -0,0 +1,62 @@
+"""
+Tests of the fan-in barriers
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+
+def _fired(spawned, barrier):
+    return [call for call in spawned if call[0] is barrier.event]
+
+
+def test_completing_arrival_fires_once(wp, task_pipeline, spawned):
+    barrier = task_pipeline.dummy_job.barrier('done', 3, 'add_proc')
+    assert barrier.event.tag == 'done'
+    assert [barrier.arrive(), barrier.arrive()] == [False, False]
+    assert not _fired(spawned, barrier)
+    assert barrier.arrive()
+    assert len(_fired(spawned, barrier)) == 1
+    assert not barrier.arrive()
+    assert len(_fired(spawned, barrier)) == 1
+    assert barrier.arrived == 4 and barrier.is_fired
+
+
+def test_missing_barrier_needs_expected_and_event(wp, task_pipeline):
+    with pytest.raises(ValueError):
+        task_pipeline.dummy_job.barrier('unknown')
+
+
+def test_concurrent_arrivals_fire_once(wp, task_pipeline, spawned):
+    barrier = task_pipeline.dummy_job.barrier('threads', 16, 'add_proc')
+    with ThreadPoolExecutor(8) as executor:
+        fired = list(executor.map(lambda _i: barrier.arrive(), range(16)))
+    assert fired.count(True) == 1
+    assert len(_fired(spawned, barrier)) == 1
+    assert barrier.arrived == 16
+
+
+def test_arrival_in_batch_fires_after_commit(wp, task_pipeline, spawned):
+    barrier = task_pipeline.dummy_job.barrier('batched', 1, 'add_proc')
+    with wp.batch():
+        assert barrier.arrive()
+        assert not _fired(spawned, barrier)
+    assert len(_fired(spawned, barrier)) == 1
+
+
+def test_arrival_rolled_back_does_not_fire(wp, task_pipeline, spawned):
+    barrier = task_pipeline.dummy_job.barrier('rolled_back', 1, 'add_proc')
+    with pytest.raises(RuntimeError):
+        with wp.batch():
+            assert barrier.arrive()
+            raise RuntimeError
+    assert not _fired(spawned, barrier)
+    assert barrier.arrived == 0 and not barrier.is_fired
+    with wp.batch():
+        with pytest.raises(RuntimeError):
+            with wp.batch():
+                assert barrier.arrive()
+                raise RuntimeError
+    assert not _fired(spawned, barrier)
+    assert barrier.arrive()
+    assert len(_fired(spawned, barrier)) == 1
@@ -0,0 +1,84 @@
+"""
+Tests of the units of work coalescing the commits of a batch of writes
+"""
+import pytest
+
+
+def _commits(wp):
+    commits = []
+    engine = wp.si.get_engine()
+
+    def record(conn):
+        commits.append(conn)
+
+    wp.si.sa.event.listen(engine, 'commit', record)
+    return commits, lambda: wp.si.sa.event.remove(engine, 'commit', record)
+
+
+def _stored(wp, option):
+    table = wp.si.Option.__table__
+    with wp.si.get_engine().connect() as conn:
+        return conn.execute(wp.si.sa.select(table.c.value).where(table.c.id == option.option_id)).scalar()
+
+
+def test_batch_commits_once(wp, pipeline):
+    job = pipeline.dummy_job
+    job.options = {'a': 0, 'b': 0}
+    wp.si.flush_session()
+    commits, stop = _commits(wp)
+    try:
+        with wp.batch():
+            for i in range(5):
+                job.options['a'] = i
+                job.options['b'] = 2 * i
+                job.state = 'step%d' % i
+            assert not commits
+            assert _stored(wp, job.option('a')) == '0'
+    finally:
+        stop()
+    assert len(commits) == 1
+    assert (_stored(wp, job.option('a')), _stored(wp, job.option('b'))) == ('4', '8')
+    assert job.state == 'step4'
+
+
+def test_batch_bumps_timestamps_once_per_row(wp, pipeline):
+    job = pipeline.dummy_job
+    updates = []
+    engine = wp.si.get_engine()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE optowners SET timestamp'):
+            updates.append(parameters)
+
+    wp.si.sa.event.listen(engine, 'before_cursor_execute', record)
+    try:
+        with wp.batch():
+            for i in range(5):
+                job.state = 'step%d' % i
+    finally:
+        wp.si.sa.event.remove(engine, 'before_cursor_execute', record)
+    assert len(updates) == 1
+    assert job.timestamp is not None
+
+
+def test_batch_rolls_back_on_exception(wp, pipeline):
+    job = pipeline.dummy_job
+    job.options = {'a': 0}
+    with pytest.raises(RuntimeError):
+        with wp.batch():
+            job.options['a'] = 1
+            raise RuntimeError
+    assert _stored(wp, job.option('a')) == '0' and job.options['a'] == 0
+
+
+def test_nested_batch_rolls_back_its_own_writes(wp, pipeline):
+    job = pipeline.dummy_job
+    job.options = {'outer': 0, 'inner': 0}
+    with wp.batch():
+        job.options['outer'] = 1
+        with pytest.raises(RuntimeError):
+            with wp.batch():
+                job.options['inner'] = 1
+                raise RuntimeError
+        assert job.options['inner'] == 0
+    assert (_stored(wp, job.option('outer')), _stored(wp, job.option('inner'))) == ('1', '0')
@@ -0,0 +1,49 @@
+"""
+Tests of the bulk registration of dataproducts
+"""
+import importlib
+
+
+def _records(number, group='proc'):
+    return [dict(filename='file%d.fits' % i, relativepath='.', group=group) for i in range(number)]
+
+
+def _lookups(wp):
+    statements = []
+    engine = wp.si.get_engine()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'dataproducts.filename IN' in statement:
+            statements.append(parameters)
+
+    wp.si.sa.event.listen(engine, 'before_cursor_execute', record)
+    return statements, lambda: wp.si.sa.event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_bulk_registers_missing_dataproducts_in_order(wp, pipeline):
+    existing = pipeline.dataproduct(filename='file1.fits', relativepath='.', group='proc')
+    dataproducts = pipeline.dataproducts_bulk(_records(3) + _records(1))
+    assert [dp.filename for dp in dataproducts] == ['file0.fits', 'file1.fits', 'file2.fits', 'file0.fits']
+    assert dataproducts[1] is existing and dataproducts[3] is dataproducts[0]
+    assert all(dp.group == 'proc' and dp.dpowner is pipeline for dp in dataproducts)
+    assert pipeline.dataproducts_bulk(_records(3)) == dataproducts[:3]
+    assert len([dp for dp in pipeline.dataproducts if dp.group == 'proc']) == 3
+
+
+def test_bulk_keeps_groups_apart(wp, pipeline):
+    proc, = pipeline.dataproducts_bulk(_records(1))
+    log, = pipeline.dataproducts_bulk(_records(1, group='log'))
+    assert proc is not log and (proc.group, log.group) == ('proc', 'log')
+
+
+def test_bulk_lookups_are_chunked(wp, pipeline, monkeypatch):
+    monkeypatch.setattr(importlib.import_module('wpipe.core'), 'IN_CHUNK_SIZE', 2)
+    pipeline.dataproducts_bulk(_records(2))
+    statements, stop = _lookups(wp)
+    try:
+        dataproducts = pipeline.dataproducts_bulk(_records(5))
+    finally:
+        stop()
+    assert [dp.filename for dp in dataproducts] == ['file%d.fits' % i for i in range(5)]
+    # dpowner id and at most 2 filenames bound per lookup
+    assert len(statements) >= 3 and max(len(parameters) for parameters in statements) <= 3
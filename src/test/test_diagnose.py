@@ -0,0 +1,71 @@
+"""
+Tests of the diagnosis of the pipelines
+"""
+import datetime
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def seeded(wp, task_pipeline):
+    # jobs of the task add_proc.py in each state, aged as given in minutes
+    from wpipe.Job import JOBINITSTATE, JOBSUBMSTATE, JOBCOMPSTATE, JOBEXPISTATE
+    task, = [task for task in task_pipeline.tasks if task.name == 'add_proc.py']
+    now = datetime.datetime.utcnow()
+    seeds = [('fresh', None), ('waiting', dict(state=JOBINITSTATE, timestamp=now - datetime.timedelta(hours=2))),
+             ('running', dict(state=JOBSUBMSTATE, starttime=now - datetime.timedelta(minutes=30))),
+             ('completed', dict(state=JOBCOMPSTATE, endtime=now - datetime.timedelta(minutes=10))),
+             ('old', dict(state=JOBCOMPSTATE, endtime=now - datetime.timedelta(days=2))),
+             ('failed1', dict(state='ValueError: boom')), ('failed2', dict(state='ValueError: boom')),
+             ('expired', dict(state=JOBEXPISTATE))]
+    jobs, optowners = wp.si.Job.__table__, wp.si.OptOwner.__table__
+    for tag, values in seeds:
+        job = task_pipeline.dummy_job.child_event('add_proc', tag=tag)._generate_new_job(task)
+        if values is None:
+            continue
+        with wp.si.get_engine().begin() as conn:
+            if 'timestamp' in values:
+                conn.execute(wp.si.sa.update(optowners).where(optowners.c.id == job.job_id).
+                             values(timestamp=values.pop('timestamp')))
+            conn.execute(wp.si.sa.update(jobs).where(jobs.c.id == job.job_id).values(**values))
+    return task_pipeline
+
+
+def _rows(diagnosis, report):
+    # leaving out the dummy job of the pipeline
+    frame = diagnosis[(diagnosis['report'] == report) & (diagnosis['task'] != '__init__.py')]
+    return sorted(tuple(None if value is None or value != value else value
+                        for value in row) for row in frame[['task', 'state', 'bin', 'count']].values.tolist())
+
+
+def test_diagnose_reports_each_state(wp, seeded):
+    diagnosis = seeded.diagnose(window=datetime.timedelta(hours=1), nbins=6)
+    assert _rows(diagnosis, 'states') == [('add_proc.py', 'Completed', None, 2),
+                                          ('add_proc.py', 'Expired', None, 1),
+                                          ('add_proc.py', 'Initialized', None, 2),
+                                          ('add_proc.py', 'Submitted', None, 1),
+                                          ('add_proc.py', 'ValueError: boom', None, 2)]
+    assert _rows(diagnosis, 'failures') == [(None, 'ValueError: boom', None, 2)]
+    # the new job is aged from its creation
+    assert _rows(diagnosis, 'queued') == [('add_proc.py', 'Initialized', '1h-6h', 1),
+                                          ('add_proc.py', 'Initialized', '<1m', 1)]
+    assert _rows(diagnosis, 'running') == [('add_proc.py', 'Submitted', '10m-1h', 1)]
+    throughput, = _rows(diagnosis, 'throughput')
+    assert throughput[0] == 'add_proc.py' and throughput[3] == 1
+    end_bin = datetime.datetime.strptime(throughput[2], '%Y-%m-%d %H:%M')
+    assert datetime.timedelta(minutes=10) <= datetime.datetime.utcnow() - end_bin <= datetime.timedelta(minutes=21)
+
+
+def test_diagnose_command_prints_reports(wp, seeded):
+    output = subprocess.run([sys.executable, '-c', 'import wpipe; wpipe.wingspipe()',
+                             'diagnose', '-p', seeded.pipe_root],
+                            cwd=seeded.pipe_root, env=dict(os.environ), capture_output=True, text=True,
+                            timeout=300, check=True).stdout
+    reports = [line[:-1] for line in output.splitlines() if line in ['%s:' % report for report in
+                                                                      ['states', 'failures', 'queued',
+                                                                       'running', 'throughput']]]
+    assert reports == ['states', 'failures', 'queued', 'running', 'throughput']
+    assert 'ValueError: boom' in output and '<1m' in output and '10m-1h' in output
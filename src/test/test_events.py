@@ -0,0 +1,135 @@
+"""
+Tests of the firing of events
+"""
+import importlib
+import os
+import sys
+
+
+def _count_statements(wp):
+    statements = []
+    engine = wp.si.get_engine()
+
+    def count(*args):
+        statements.append(args[2])
+
+    wp.si.sa.event.listen(engine, 'before_cursor_execute', count)
+    return statements, lambda: wp.si.sa.event.remove(engine, 'before_cursor_execute', count)
+
+
+def _events(job, prefix, number, **options):
+    return job.child_events_bulk([dict(name='add_prefix', tag='%s%d' % (prefix, i), options=dict(options, i=i))
+                                  for i in range(number)])
+
+
+def test_bulk_events_normalise_tags(wp, pipeline):
+    job = pipeline.dummy_job
+    events = job.child_events_bulk([dict(name='step', tag=3, options={'i': 0}),
+                                    dict(name='step', tag='3'), dict(name='step')])
+    assert [event.tag for event in events] == ['3', '3', '']
+    assert events[0] is events[1] and events[0].options['i'] == 0
+    assert job.child_events_bulk([dict(name='step', tag=3)]) == events[:1]
+
+
+def test_bulk_events_rerun_reuses_existing_events(wp, pipeline, monkeypatch):
+    monkeypatch.setattr(importlib.import_module('wpipe.core'), 'IN_CHUNK_SIZE', 2)
+    job = pipeline.dummy_job
+    existing = job.child_event('step', tag='0', options={'i': -1})
+    specs = [dict(name='step', tag=str(i), options={'i': i, 'j': 2 * i}) for i in range(5)]
+    events = job.child_events_bulk(specs)
+    assert events[0] is existing and [event.tag for event in events] == ['0', '1', '2', '3', '4']
+    # the options of existing events are kept, the missing ones added
+    assert (existing.options['i'], existing.options['j']) == (-1, 0)
+    assert job.child_events_bulk(specs) == events
+    assert len(job.child_events) == 5
+    assert [event.options['j'] for event in events] == [0, 2, 4, 6, 8]
+
+
+def test_fire_many_spawns_each_event(wp, task_pipeline, spawned):
+    events = _events(task_pipeline.dummy_job, 'e', 5)
+    wp.Event.fire_many(events)
+    assert [call[0] for call in spawned] == events
+    assert set(call[1].name for call in spawned) == {'add_prefix.py'}
+
+
+def test_fire_many_reads_state_once_per_batch(wp, task_pipeline, spawned):
+    job = task_pipeline.dummy_job
+    wp.Event.fire_many(_events(job, 'warm', 1))
+    counts = []
+    for prefix, number in [('few', 3), ('many', 30)]:
+        events = _events(job, prefix, number)
+        statements, stop = _count_statements(wp)
+        try:
+            wp.Event.fire_many(events)
+        finally:
+            stop()
+        counts.append(len([statement for statement in statements if statement.lstrip().upper().startswith('SELECT')]))
+    assert counts[0] == counts[1]
+
+
+def test_fire_many_sends_scheduler_events_together(wp, task_pipeline, spawned, monkeypatch):
+    monkeypatch.delenv('WPIPE_NO_SCHEDULER')
+    sent = []
+    module = sys.modules[wp.Event.__module__]
+    monkeypatch.setattr(module, 'get_consumer_factory', lambda: lambda action: None)
+    monkeypatch.setattr(module, 'get_send_job_factory', lambda: sent.append)
+    events = _events(task_pipeline.dummy_job, 's', 2, submission_type='scheduler') + \
+        _events(task_pipeline.dummy_job, 'l', 2)
+    wp.Event.fire_many(events)
+    assert len(sent) == 1 and len(sent[0]) == 2
+    assert [call[0] for call in spawned] == events[2:]
+
+
+def _task(pipeline, name, *masks):
+    task = pipeline.task(os.path.join(pipeline.software_root, name))
+    for mask_name, value in masks:
+        task.mask(name=mask_name, source='', value=value)
+    return task
+
+
+def test_routing_picks_first_matching_task(wp, pipeline):
+    first = _task(pipeline, 'first.py', ('go', 'a'), ('any', '*'))
+    second = _task(pipeline, 'second.py', ('go', '*'))
+    assert pipeline._route('go', 'a') is first
+    assert pipeline._route('go', 'b') is second
+    assert pipeline._route('any', 'whatever') is first
+    assert pipeline._route('stop', 'a') is None
+
+
+def test_routing_follows_mask_changes(wp, pipeline):
+    first = _task(pipeline, 'first.py', ('go', 'a'))
+    second = _task(pipeline, 'second.py', ('go', '*'))
+    assert pipeline._route('go', 'a') is first
+    first.mask(name='go').name = 'went'
+    assert pipeline._route('go', 'a') is second
+    assert pipeline._route('went', 'a') is first
+    first.mask(name='go', value='a')
+    assert pipeline._route('go', 'a') is first
+    first.mask(name='go').delete()
+    second.mask(name='go').delete()
+    assert pipeline._route('go', 'a') is None
+
+
+def test_routing_rebuilds_on_unrouted_signature(wp, pipeline):
+    first = _task(pipeline, 'first.py', ('go', 'a'))
+    assert pipeline._route('go', 'a') is first
+    table = wp.si.Mask.__table__
+    # masks written by another process
+    with wp.si.get_engine().begin() as conn:
+        conn.execute(wp.si.sa.insert(table).values(name='come', source='', value='a', task_id=first.task_id))
+        conn.execute(wp.si.sa.delete(table).where(table.c.name == 'go').where(table.c.task_id == first.task_id))
+    assert pipeline._route('come', 'a') is first
+    # the rebuild picked up the deletion too
+    assert pipeline._route('go', 'a') is None
+
+
+def test_routing_keeps_routed_signatures_until_rebuilt(wp, pipeline):
+    first = _task(pipeline, 'first.py', ('go', 'a'))
+    assert pipeline._route('go', 'a') is first
+    table = wp.si.Mask.__table__
+    with wp.si.get_engine().begin() as conn:
+        conn.execute(wp.si.sa.delete(table).where(table.c.task_id == first.task_id))
+    assert pipeline._route('go', 'a') is first
+    wp.Pipeline._invalidate_routing(pipeline.pipeline_id)
+    assert pipeline._route('go', 'a') is None
+
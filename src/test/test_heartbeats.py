@@ -0,0 +1,92 @@
+"""
+Tests of the job heartbeats and of the reaper of stale jobs
+"""
+import datetime
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+
+@pytest.fixture
+def task(task_pipeline):
+    task, = [task for task in task_pipeline.tasks if task.name == 'add_proc.py']
+    return task
+
+
+def _submitted_job(wp, task_pipeline, task, tag, age):
+    from wpipe.Job import JOBSUBMSTATE
+    event = task_pipeline.dummy_job.child_event('add_proc', tag=tag)
+    job = event._generate_new_job(task)
+    table = wp.si.Job.__table__
+    heartbeat = None if age is None else datetime.datetime.utcnow() - datetime.timedelta(seconds=age)
+    with wp.si.get_engine().begin() as conn:
+        conn.execute(wp.si.sa.update(table).where(table.c.id == job.job_id).
+                     values(state=JOBSUBMSTATE, starttime=heartbeat, heartbeat=heartbeat))
+    return job
+
+
+def test_reap_expires_stale_jobs_only(wp, task_pipeline, task):
+    stale = _submitted_job(wp, task_pipeline, task, 'stale', 1000)
+    alive = _submitted_job(wp, task_pipeline, task, 'alive', 10)
+    legacy = _submitted_job(wp, task_pipeline, task, 'legacy', None)
+    assert stale.is_stale and not alive.is_stale and not legacy.is_stale
+    assert wp.Job.reap(timeout=600, pipeline=task_pipeline) == [stale]
+    assert stale.has_expired and stale.endtime is not None
+    assert alive.is_active and legacy.is_active
+    assert wp.Job.reap(timeout=600, pipeline=task_pipeline) == []
+
+
+def test_reap_reports_through_command_only(wp, task_pipeline, task, capsys):
+    stale = _submitted_job(wp, task_pipeline, task, 'quiet', 1000)
+    assert wp.Job.reap(timeout=600, pipeline=task_pipeline) == [stale]
+    assert capsys.readouterr().out == ''
+    stale = _submitted_job(wp, task_pipeline, task, 'reported', 1000)
+    wp.si.flush_session()
+    output = subprocess.run([sys.executable, '-c', 'import wpipe; wpipe.wingspipe()',
+                             'reap', '-p', task_pipeline.pipe_root, '--timeout', '600'],
+                            cwd=task_pipeline.pipe_root, env=dict(os.environ), capture_output=True, text=True,
+                            timeout=300, check=True).stdout
+    assert output.splitlines()[-1:] == ['Expired job %d of task add_proc.py' % stale.job_id]
+    assert stale.has_expired
+
+
+def test_reap_is_limited_to_given_pipeline(wp, task_pipeline, task, tmp_path):
+    stale = _submitted_job(wp, task_pipeline, task, 'other', 1000)
+    (tmp_path / 'other').mkdir()
+    other = wp.Pipeline(str(tmp_path / 'other'))
+    assert wp.Job.reap(timeout=600, pipeline=other) == []
+    assert stale.is_active
+    assert stale in wp.Job.reap(timeout=600)
+
+
+def test_reap_refires_expired_jobs(wp, task_pipeline, task, spawned):
+    stale = _submitted_job(wp, task_pipeline, task, 'refired', 1000)
+    assert wp.Job.reap(timeout=600, refire=True, pipeline=task_pipeline) == [stale]
+    assert [(event, task.name) for event, task, _digest in spawned] == [(stale.firing_event, 'add_proc.py')]
+
+
+def test_firing_stale_job_submits_new_attempt(wp, task_pipeline, task, spawned):
+    stale = _submitted_job(wp, task_pipeline, task, 'fired', 10 ** 6)
+    stale.firing_event.fire()
+    assert stale.has_expired
+    assert len(spawned) == 1 and spawned[0][0] is stale.firing_event
+
+
+def test_heartbeat_thread_beats_until_stopped(wp, task_pipeline, task, monkeypatch):
+    job_module = sys.modules[wp.Job.__module__]
+    monkeypatch.setattr(job_module, 'HEARTBEAT_INTERVAL', 0.05)
+    job = _submitted_job(wp, task_pipeline, task, 'beating', 1000)
+    heartbeat = job_module._Heartbeat(job.job_id)
+    heartbeat.start()
+    try:
+        deadline = time.time() + 30
+        while job.is_stale and time.time() < deadline:
+            time.sleep(0.05)
+        assert not job.is_stale
+    finally:
+        heartbeat.stopped.set()
+        heartbeat.join(30)
+    assert not heartbeat.is_alive()
@@ -0,0 +1,78 @@
+"""
+Tests of the identity maps caching the Wpipe objects
+"""
+import gc
+
+import pytest
+
+
+class _Object:
+    pass
+
+
+@pytest.fixture
+def cache(wp):
+    from wpipe.core import IdentityMap
+    return IdentityMap('keyid', ['parent_id', 'name'], 'object')
+
+
+def _row(obj, keyid, parent_id, name):
+    return {'object': obj, 'keyid': keyid, 'parent_id': parent_id, 'name': name}
+
+
+def test_objects_are_located_by_id_and_unique_attributes(cache):
+    obj = _Object()
+    cache.add(_row(obj, 1, 10, 'a'))
+    assert cache.locate('keyid', 1) is obj and cache.locate('args', (10, 'a')) is obj
+    assert obj in cache and len(cache) == 1 and list(cache) == [obj]
+    with pytest.raises(KeyError):
+        cache.locate('keyid', 2)
+    with pytest.raises(KeyError):
+        cache.locate('name', 'a')
+
+
+def test_readded_object_is_reindexed(cache):
+    obj = _Object()
+    cache.add(_row(obj, 1, 10, 'a'))
+    cache.add(_row(obj, 1, 10, 'b'))
+    assert cache.locate('args', (10, 'b')) is obj
+    with pytest.raises(KeyError):
+        cache.locate('args', (10, 'a'))
+    assert len(cache) == 1
+
+
+def test_discard_keeps_other_objects_of_same_keys(cache):
+    old, new = _Object(), _Object()
+    cache.add(_row(old, 1, 10, 'a'))
+    cache.add(_row(new, 1, 10, 'a'))
+    cache.discard(old)
+    assert cache.locate('keyid', 1) is new
+    cache.discard(new)
+    cache.discard(new)
+    assert len(cache) == 0
+    with pytest.raises(KeyError):
+        cache.locate('keyid', 1)
+
+
+def test_unreferenced_objects_are_evicted(cache):
+    objects = [_Object() for _ in range(100)]
+    for i, obj in enumerate(objects):
+        cache.add(_row(obj, i, 10, str(i)))
+    kept = objects[7]
+    del objects, obj
+    gc.collect()
+    assert list(cache) == [kept] and cache.locate('keyid', 7) is kept
+    with pytest.raises(KeyError):
+        cache.locate('args', (10, '8'))
+
+
+def test_wpipe_objects_leave_the_cache(wp, pipeline):
+    job = pipeline.dummy_job
+    event_ids = [event.event_id for event in
+                 job.child_events_bulk([dict(name='cached', tag=str(i)) for i in range(50)])]
+    wp.si.close_session()
+    gc.collect()
+    # all but the last one constructed, which the class keeps as scratch state
+    assert len([event for event in wp.Event.__cache__ if event.event_id in event_ids]) <= 1
+    event = wp.Event(event_ids[3])
+    assert event.tag == '3' and wp.Event.__cache__.locate('keyid', event_ids[3]) is event
@@ -0,0 +1,24 @@
+"""
+Tests of the importation of wpipe and of its default objects
+"""
+import os
+import sys
+import json
+import subprocess
+
+SNIPPET = """
+import json
+import wpipe
+connected = wpipe.si.core._ENGINE is not None
+from wpipe.scheduler import PbsConsumer, SlurmConsumer
+print(json.dumps({'connected': connected, 'user_id': wpipe.DefaultUser.user_id,
+                  'ports': [PbsConsumer.DEFAULT_PORT, SlurmConsumer.DEFAULT_PORT]}))
+"""
+
+
+def test_import_defers_database_and_sets_user_ports(wp, tmp_path):
+    result = subprocess.run([sys.executable, '-c', SNIPPET], cwd=str(tmp_path), env=os.environ.copy(),
+                            stdout=subprocess.PIPE, check=True, universal_newlines=True)
+    output = json.loads(result.stdout.splitlines()[-1])
+    assert not output['connected']
+    assert output['ports'] == [5000 + output['user_id'], 8000 + output['user_id']]
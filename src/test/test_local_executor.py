@@ -0,0 +1,55 @@
+"""
+Tests of the LocalConsumer queue and of the spawning of local jobs
+"""
+import hashlib
+import os
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def local_consumer(monkeypatch, tmp_path):
+    from wpipe.scheduler import LocalConsumer
+    monkeypatch.setattr(LocalConsumer, 'HOME_DIR', str(tmp_path))
+    monkeypatch.setattr(LocalConsumer, 'QUEUE_DIR', str(tmp_path / 'queue'))
+    monkeypatch.setattr(LocalConsumer, 'RUNNING_DIR', str(tmp_path / 'running'))
+    LocalConsumer._make_dirs()
+    return LocalConsumer
+
+
+def test_job_runs_with_environment_of_sender(local_consumer, tmp_path):
+    workdir = tmp_path / 'pipeline'
+    workdir.mkdir()
+    logpath = tmp_path / 'job.log'
+    local_consumer._enqueue({'job_id': 1,
+                             'command': [sys.executable, '-c',
+                                         'import os; print(os.environ["SENDER_VARIABLE"], os.getcwd())'],
+                             'cwd': str(workdir),
+                             'env': dict(os.environ, SENDER_VARIABLE='sender'),
+                             'logpath': str(logpath)})
+    filename, = os.listdir(local_consumer.QUEUE_DIR)
+    assert os.stat(os.path.join(local_consumer.QUEUE_DIR, filename)).st_mode & 0o077 == 0
+    entry, process = local_consumer._start(filename)
+    assert process.wait(timeout=60) == 0
+    assert 'SENDER_VARIABLE' not in os.environ
+    assert logpath.read_text().split() == ['sender', str(workdir)]
+
+
+def test_daemon_is_keyed_per_database(wp):
+    from wpipe.scheduler import LocalConsumer
+    assert os.path.dirname(LocalConsumer.HOME_DIR) == os.path.expanduser('~/.localconsumer')
+    digest = hashlib.sha256(os.environ['WPIPE_ENGINEURL'].encode()).hexdigest()
+    assert os.path.basename(LocalConsumer.HOME_DIR) == digest[:16]
+
+
+def test_local_jobs_spawn_without_executor_by_default(wp, task_pipeline, monkeypatch):
+    event_module = sys.modules[wp.Event.__module__]
+    assert not event_module.WPIPE_LOCAL_EXECUTOR
+    monkeypatch.setattr(event_module, 'localconsumer', lambda which: pytest.fail("LocalConsumer started"))
+    commands = []
+    monkeypatch.setattr(event_module.subprocess, 'Popen', lambda command, **kwargs: commands.append(command))
+    event = task_pipeline.dummy_job.child_event('add_proc', tag='spawned')
+    event.fire()
+    command, = commands
+    assert os.path.basename(command[0]) == 'add_proc.py' and command[1:] == ['-e', str(event.event_id)]
@@ -0,0 +1,98 @@
+"""
+Tests of the memoized jobs
+"""
+import pytest
+
+
+@pytest.fixture
+def run_job(wp, monkeypatch):
+    # what the process of a spawned job does, without running its task
+    monkeypatch.delattr('sys.last_value', raising=False)
+
+    def run_job(event, task, memo_digest, child_events=()):
+        job = event._generate_new_job(task, memo_digest)
+        job._starting_todo(logprint=False)
+        for name, tag, options in child_events:
+            job.child_event(name, tag=tag, options=options)
+        job._ending_todo()
+        return job
+    return run_job
+
+
+@pytest.fixture
+def parent_job(task_pipeline):
+    # the events of same tag are told apart by their parent jobs
+    task, = [task for task in task_pipeline.tasks if task.name == 'add_proc.py']
+
+    def parent_job(tag):
+        return task_pipeline.dummy_job.child_event('add_proc', tag=tag)._generate_new_job(task)
+    return parent_job
+
+
+def _memoized_event(job, tag, **options):
+    return job.child_event('add_proc', tag=tag, options=dict({'memoize': True, 'factor': 2}, **options))
+
+
+def test_identical_event_replays_memoized_job(wp, task_pipeline, spawned, run_job, parent_job):
+    first = _memoized_event(parent_job('first'), 'memo')
+    first.fire()
+    (event, task, memo_digest), = spawned
+    assert event is first and memo_digest is not None
+    memo_job = run_job(event, task, memo_digest, [('add_prefix', 'child', {'value': 1.5})])
+    spawned.clear()
+    second = _memoized_event(parent_job('second'), 'memo')
+    second.fire()
+    # the job is completed from the memo, and its child events fired again
+    replayed_job = second.fired_jobs[-1]
+    assert replayed_job.has_completed
+    assert replayed_job.options['memo_job_id'] == memo_job.job_id
+    (child, child_task, _digest), = spawned
+    assert child.parent_job is replayed_job and child_task.name == 'add_prefix.py'
+    assert (child.name, child.tag, child.options['value']) == ('add_prefix', 'child', 1.5)
+
+
+def test_memo_needs_same_tag_options_and_script(wp, task_pipeline, spawned, run_job, parent_job):
+    _memoized_event(parent_job('first'), 'memo').fire()
+    run_job(*spawned.pop())
+    parent = parent_job('second')
+    _memoized_event(parent, 'other').fire()
+    _memoized_event(parent, 'memo', factor=3).fire()
+    assert len(spawned) == 2
+    task = spawned.pop()[1]
+    # the script of the task is the copy held by the pipeline
+    with open(task.executable, 'a') as script:
+        script.write('\n# modified\n')
+    _memoized_event(parent_job('third'), 'memo').fire()
+    assert len(spawned) == 2
+
+
+def test_memo_needs_same_dataproducts(wp, task_pipeline, spawned, run_job, parent_job, tmp_path):
+    dataproducts = []
+    for filename, text in [('a.txt', 'a'), ('b.txt', 'b'), ('c.txt', 'a')]:
+        (tmp_path / filename).write_text(text)
+        dataproducts.append(task_pipeline.dataproduct(filename=filename, relativepath=str(tmp_path), group='proc'))
+    _memoized_event(parent_job('first'), 'memo', dp_id=dataproducts[0].dp_id).fire()
+    run_job(*spawned.pop())
+    _memoized_event(parent_job('second'), 'memo', dp_id=dataproducts[1].dp_id).fire()
+    _memoized_event(parent_job('third'), 'memo', dp_id=dataproducts[2].dp_id).fire()
+    assert len(spawned) == 2
+    (tmp_path / 'a.txt').write_text('changed')
+    _memoized_event(parent_job('fourth'), 'memo', dp_id=dataproducts[0].dp_id).fire()
+    assert len(spawned) == 3
+
+
+def test_events_without_memoize_are_not_digested(wp, task_pipeline, spawned):
+    event = task_pipeline.dummy_job.child_event('add_proc', tag='plain', options={'factor': 2})
+    event.fire()
+    (event, task, memo_digest), = spawned
+    assert memo_digest is None
+
+
+def test_cleared_memos_run_again(wp, task_pipeline, spawned, run_job, parent_job):
+    _memoized_event(parent_job('first'), 'memo').fire()
+    run_job(*spawned.pop())
+    _memoized_event(parent_job('replayed'), 'memo').fire()
+    assert not spawned
+    task_pipeline.clear_memos()
+    _memoized_event(parent_job('after_clear'), 'memo').fire()
+    assert len(spawned) == 1
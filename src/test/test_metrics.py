@@ -0,0 +1,59 @@
+"""
+Tests of the job_metrics table and of the resources estimated from it
+"""
+import datetime
+import importlib
+
+import pytest
+
+
+@pytest.fixture
+def task(task_pipeline):
+    task, = [task for task in task_pipeline.tasks if task.name == 'add_proc.py']
+    return task
+
+
+@pytest.fixture
+def estimator(monkeypatch):
+    estimator = importlib.import_module('wpipe.scheduler.ResourceEstimator')
+    monkeypatch.setattr(estimator, '_ESTIMATES', {})
+    return estimator
+
+
+def _record_runs(wp, task_name, runs, state=None):
+    from wpipe.Job import JOBCOMPSTATE
+    table = wp.si.JobMetric.__table__
+    with wp.si.get_engine().begin() as conn:
+        conn.execute(wp.si.sa.insert(table),
+                     [dict(job_id=job_id, task_name=task_name, state=state or JOBCOMPSTATE,
+                           timestamp=datetime.datetime.utcnow(), walltime=walltime, maxrss=maxrss, children_maxrss=0)
+                      for job_id, (walltime, maxrss) in enumerate(runs)])
+
+
+def test_ending_job_records_metrics(wp, task_pipeline, task, monkeypatch):
+    from wpipe.Job import JOBCOMPSTATE
+    monkeypatch.delattr('sys.last_value', raising=False)
+    nruns, run_time = task.nruns, task.run_time
+    job = task_pipeline.dummy_job.child_event('add_proc', tag='metrics')._generate_new_job(task)
+    assert job.metrics is None
+    job._starting_todo(logprint=False)
+    job._ending_todo()
+    metrics = job.metrics
+    assert (metrics['job_id'], metrics['task_name'], metrics['state']) == (job.job_id, 'add_proc.py', JOBCOMPSTATE)
+    assert metrics['walltime'] >= 0 and metrics['maxrss'] > 0
+    assert task.nruns == nruns + 1
+    assert task.run_time == pytest.approx(run_time + metrics['walltime'])
+    assert list(task.metrics['job_id']) == [job.job_id]
+
+
+def test_resources_are_estimated_from_completed_runs(wp, estimator):
+    _record_runs(wp, 'estimated.py', [(1000, 2 * 2 ** 30), (3000, 2 * 2 ** 30), (2000, 1 * 2 ** 30)])
+    _record_runs(wp, 'estimated.py', [(10 ** 5, 100 * 2 ** 30)], state='failed')
+    assert estimator.estimateResources('estimated.py', '10:00:00', '100G') == ('01:15:00', '3G', 3)
+    estimator._ESTIMATES.clear()
+    assert estimator.estimateResources('estimated.py', '01:00:00', '2G') == ('01:00:00', '2G', 3)
+
+
+def test_resources_need_enough_runs(wp, estimator):
+    _record_runs(wp, 'unestimated.py', [(1000, 2 ** 30), (2000, 2 ** 30)])
+    assert estimator.estimateResources('unestimated.py', '10:00:00', '100G') is None
@@ -0,0 +1,81 @@
+"""
+Tests of the versioned migrations of the database schema
+"""
+import pytest
+
+from wpipe.sqlintf import migrations
+
+
+def _schema(si, engine):
+    inspector = si.sa.inspect(engine)
+    return dict((table_name, (set(column['name'] for column in inspector.get_columns(table_name)),
+                              set(index['name'] for index in inspector.get_indexes(table_name))))
+                for table_name in inspector.get_table_names())
+
+
+@pytest.fixture
+def legacy_engine(wp, tmp_path):
+    # database as created by the wpipe version preceding the migrations
+    si = wp.si
+    engine = si.sa.create_engine('sqlite:///%s' % (tmp_path / 'legacy.db'))
+    si.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for table_name in ['barriers', 'memos', 'job_metrics', 'schema_versions']:
+            conn.execute(si.sa.text('DROP TABLE %s' % table_name))
+        for index_name in ['ix_dataproducts_dpowner_id_subtype_data_type', 'ix_jobs_task_id_state',
+                           'ix_jobs_state_heartbeat']:
+            conn.execute(si.sa.text('DROP INDEX %s' % index_name))
+        for table_name, column_name in [('options', 'counter'), ('options', 'value_type'),
+                                        ('parameters', 'value_type'), ('jobs', 'heartbeat')]:
+            conn.execute(si.sa.text('ALTER TABLE %s DROP COLUMN %s' % (table_name, column_name)))
+    yield engine
+    engine.dispose()
+
+
+def _apply(si, engine, versions=None):
+    for version, _, step in migrations.MIGRATIONS:
+        if versions is None or version in versions:
+            with engine.begin() as conn:
+                step(conn)
+
+
+def test_migrations_upgrade_legacy_schema(wp, legacy_engine):
+    si = wp.si
+    _apply(si, legacy_engine)
+    expected = _schema(si, si.get_engine())
+    upgraded = _schema(si, legacy_engine)
+    del expected['schema_versions']
+    assert upgraded == expected
+
+
+def test_migrations_leave_current_schema_unchanged(wp, tmp_path):
+    si = wp.si
+    engine = si.sa.create_engine('sqlite:///%s' % (tmp_path / 'current.db'))
+    si.Base.metadata.create_all(engine)
+    before = _schema(si, engine)
+    _apply(si, engine)
+    assert _schema(si, engine) == before
+    engine.dispose()
+
+
+def test_migrate_applies_each_step_once(wp):
+    si = wp.si
+    assert si.migrate() == []
+    migrations.verify_schema(si.get_engine())
+    with si.get_engine().connect() as conn:
+        assert set(conn.execute(si.sa.select(migrations.SchemaVersion.id)).scalars()) == \
+            set(version for version, _, _ in migrations.MIGRATIONS)
+
+
+def test_counter_migration_backfills_integer_values(wp, legacy_engine):
+    si = wp.si
+    values = ['7', '-3', '0', '1.5', 'True', 'text', '007', None]
+    with legacy_engine.begin() as conn:
+        for i, value in enumerate(values, 1):
+            conn.execute(si.sa.text("INSERT INTO options (id, name, value) VALUES (%d, 'o%d', :value)" % (i, i)),
+                         dict(value=value))
+    _apply(si, legacy_engine, [1])
+    with legacy_engine.connect() as conn:
+        counters = dict(conn.execute(si.sa.text('SELECT value, counter FROM options')).all())
+    assert counters == {'7': 7, '-3': -3, '0': 0, '1.5': None, 'True': None, 'text': None, '007': None,
+                        None: None}
@@ -0,0 +1,107 @@
+"""
+Tests of the options and of their atomic counters
+"""
+import threading
+
+
+def _counter(wp, option):
+    table = wp.si.Option.__table__
+    with wp.si.get_engine().connect() as conn:
+        return conn.execute(wp.si.sa.select(table.c.value, table.c.counter).
+                            where(table.c.id == option.option_id)).one()
+
+
+def test_integer_option_holds_counter(wp, pipeline):
+    job = pipeline.dummy_job
+    job.options = {'count': 4, 'ratio': 1.5, 'flag': True}
+    assert tuple(_counter(wp, job.option('count'))) == ('4', 4)
+    assert _counter(wp, job.option('ratio')).counter is None
+    assert _counter(wp, job.option('flag')).counter is None
+
+
+def test_increment_is_atomic_update(wp, pipeline):
+    job = pipeline.dummy_job
+    job.options = {'count': 0}
+    count = job.options['count']
+    count += 5
+    count -= 2
+    assert count == 3 and job.options['count'] == 3
+    assert tuple(_counter(wp, job.option('count'))) == ('3', 3)
+
+
+def test_increment_without_counter_falls_back_and_sets_it(wp, pipeline):
+    job = pipeline.dummy_job
+    job.options = {'count': 2}
+    table = wp.si.Option.__table__
+    option_id = job.option('count').option_id
+    with wp.si.get_engine().begin() as conn:
+        conn.execute(wp.si.sa.update(table).where(table.c.id == option_id).values(counter=None))
+    count = job.options['count']
+    count += 1
+    assert job.options['count'] == 3
+    assert tuple(_counter(wp, job.option('count'))) == ('3', 3)
+
+
+def test_counter_follows_type_changes(wp, pipeline):
+    job = pipeline.dummy_job
+    job.options = {'count': 2}
+    job.options['count'] = 2.5
+    assert _counter(wp, job.option('count')).counter is None
+    count = job.options['count']
+    count += 1
+    assert job.options['count'] == 3.5
+    job.options['count'] = 'text'
+    count = job.options['count']
+    count += 'x'
+    assert job.options['count'] == 'textx'
+
+
+def test_concurrent_increments_are_not_lost(wp, pipeline):
+    job = pipeline.dummy_job
+    job.options = {'count': 0}
+    errors = []
+
+    def increment():
+        try:
+            for _ in range(20):
+                count = job.options['count']
+                count += 1
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert tuple(_counter(wp, job.option('count'))) == ('80', 80)
+
+
+def test_read_sees_external_writes(wp, pipeline):
+    job = pipeline.dummy_job
+    job.options = {'typed': 1.5, 'untyped': 2.5}
+    table = wp.si.Option.__table__
+    with wp.si.get_engine().begin() as conn:
+        conn.execute(wp.si.sa.update(table).where(table.c.name == 'untyped').values(value_type=None))
+    assert job.options['typed'] == 1.5 and job.options['untyped'] == 2.5
+    with wp.si.get_engine().begin() as conn:
+        conn.execute(wp.si.sa.update(table).where(table.c.name == 'typed').values(value='4.5'))
+        conn.execute(wp.si.sa.update(table).where(table.c.name == 'untyped').values(value='5.5'))
+    assert job.options['typed'] == 4.5 and job.options['untyped'] == 5.5
+
+
+def test_values_read_back_as_their_type(wp, pipeline):
+    job = pipeline.dummy_job
+    values = {'number': '5', 'real': '1.5', 'flag': 'True', 'listed': '[1, 2]', 'nan': 'nan',
+              'integer': 5, 'ratio': 1.5}
+    job.options = values
+    wp.si.close_session()
+    options = pipeline.dummy_job.options
+    for name, value in values.items():
+        assert options[name] == value and isinstance(options[name], type(value)), name
+    assert _counter(wp, job.option('number')).counter is None
+    table = wp.si.Option.__table__
+    with wp.si.get_engine().connect() as conn:
+        assert conn.execute(wp.si.sa.select(table.c.value_type).
+                            where(table.c.id == job.option('number').option_id)).scalar() == 'str'
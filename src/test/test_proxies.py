@@ -0,0 +1,97 @@
+"""
+Tests of the children proxies
+"""
+import numpy as np
+import pytest
+
+from .test_events import _count_statements
+
+
+def _child_events(job, number):
+    return job.child_events_bulk([dict(name='step', tag=str(i), value='v%d' % i) for i in range(number)])
+
+
+def test_column_and_frame_follow_ids(wp, pipeline):
+    job = pipeline.dummy_job
+    events = _child_events(job, 3)
+    assert list(job.child_events.column('tag')) == ['0', '1', '2']
+    assert list(job.child_events.value) == ['v0', 'v1', 'v2']
+    frame = job.child_events.frame(['tag', 'value'])
+    assert list(frame.index) == [event.event_id for event in events]
+    assert frame.loc[events[1].event_id].tolist() == ['1', 'v1']
+    with job.child_events.hold_structure():
+        assert job.child_events.frame(['tag', 'value']).equals(frame)
+
+
+def test_frame_keeps_nulls(wp, task_pipeline):
+    task, = [task for task in task_pipeline.tasks if task.name == 'add_proc.py']
+    jobs = [task_pipeline.dummy_job.child_event('add_proc', tag=tag)._generate_new_job(task) for tag in 'ab']
+    table = wp.si.Job.__table__
+    with wp.si.get_engine().begin() as conn:
+        conn.execute(wp.si.sa.update(table).where(table.c.id == jobs[1].job_id).values(node_id=wp.DefaultNode.node_id))
+    frame = task.jobs.frame(['attempt', 'node_id'])
+    assert frame['node_id'].tolist() == [None, wp.DefaultNode.node_id]
+    assert isinstance(frame['node_id'].tolist()[1], int)
+    assert frame['attempt'].dtype == np.int64
+    assert task.jobs.column('node_id').tolist() == [None, wp.DefaultNode.node_id]
+
+
+def test_snapshot_loads_children_once_or_by_chunks(wp, pipeline):
+    job = pipeline.dummy_job
+    events = _child_events(job, 5)
+    iterated = []
+    for event in job.child_events:
+        if not iterated:
+            job.child_event('step', tag='late')
+        iterated.append(event)
+    assert iterated == events
+    statements, stop = _count_statements(wp)
+    try:
+        chunked = list(job.child_events.snapshot(yield_per=2))
+    finally:
+        stop()
+    assert [event.tag for event in chunked] == ['0', '1', '2', '3', '4', 'late']
+    # the last chunk being full, an empty one ends the iteration
+    assert len([statement for statement in statements if 'FROM optowners JOIN events' in statement]) == 4
+
+
+def test_live_iteration_supports_deletion(wp, pipeline):
+    job = pipeline.dummy_job
+    _child_events(job, 4)
+    visited = []
+    for event in job.child_events.live():
+        visited.append(event.tag)
+        if event.tag in ['1', '2']:
+            event.delete()
+    assert visited == ['0', '1', '2', '3']
+    assert list(job.child_events.tag) == ['0', '3']
+
+
+def test_lookup_by_key_is_one_query_without_lock(wp, pipeline):
+    job = pipeline.dummy_job
+    _child_events(job, 3)
+    later = job.child_event('later')
+    statements, stop = _count_statements(wp)
+    try:
+        assert job.child_events['later'] is later
+    finally:
+        stop()
+    queries = [statement for statement in statements if 'events.name = ?' in statement]
+    assert len(queries) == 1 and 'FOR UPDATE' not in queries[0]
+    assert 'BEGIN IMMEDIATE' not in statements
+    # the first child of given name in order of ids
+    assert job.child_events['step'].tag == '0'
+    with pytest.raises(KeyError):
+        job.child_events['missing']
+    with job.child_events.hold_structure():
+        assert job.child_events['later'] is later
+
+
+def test_lookup_by_key_sees_rows_of_other_connections(wp, pipeline):
+    job = pipeline.dummy_job
+    event = job.child_event('renamed')
+    assert job.child_events['renamed'] is event
+    table = wp.si.Event.__table__
+    with wp.si.get_engine().begin() as conn:
+        conn.execute(wp.si.sa.update(table).where(table.c.id == event.event_id).values(tag='changed'))
+    assert job.child_events['renamed'].tag == 'changed'
@@ -0,0 +1,87 @@
+"""
+Tests of the routing of the read-only queries to a read replica
+"""
+import importlib
+import sqlite3
+import time
+
+import pytest
+
+
+@pytest.fixture
+def core():
+    return importlib.import_module('wpipe.sqlintf.core')
+
+
+@pytest.fixture
+def replica(wp, pipeline, core, tmp_path, monkeypatch):
+    # the replica is a copy of the primary database taken after the option is set
+    job = pipeline.dummy_job
+    job.options = {'origin': 'primary'}
+    option_id = job.option('origin').option_id
+    wp.si.flush_session()
+    path = str(tmp_path / 'replica.db')
+    source, target = sqlite3.connect(wp.si.get_engine().url.database), sqlite3.connect(path)
+    try:
+        source.backup(target)
+        target.execute("UPDATE options SET value = 'replica' WHERE id = ?", (option_id,))
+        target.commit()
+    finally:
+        source.close()
+        target.close()
+    monkeypatch.setattr(core, 'READ_ENGINE_URL', 'sqlite:///' + path)
+    monkeypatch.setattr(core, '_READ_ENGINE', None)
+    monkeypatch.setattr(core, '_LAST_WRITE', None)
+    yield option_id
+    core._READ_ENGINE.dispose()
+
+
+def _origin(wp, session, option_id):
+    table = wp.si.Option.__table__
+    return session.execute(wp.si.sa.select(table.c.value).where(table.c.id == option_id)).scalar()
+
+
+def test_reads_go_to_replica(wp, core, replica):
+    with wp.si.Session() as session:
+        assert _origin(wp, session, replica) == 'replica'
+        assert session.query(wp.si.Option.value).filter_by(id=replica).scalar() == 'replica'
+    assert core.get_read_engine() is core._READ_ENGINE is not None
+
+
+def test_writes_go_to_primary_and_reads_stick_to_it(wp, core, replica, monkeypatch):
+    table = wp.si.Option.__table__
+    with wp.si.Session() as session:
+        assert _origin(wp, session, replica) == 'replica'
+        session.execute(wp.si.sa.update(table).where(table.c.id == replica).values(value='written'))
+        session.commit()
+        assert core._LAST_WRITE is not None
+        # reading its own write within the sticky window
+        assert _origin(wp, session, replica) == 'written'
+        monkeypatch.setattr(core, '_LAST_WRITE', time.monotonic() - core.READ_STICKY - 1)
+        assert _origin(wp, session, replica) == 'replica'
+    with wp.si.get_engine().connect() as conn:
+        assert conn.execute(wp.si.sa.select(table.c.value).where(table.c.id == replica)).scalar() == 'written'
+
+
+def test_flushes_and_locking_reads_go_to_primary(wp, core, replica):
+    with wp.si.Session() as session:
+        option = session.query(wp.si.Option).with_for_update().filter_by(id=replica).one()
+        assert option.value == 'primary' and core._LAST_WRITE is not None
+        core._LAST_WRITE = None
+        option.value = 'flushed'
+        # the changes are flushed to the primary, where the reads of the transaction stay
+        assert session.query(wp.si.Option.value).filter_by(id=replica).scalar() == 'flushed'
+        assert _origin(wp, session, replica) == 'flushed'
+        session.rollback()
+
+
+def test_without_replica_reads_go_to_primary(wp, pipeline, core, monkeypatch):
+    monkeypatch.setattr(core, 'READ_ENGINE_URL', None)
+    monkeypatch.setattr(core, '_READ_ENGINE', None)
+    job = pipeline.dummy_job
+    job.options = {'origin': 'primary'}
+    wp.si.flush_session()
+    assert core.get_read_engine() is None
+    with wp.si.Session() as session:
+        assert session.get_bind(clause=wp.si.sa.select(wp.si.Option.__table__)) is wp.si.get_engine()
+        assert _origin(wp, session, job.option('origin').option_id) == 'primary'
@@ -0,0 +1,44 @@
+"""
+Tests of the scheduler resource requests
+"""
+import importlib
+import logging
+
+import pytest
+
+
+@pytest.fixture
+def job(wp, task_pipeline):
+    task, = [task for task in task_pipeline.tasks if task.name == 'add_proc.py']
+    event = task_pipeline.dummy_job.child_event('add_proc', tag='resources')
+    return event._generate_new_job(task)
+
+
+@pytest.fixture
+def estimates(monkeypatch):
+    calls = []
+
+    def estimateResources(task_name, max_walltime, max_memory):
+        calls.append(task_name)
+        return '01:00:00', '3G', 10
+
+    monkeypatch.setattr(importlib.import_module('wpipe.scheduler.JobData'), 'estimateResources', estimateResources)
+    return calls
+
+
+def test_scheduler_job_is_estimated_and_logged(job, estimates, caplog, capsys):
+    from wpipe.scheduler import JobData
+    with caplog.at_level(logging.DEBUG):
+        jobdata = JobData(job)
+    assert estimates == ['add_proc.py']
+    assert (jobdata.getWalltime(), jobdata.getMemory()) == ('01:00:00', '3G')
+    assert 'Requesting wall time 01:00:00' in caplog.text
+    assert 'Requesting' not in capsys.readouterr().out
+
+
+def test_local_job_is_not_estimated(job, estimates):
+    from wpipe.scheduler import JobData
+    from wpipe.scheduler.SlurmScheduler import DEFAULT_MEMORY, DEFAULT_WALLTIME
+    jobdata = JobData(job, estimate_resources=False)
+    assert estimates == []
+    assert (jobdata.getWalltime(), jobdata.getMemory()) == (DEFAULT_WALLTIME, DEFAULT_MEMORY)
@@ -0,0 +1,73 @@
+"""
+Tests of the retry policy of the database accesses
+"""
+import time
+import threading
+
+import pytest
+
+
+def _operational_error(si):
+    return si.exc.OperationalError('SELECT 1', {}, Exception('database is locked'))
+
+
+def test_failures_open_breaker(wp):
+    si = wp.si
+    policy = si.RetryPolicy(max_attempts=5, breaker_threshold=2, breaker_window=10, breaker_cooldown=0.2)
+    outcomes = [_operational_error(si), _operational_error(si), None]
+    start = time.monotonic()
+    for attempt in policy.retrying(retry=si.tn.retry_if_exception_type(si.exc.OperationalError),
+                                   before=lambda retry_state: None, after=lambda retry_state: None,
+                                   wait=si.tn.wait_none()):
+        with attempt:
+            outcome = outcomes.pop(0)
+            if outcome is not None:
+                raise outcome
+    statistics = policy.statistics()
+    assert (statistics['attempts'], statistics['failures'], statistics['breaker_trips']) == (3, 2, 1)
+    assert statistics['rollbacks'] == 0
+    assert statistics['shed_time'] > 0 and time.monotonic() - start >= 0.1
+
+
+def test_giving_up_reraises(wp):
+    si = wp.si
+    policy = si.RetryPolicy(max_attempts=2, breaker_threshold=0)
+    with pytest.raises(si.exc.OperationalError):
+        for attempt in policy.retrying(retry=si.tn.retry_if_exception_type(si.exc.OperationalError),
+                                       before=lambda retry_state: None, after=lambda retry_state: None,
+                                       wait=si.tn.wait_none()):
+            with attempt:
+                raise _operational_error(si)
+    assert policy.statistics()['giveups'] == 1
+
+
+def test_counters_are_thread_safe(wp):
+    policy = wp.si.RetryPolicy(breaker_threshold=0)
+
+    def count():
+        for _ in range(1000):
+            policy.before_attempt()
+            policy.after_failure()
+            policy.count_rollback()
+
+    threads = [threading.Thread(target=count) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    statistics = policy.statistics()
+    assert statistics['attempts'] == statistics['failures'] == statistics['rollbacks'] == 8000
+
+
+def test_rollbacks_are_counted_where_they_happen(wp, pipeline):
+    si = wp.si
+    before = si.retry_statistics()
+    with pytest.raises(RuntimeError):
+        for session in si.begin_session():
+            with session as session:
+                session.add(pipeline._pipeline)
+                pipeline._pipeline.description = 'dropped'
+                raise RuntimeError
+    after = si.retry_statistics()
+    assert after['rollbacks'] == before['rollbacks'] + 1
+    assert after['failures'] == before['failures']
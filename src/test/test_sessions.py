@@ -0,0 +1,121 @@
+"""
+Tests of the session pooling of sqlintf
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _stored_description(si, pipeline):
+    table = si.Pipeline.__table__
+    with si.get_engine().connect() as conn:
+        return conn.execute(si.sa.select(table.c.description).
+                            where(table.c.id == pipeline._pipeline.id)).scalar()
+
+
+def _set_description(si, pipeline, description):
+    for session in si.begin_session():
+        with session as session:
+            session.add(pipeline._pipeline)
+            pipeline._pipeline.description = description
+
+
+def test_pooled_session_is_reused(wp, pipeline):
+    si = wp.si
+    sessions = []
+    for _ in range(3):
+        for session in si.begin_session():
+            with session as session:
+                sessions.append(session.SESSION)
+    assert sessions[0] is sessions[1] is sessions[2]
+
+
+def test_pending_changes_are_committed_at_boundary(wp, pipeline):
+    si = wp.si
+    _set_description(si, pipeline, 'committed')
+    assert _stored_description(si, pipeline) == 'committed'
+    # the boundary does not expire the loaded instances
+    assert 'description' in pipeline._pipeline.__dict__
+
+
+def test_held_changes_stay_pending_until_flushed(wp, pipeline):
+    si = wp.si
+    with si.hold_commit():
+        _set_description(si, pipeline, 'held')
+        assert _stored_description(si, pipeline) != 'held'
+        # a later statement flushing the change does not commit it either
+        assert pipeline.description == 'held'
+        assert _stored_description(si, pipeline) != 'held'
+    si.flush_session()
+    assert _stored_description(si, pipeline) == 'held'
+
+
+def test_changes_are_rolled_back_on_error(wp, pipeline):
+    si = wp.si
+    try:
+        for session in si.begin_session():
+            with session as session:
+                session.add(pipeline._pipeline)
+                pipeline._pipeline.description = 'failed'
+                raise RuntimeError
+    except RuntimeError:
+        pass
+    assert _stored_description(si, pipeline) != 'failed'
+    assert pipeline.description != 'failed'
+
+
+def _in_thread(func, *args):
+    with ThreadPoolExecutor(1) as executor:
+        return executor.submit(func, *args).result(timeout=60)
+
+
+def test_each_thread_has_its_own_session(wp, pipeline):
+    si = wp.si
+
+    def pooled_session():
+        for session in si.begin_session():
+            with session as session:
+                return session.SESSION, pipeline._pipeline
+
+    main_session, main_row = pooled_session()
+    thread_session, thread_row = _in_thread(pooled_session)
+    assert thread_session is not main_session
+    # the shared Wpipe object holds a copy of its row in each thread
+    assert thread_row is not main_row and thread_row.id == main_row.id
+    assert pipeline._pipeline is main_row
+
+
+def test_threads_access_database_concurrently(wp, pipeline):
+    si = wp.si
+    entered, release = threading.Event(), threading.Event()
+
+    def hold_session():
+        for session in si.begin_session():
+            with session as session:
+                session.add(pipeline._pipeline)
+                entered.set()
+                assert release.wait(30)
+                return pipeline._pipeline.name
+
+    with ThreadPoolExecutor(1) as executor:
+        holding = executor.submit(hold_session)
+        assert entered.wait(30)
+        # not serialized behind the statement the other thread keeps open
+        assert _in_thread(lambda: pipeline.description) == pipeline.description
+        release.set()
+        assert holding.result(timeout=60) == pipeline.name
+
+
+def test_threads_share_wpipe_objects(wp, pipeline):
+    job = pipeline.dummy_job
+
+    def register(i):
+        event = job.child_event('thread_%d' % (i % 4), tag='t%d' % i, options={'index': i})
+        event.options['index'] += 100
+        return event
+
+    with ThreadPoolExecutor(8) as executor:
+        events = list(executor.map(register, range(32)))
+    assert len(set(event.event_id for event in events)) == 32
+    assert [event.options['index'] for event in events] == [i + 100 for i in range(32)]
+    assert all(wp.Event(event.event_id) is event for event in events)
+    assert len(job.child_events) == 32
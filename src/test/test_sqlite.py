@@ -0,0 +1,69 @@
+"""
+Tests of the transactions of the SQLite database
+"""
+import os
+import sys
+import time
+import sqlite3
+import subprocess
+
+from .test_events import _count_statements
+
+
+def _database_path(wp):
+    return wp.si.get_engine().url.database
+
+
+def test_reads_are_not_blocked_by_another_writer(wp, pipeline):
+    job = pipeline.dummy_job
+    job.options = {'count': 1}
+    writer = sqlite3.connect(_database_path(wp), isolation_level=None)
+    try:
+        writer.execute('BEGIN IMMEDIATE')
+        start = time.monotonic()
+        assert job.options['count'] == 1 and job.state is not None
+        assert time.monotonic() - start < 5
+    finally:
+        writer.execute('ROLLBACK')
+        writer.close()
+
+
+def test_only_locking_reads_begin_immediate(wp, pipeline):
+    job = pipeline.dummy_job
+    job.options = {'count': 1}
+    wp.si.flush_session()
+    statements, stop = _count_statements(wp)
+    try:
+        job.options['count']
+        begins = [statement for statement in statements if statement.startswith('BEGIN')]
+        assert begins and set(begins) == {'BEGIN'}
+        del statements[:]
+        count = job.options['count']
+        count *= 2
+        assert job.options['count'] == 2
+        assert 'BEGIN IMMEDIATE' in statements
+    finally:
+        stop()
+
+
+INCREMENTS = """
+import sys
+import wpipe as wp
+job = wp.Job(int(sys.argv[1]))
+for _ in range(10):
+    count = job.options['count']
+    count += 1
+    ratio = job.options['ratio']
+    ratio += 1.0
+"""
+
+
+def test_concurrent_processes_do_not_lose_updates(wp, pipeline, tmp_path):
+    job = pipeline.dummy_job
+    job.options = {'count': 0, 'ratio': 0.5}
+    wp.si.flush_session()
+    processes = [subprocess.Popen([sys.executable, '-c', INCREMENTS, str(job.job_id)], cwd=str(tmp_path),
+                                  env=os.environ.copy(), stdout=subprocess.DEVNULL)
+                 for _ in range(4)]
+    assert [process.wait(timeout=300) for process in processes] == [0] * 4
+    assert job.options['count'] == 40 and job.options['ratio'] == 40.5
@@ -0,0 +1,402 @@
+#!/usr/bin/env python
+"""
+Contains the Barrier class definition
+
+Please note that this module is private. The Barrier class is
+available in the main ``wpipe`` namespace - use that instead.
+"""
+from .core import datetime, si
+from .core import IdentityMap, make_yield_session_if_not_cached, make_query_rtn_upd
+from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, ThreadLocalAttribute, ThreadLocalMeta
+from .core import split_path
+
+__all__ = ['Barrier']
+
+CLASS_NAME = split_path(__file__)[1]
+KEYID_ATTR = 'barrier_id'
+UNIQ_ATTRS = getattr(si, CLASS_NAME).__UNIQ_ATTRS__
+CLASS_LOW = CLASS_NAME.lower()
+
+
+def _in_session(**local_kw):
+    return in_session('_%s' % CLASS_LOW, **local_kw)
+
+
+_check_in_cache = make_yield_session_if_not_cached(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+
+_query_return_and_update_cached_row = make_query_rtn_upd(CLASS_LOW, KEYID_ATTR, UNIQ_ATTRS)
+
+
+class Barrier(metaclass=ThreadLocalMeta):
+    """
+        Represents a fan-in barrier of a job, firing an event once a given
+        number of arrivals are recorded.
+
+        Call signatures::
+
+            Barrier(job, name, expected, event)
+            Barrier(job, name)
+            Barrier(keyid)
+            Barrier(_barrier)
+
+        When __new__ is called, it queries the database for an existing
+        row in the `barriers` table via `sqlintf` using the given signature.
+        If the row exists, it retrieves its corresponding `sqlintf.Barrier`
+        object, otherwise it creates a new row via a new `sqlintf.Barrier`
+        instance. This `sqlintf.Barrier` object is then wrapped under the
+        hidden attribute `Barrier._barrier` in the new instance of this
+        `Barrier` class generated by __new__.
+
+        All barriers are uniquely identified by their job and their name, but
+        alternatively, the constructor can take as sole argument either:
+         - the primary key id of the corresponding `barriers` table row
+         - the `sqlintf.Barrier` object interfacing that table row
+
+        Parameters
+        ----------
+        job : Job object
+            Parent Job owning this barrier.
+        name : string
+            Name of the barrier.
+        expected : int
+            Number of arrivals that fire the event - only needed to create
+            the barrier.
+        event : Event object or string
+            Event to fire, or name of the child event of the job to fire,
+            tagged with the name of the barrier - only needed to create the
+            barrier.
+        keyid : int
+            Primary key id of the table row.
+        _barrier : sqlintf.Barrier object exposing SQL interface
+            Corresponding sqlintf object interfacing the table row.
+
+        Attributes
+        ----------
+        parents : Job object
+            Points to attribute self.job.
+        name : string
+            Name of the barrier.
+        barrier_id : int
+            Primary key id of the table row.
+        timestamp : datetime.datetime object
+            Timestamp of last access to table row.
+        expected : int
+            Number of arrivals that fire the event.
+        arrived : int
+            Number of arrivals recorded.
+        is_fired : boolean
+            True if the event was fired.
+        job : Job object
+            Job object corresponding to parent job.
+        job_id : int
+            Primary key id of the table row of parent job.
+        event : Event object
+            Event object fired by the barrier.
+        event_id : int
+            Primary key id of the table row of the event fired by the barrier.
+
+        How to use
+        ----------
+        A Barrier replaces the hand-made joins counting in an option of the
+        parent job the children that completed: the parent job creates the
+        barrier before firing its children, and each child records its
+        arrival when it completes. The arrival that completes the count fires
+        the event of the barrier, exactly once whatever the number of
+        concurrent processes:
+
+        >>> my_job.barrier('catalogs_done', len(my_catalogs), 'new_match_catalog')
+        >>> for my_catalog in my_catalogs:
+        >>>     my_job.child_event('new_catalog', tag=my_catalog.dp_id).fire()
+
+        then in the task of event 'new_catalog':
+
+        >>> this_job.firing_event.parent_job.barrier('catalogs_done').arrive()
+    """
+    __cache__ = IdentityMap(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+    _barrier = ThreadLocalAttribute()
+    _session = ThreadLocalAttribute(default=None)
+
+    @classmethod
+    def _check_in_cache(cls, kind, loc):
+        return _check_in_cache(cls, kind, loc)
+
+    @classmethod
+    def _sqlintf_instance_argument(cls):
+        if hasattr(cls, '_%s' % CLASS_LOW):
+            for _session in cls._check_in_cache(kind='keyid',
+                                                loc=getattr(cls, '_%s' % CLASS_LOW).get_id()):
+                pass
+
+    @classmethod
+    def _return_cached_instances(cls):
+        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__]
+
+    def __new__(cls, *args, **kwargs):
+        if hasattr(cls, '_inst'):
+            old_cls_inst = cls._inst
+            delattr(cls, '_inst')
+        else:
+            old_cls_inst = None
+        cls._to_cache = {}
+        # checking if given argument is sqlintf object or existing id
+        cls._barrier = args[0] if len(args) else None
+        if not isinstance(cls._barrier, si.Barrier):
+            keyid = kwargs.get('id', cls._barrier)
+            if isinstance(keyid, int):
+                for session in cls._check_in_cache(kind='keyid', loc=keyid):
+                    cls._barrier = session.query(si.Barrier).filter_by(id=keyid).one()
+            else:
+                # gathering construction arguments
+                wpargs, args, kwargs = initialize_args(args, kwargs, nargs=3)
+                job = kwargs.get('job', wpargs.get('Job', None))
+                name = kwargs.get('name', args[0])
+                expected = kwargs.get('expected', args[1])
+                event = kwargs.get('event', wpargs.get('Event', args[2]))
+                if isinstance(event, str):
+                    event = job.child_event(event, tag=name)
+                # querying the database for existing row or create
+                for session in cls._check_in_cache(kind='args', loc=(job.job_id, name)):
+                    for retry in session.retrying_nested():
+                        with retry:
+                            this_nested = retry.retry_state.begin_nested()
+                            cls._barrier = this_nested.session.query(si.Barrier).with_for_update(). \
+                                filter_by(job_id=job.job_id). \
+                                filter_by(name=name).one_or_none()
+                            if cls._barrier is None and expected is not None and event is not None:
+                                cls._barrier = si.Barrier(name=name,
+                                                          expected=int(expected),
+                                                          arrived=0,
+                                                          is_fired=False,
+                                                          event_id=event.event_id)
+                                job._job.barriers.append(cls._barrier)
+                                this_nested.commit()
+                            else:
+                                this_nested.rollback()
+                            retry.retry_state.commit()
+                    if cls._barrier is None:
+                        del cls._to_cache
+                if not hasattr(cls, '_to_cache'):
+                    if old_cls_inst is not None:
+                        cls._inst = old_cls_inst
+                    raise ValueError("Barrier '%s' of job %d does not exist: give the number of arrivals "
+                                     "expected and the event to fire to create it" % (name, job.job_id))
+        else:
+            cls._sqlintf_instance_argument()
+        # verifying if instance already exists and return
+        wpipe_to_sqlintf_connection(cls, 'Barrier')
+        # add instance to cache dataframe
+        if cls._to_cache:
+            cls._to_cache[CLASS_LOW] = cls._inst
+            cls.__cache__.add(cls._to_cache)
+            del cls._to_cache
+        new_cls_inst = cls._inst
+        delattr(cls, '_inst')
+        if old_cls_inst is not None:
+            cls._inst = old_cls_inst
+        return new_cls_inst
+
+    # @_in_session()
+    def __init__(self, *args, **kwargs):
+        pass
+
+    @_in_session()
+    def __repr__(self):
+        cls = self.__class__.__name__
+        description = ', '.join([(f"{prop}={getattr(self, prop)}") for prop in [KEYID_ATTR]+UNIQ_ATTRS])
+        return f'{cls}({description})'
+
+    @classmethod
+    def select(cls, *args, **kwargs):
+        """
+        Returns a list of Barrier objects fulfilling the kwargs filter.
+
+        Parameters
+        ----------
+        kwargs
+            Refer to :class:`sqlintf.Barrier` for parameters.
+
+        Returns
+        -------
+        out : list of Barrier object
+            list of objects fulfilling the kwargs filter.
+        """
+        for session in si.begin_session():
+            with session as session:
+                cls._temp = session.query(si.Barrier).filter_by(**kwargs)
+                for arg in args:
+                    cls._temp = cls._temp.filter(arg)
+                return list(map(cls, cls._temp.all()))
+
+    @property
+    def parents(self):
+        """
+        :obj:`Job`: Points to attribute self.job.
+        """
+        return self.job
+
+    @property
+    @_in_session()
+    def name(self):
+        """
+        str: Name of the barrier.
+        """
+        return self._barrier.name
+
+    @property
+    @_in_session()
+    def barrier_id(self):
+        """
+        int: Primary key id of the table row.
+        """
+        return self._barrier.id
+
+    @property
+    @_in_session()
+    def timestamp(self):
+        """
+        :obj:`datetime.datetime`: Timestamp of last access to table row.
+        """
+        self._session.refresh(self._barrier)
+        return self._barrier.timestamp
+
+    @property
+    @_in_session()
+    def expected(self):
+        """
+        int: Number of arrivals that fire the event.
+        """
+        return self._barrier.expected
+
+    @property
+    @_in_session()
+    def arrived(self):
+        """
+        int: Number of arrivals recorded.
+        """
+        self._session.refresh(self._barrier)
+        return self._barrier.arrived
+
+    @property
+    @_in_session()
+    def is_fired(self):
+        """
+        bool: True if the event was fired.
+        """
+        self._session.refresh(self._barrier)
+        return self._barrier.is_fired
+
+    @property
+    @_in_session()
+    def job(self):
+        """
+        :obj:`Job`: Job object corresponding to parent job.
+        """
+        if hasattr(self._barrier.job, '_wpipe_object'):
+            return self._barrier.job._wpipe_object
+        else:
+            from .Job import Job
+            return Job(self._barrier.job)
+
+    @property
+    @_in_session()
+    def job_id(self):
+        """
+        int: Primary key id of the table row of parent job.
+        """
+        return self._barrier.job_id
+
+    @property
+    @_in_session()
+    def event(self):
+        """
+        :obj:`Event`: Event object fired by the barrier.
+        """
+        if hasattr(self._barrier.event, '_wpipe_object'):
+            return self._barrier.event._wpipe_object
+        else:
+            from .Event import Event
+            return Event(self._barrier.event)
+
+    @property
+    @_in_session()
+    def event_id(self):
+        """
+        int: Primary key id of the table row of the event fired by the
+        barrier.
+        """
+        return self._barrier.event_id
+
+    def arrive(self, count=1):
+        """
+        Records arrivals at the barrier, and fires its event if they complete
+        the number of arrivals expected.
+
+        Parameters
+        ----------
+        count : int
+            Number of arrivals to record - defaults to 1.
+
+        Returns
+        -------
+        fired : bool
+            True if these arrivals fired the event.
+
+        Notes
+        -----
+        The arrivals are counted and checked against the number expected in
+        a single transaction holding the lock of the barrier row: only the
+        caller whose conditional update marks the barrier fired, among all
+        concurrent processes, fires the event. Inside a batch statement, the
+        event is fired once the batch is committed, and not at all if it is
+        rolled back with the arrivals.
+        """
+        fired = self._arrive(count)
+        if fired:
+            si.after_commit(self.event.fire)
+        return fired
+
+    @_in_session()
+    def _arrive(self, count):
+        table = si.Barrier
+        for retry in self._session.retrying_nested():
+            with retry:
+                retry.retry_state.session.execute(
+                    si.sa.update(table).
+                    where(table.id == self._barrier.id).
+                    values(arrived=table.arrived + count, timestamp=datetime.datetime.utcnow()).
+                    execution_options(synchronize_session=False))
+                _fired = retry.retry_state.session.execute(
+                    si.sa.update(table).
+                    where(table.id == self._barrier.id).
+                    where(table.arrived >= table.expected).
+                    where(table.is_fired == False).
+                    values(is_fired=True).
+                    execution_options(synchronize_session=False)).rowcount == 1
+                retry.retry_state.commit()
+        self._session.expire(self._barrier, ['arrived', 'is_fired', 'timestamp'])
+        return _fired
+
+    @_in_session()
+    def reset(self):
+        """
+        Resets the count of arrivals of the barrier, so that its event may be
+        fired again.
+        """
+        self._barrier.arrived = 0
+        self._barrier.is_fired = False
+        self.update_timestamp()
+
+    @_in_session()
+    def update_timestamp(self):
+        """
+
+        """
+        si.touch(self._barrier)
+        self._session.commit()
+
+    def delete(self):
+        """
+        Delete corresponding row from the database.
+        """
+        si.delete(self._barrier)
+        self.__cache__.discard(self)
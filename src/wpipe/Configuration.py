@@ -5,9 +5,9 @@ Contains the Configuration class definition
 Please note that this module is private. The Configuration class
 is available in the main ``wpipe`` namespace - use that instead.
 """
-from .core import os, datetime, pd, si
-from .core import make_yield_session_if_not_cached, make_query_rtn_upd
-from .core import initialize_args, wpipe_to_sqlintf_connection, in_session
+from .core import os, datetime, si
+from .core import IdentityMap, make_yield_session_if_not_cached, make_query_rtn_upd
+from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, ThreadLocalAttribute, ThreadLocalMeta
 from .core import remove_path, split_path
 from .proxies import ChildrenProxy, DictLikeChildrenProxy
 from .DPOwner import DPOwner
@@ -29,7 +29,7 @@ _check_in_cache = make_yield_session_if_not_cached(KEYID_ATTR, UNIQ_ATTRS, CLASS
 _query_return_and_update_cached_row = make_query_rtn_upd(CLASS_LOW, KEYID_ATTR, UNIQ_ATTRS)
 
 
-class Configuration(DPOwner):
+class Configuration(DPOwner, metaclass=ThreadLocalMeta):
     """
         Represents target's configuration.
 
@@ -166,7 +166,8 @@ class Configuration(DPOwner):
         or
         >>> my_config = wp.Configuration(my_target, name_of_config)
     """
-    __cache__ = pd.DataFrame(columns=[KEYID_ATTR]+UNIQ_ATTRS+[CLASS_LOW])
+    __cache__ = IdentityMap(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+    _configuration = ThreadLocalAttribute()
 
     @classmethod
     def _check_in_cache(cls, kind, loc):
@@ -181,7 +182,7 @@ class Configuration(DPOwner):
     
     @classmethod
     def _return_cached_instances(cls):
-        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__[CLASS_LOW]]
+        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__]
 
     def __new__(cls, *args, **kwargs):
         if hasattr(cls, '_inst'):
@@ -267,7 +268,7 @@ class Configuration(DPOwner):
         # add instance to cache dataframe
         if cls._to_cache:
             cls._to_cache[CLASS_LOW] = cls._inst
-            cls.__cache__.loc[len(cls.__cache__)] = cls._to_cache
+            cls.__cache__.add(cls._to_cache)
             del cls._to_cache
         new_cls_inst = cls._inst
         delattr(cls, '_inst')
@@ -531,4 +532,4 @@ class Configuration(DPOwner):
         self.parameters.delete()
         self.jobs.delete()
         super(Configuration, self).delete(self.remove_data)
-        self.__class__.__cache__ = self.__cache__[self.__cache__[CLASS_LOW] != self]
+        self.__cache__.discard(self)
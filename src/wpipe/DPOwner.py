@@ -7,8 +7,8 @@ be used by itself, but through its inherited classes Pipeline, Input and
 Configuration.
 """
 from .core import datetime, si
-from .core import in_session
-from .core import split_path
+from .core import in_session, ThreadLocalAttribute, ThreadLocalMeta
+from .core import split_path, in_chunks
 from .proxies import ChildrenProxy
 
 __all__ = ['DPOwner']
@@ -20,7 +20,7 @@ def _in_session(**local_kw):
     return in_session('_%s' % CLASS_LOW, **local_kw)
 
 
-class DPOwner:
+class DPOwner(metaclass=ThreadLocalMeta):
     """
         Represents a dataproduct owner.
 
@@ -29,6 +29,9 @@ class DPOwner:
         capability to parent dataproducts. Please refer to their respective
         documentation for specific instructions.
     """
+    _dpowner = ThreadLocalAttribute()
+    _session = ThreadLocalAttribute(default=None)
+
     # @_in_session()
     def __init__(self):
         if not hasattr(self, '_dpowner'):
@@ -109,8 +112,7 @@ class DPOwner:
         dataproducts : list of :obj:`DataProduct`
             Filtered list of dataproducts.
         """
-        with self.dataproducts.hold_structure():
-            return self.dataproducts[self.dataproducts.group == group]
+        return self.dataproducts[self.dataproducts.column('group') == group]
 
     def dataproduct(self, *args, **kwargs):
         """
@@ -129,12 +131,71 @@ class DPOwner:
         from .DataProduct import DataProduct
         return DataProduct(self, *args, **kwargs)
 
+    def dataproducts_bulk(self, records):
+        """
+        Returns a list of dataproducts owned by the dpowner, registering in
+        bulk those that do not exist yet.
+
+        Existing rows are resolved with a single query per IN_CHUNK_SIZE
+        filenames, and the missing ones are inserted with a single flush and
+        commit, instead of one locking query and one commit per dataproduct.
+
+        Parameters
+        ----------
+        records : iterable of dict
+            Construction kwargs of each dataproduct: filename, relativepath
+            and group, and optionally data_type, subtype, filtername, ra, dec
+            and pointing_angle - refer to :class:`DataProduct`.
+
+        Returns
+        -------
+        dataproducts : list of :obj:`DataProduct`
+            Dataproducts corresponding to given records, in the same order.
+        """
+        from .DataProduct import DataProduct, _return_row_kwargs
+        records = [_return_row_kwargs(**record) for record in records]
+        keys = [(record['group'], record['filename']) for record in records]
+        if not keys:
+            return []
+        for session in si.begin_session():
+            with session as session:
+                session.add(self._dpowner)
+                dpowner_id = self._dpowner.id
+
+                def query_rows(this_session):
+                    rows = {}
+                    for filenames in in_chunks(set(key[1] for key in keys)):
+                        rows.update(((row.group, row.filename), row) for row in
+                                    this_session.query(si.DataProduct).
+                                    filter_by(dpowner_id=dpowner_id).
+                                    filter(si.DataProduct.filename.in_(filenames)).all())
+                    return rows
+
+                for retry in session.retrying_nested():
+                    with retry:
+                        this_nested = retry.retry_state.begin_nested()
+                        rows = query_rows(this_nested.session)
+                        missing = {}
+                        for key, record in zip(keys, records):
+                            if key not in rows and key not in missing:
+                                missing[key] = si.DataProduct(dpowner_id=dpowner_id, **record)
+                        if missing:
+                            this_nested.session.add_all(list(missing.values()))
+                            this_nested.commit()
+                            session.expire(self._dpowner, ['dataproducts'])
+                        else:
+                            this_nested.rollback()
+                        retry.retry_state.commit()
+                # reloading all rows in one query as the commit expired them
+                rows = query_rows(session)
+                return [DataProduct(rows[key]) for key in keys]
+
     @_in_session()
     def update_timestamp(self):
         """
 
         """
-        self._dpowner.timestamp = datetime.datetime.utcnow()
+        si.touch(self._dpowner)
         self._session.commit()
 
     def delete(self, *predeletes):
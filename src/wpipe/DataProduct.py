@@ -5,9 +5,9 @@ Contains the DataProduct class definition
 Please note that this module is private. The DataProduct class is
 available in the main ``wpipe`` namespace - use that instead.
 """
-from .core import os, shutil, datetime, pd, si
-from .core import make_yield_session_if_not_cached, make_query_rtn_upd
-from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, return_dict_of_attrs
+from .core import os, shutil, datetime, si
+from .core import IdentityMap, make_yield_session_if_not_cached, make_query_rtn_upd
+from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, ThreadLocalAttribute, ThreadLocalMeta, return_dict_of_attrs
 from .core import clean_path, remove_path, split_path
 from .OptOwner import OptOwner
 
@@ -27,8 +27,29 @@ _check_in_cache = make_yield_session_if_not_cached(KEYID_ATTR, UNIQ_ATTRS, CLASS
 
 _query_return_and_update_cached_row = make_query_rtn_upd(CLASS_LOW, KEYID_ATTR, UNIQ_ATTRS)
 
+SUFFIXES = ['fits', 'txt', 'head', 'cl', 'py', 'pyc', 'pl', 'phot', 'png', 'jpg', 'ps', 'gz', 'dat', 'lst', 'sh']
 
-class DataProduct(OptOwner):
+
+def _return_suffix(filename):
+    suffix = filename.split('.')[-1] if '.' in filename else ' '
+    return suffix if suffix in SUFFIXES else 'other'
+
+
+def _return_row_kwargs(filename, relativepath, group, data_type=None, subtype=None, filtername=None,
+                       ra=None, dec=None, pointing_angle=None):
+    return dict(filename=filename,
+                relativepath=clean_path(relativepath),
+                suffix=_return_suffix(filename),
+                data_type='' if data_type is None else data_type,
+                subtype='' if subtype is None else subtype,
+                group=group,
+                filtername='' if filtername is None else filtername,
+                ra=0 if ra is None else ra,
+                dec=0 if dec is None else dec,
+                pointing_angle=0 if pointing_angle is None else pointing_angle)
+
+
+class DataProduct(OptOwner, metaclass=ThreadLocalMeta):
     """
         Represents a dataproduct owned by a pipeline, an input or a config.
 
@@ -175,7 +196,8 @@ class DataProduct(OptOwner):
         or
         >>> my_dp = wp.DataProduct(my_config, filename, group)
     """
-    __cache__ = pd.DataFrame(columns=[KEYID_ATTR]+UNIQ_ATTRS+[CLASS_LOW])
+    __cache__ = IdentityMap(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+    _dataproduct = ThreadLocalAttribute()
 
     @classmethod
     def _check_in_cache(cls, kind, loc):
@@ -190,7 +212,7 @@ class DataProduct(OptOwner):
     
     @classmethod
     def _return_cached_instances(cls):
-        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__[CLASS_LOW]]
+        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__]
 
     def __new__(cls, *args, **kwargs):
         if hasattr(cls, '_inst'):
@@ -231,17 +253,9 @@ class DataProduct(OptOwner):
                                 filter_by(group=group). \
                                 filter_by(filename=filename).one_or_none()
                             if cls._dataproduct is None:
-                                if '.' in filename:
-                                    _suffix = filename.split('.')[-1]
-                                else:
-                                    _suffix = ' '
-                                if _suffix not in ['fits', 'txt', 'head', 'cl',
-                                                   'py', 'pyc', 'pl', 'phot', 'png', 'jpg', 'ps',
-                                                   'gz', 'dat', 'lst', 'sh']:
-                                    _suffix = 'other'
                                 cls._dataproduct = si.DataProduct(filename=filename,
                                                                   relativepath=relativepath,
-                                                                  suffix=_suffix,
+                                                                  suffix=_return_suffix(filename),
                                                                   data_type=data_type,
                                                                   subtype=subtype,
                                                                   group=group,
@@ -261,7 +275,7 @@ class DataProduct(OptOwner):
         # add instance to cache dataframe
         if cls._to_cache:
             cls._to_cache[CLASS_LOW] = cls._inst
-            cls.__cache__.loc[len(cls.__cache__)] = cls._to_cache
+            cls.__cache__.add(cls._to_cache)
             del cls._to_cache
         new_cls_inst = cls._inst
         delattr(cls, '_inst')
@@ -672,4 +686,4 @@ class DataProduct(OptOwner):
         except TypeError:
             pass
         super(DataProduct, self).delete()
-        self.__class__.__cache__ = self.__cache__[self.__cache__[CLASS_LOW] != self]
+        self.__cache__.discard(self)
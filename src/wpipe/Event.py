@@ -6,12 +6,15 @@ Please note that this module is private. The Event class is
 available in the main ``wpipe`` namespace - use that instead.
 """
 from wpipe.scheduler.ConsumerFactory import get_send_job_factory, get_consumer_factory
-from .core import os, datetime, subprocess, pd, si
-from .core import make_yield_session_if_not_cached, make_query_rtn_upd
-from .core import initialize_args, wpipe_to_sqlintf_connection, in_session
-from .core import as_int, split_path
+from wpipe.scheduler import localconsumer, sendJobToLocal
+from .constants import WPIPE_LOCAL_EXECUTOR, WPIPE_MEMOIZE
+from .core import os, datetime, subprocess, contextlib, json, hashlib, si
+from .core import IdentityMap, make_yield_session_if_not_cached, make_query_rtn_upd
+from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, ThreadLocalAttribute, ThreadLocalMeta
+from .core import as_int, split_path, file_digest
 from .core import PARSER
 from .proxies import ChildrenProxy
+from .proxies.core import decode_value
 from .OptOwner import OptOwner
 
 __all__ = ['Event']
@@ -23,6 +26,12 @@ KEYID_ATTR = 'event_id'
 UNIQ_ATTRS = getattr(si, CLASS_NAME).__UNIQ_ATTRS__
 CLASS_LOW = CLASS_NAME.lower()
 
+MEMO_DP_GROUPS = ['raw', 'conf']
+"""
+list: groups of the dataproducts of the configuration which contents enter the
+digest of a memoized job.
+"""
+
 
 def _in_session(**local_kw):
     return in_session('_%s' % CLASS_LOW, **local_kw)
@@ -33,7 +42,47 @@ _check_in_cache = make_yield_session_if_not_cached(KEYID_ATTR, UNIQ_ATTRS, CLASS
 _query_return_and_update_cached_row = make_query_rtn_upd(CLASS_LOW, KEYID_ATTR, UNIQ_ATTRS)
 
 
-class Event(OptOwner):
+def _option_value(options, name):
+    # options given as rows of name, value and value_type
+    for option in options:
+        if option.name == name:
+            return decode_value(option.value, option.value_type)
+    return None
+
+
+def _config_id(options, parent_config_id):
+    config_id = _option_value(options, 'config_id')
+    return parent_config_id if config_id is None else config_id
+
+
+def _memoizes(options):
+    return bool(WPIPE_MEMOIZE or _option_value(options, 'memoize'))
+
+
+def _config_memo_content(session, config_id):
+    content = sorted([parameter.name, parameter.value, parameter.value_type] for parameter in
+                     session.query(si.Parameter.name, si.Parameter.value, si.Parameter.value_type).
+                     filter_by(config_id=config_id))
+    content += sorted([dp.group, dp.filename, file_digest(dp.relativepath + '/' + dp.filename)] for dp in
+                      session.query(si.DataProduct.group, si.DataProduct.filename, si.DataProduct.relativepath).
+                      filter_by(dpowner_id=config_id).
+                      filter(si.DataProduct.group.in_(MEMO_DP_GROUPS)))
+    return content
+
+
+def _refers_to_dataproduct(name):
+    return name == 'dp_id' or name.endswith('_dp_id')
+
+
+def _dataproduct_memo_content(session, dp_id):
+    dp = session.query(si.DataProduct.group, si.DataProduct.filename, si.DataProduct.relativepath). \
+        filter_by(id=dp_id).one_or_none()
+    if dp is None:
+        return [dp_id]
+    return [dp.group, dp.filename, file_digest(dp.relativepath + '/' + dp.filename)]
+
+
+class Event(OptOwner, metaclass=ThreadLocalMeta):
     """
         Represents a fired event of a WINGS pipeline.
 
@@ -138,8 +187,23 @@ class Event(OptOwner):
         parent configuration of the parent job of the event, unless the event
         owns an option named 'config_id' in which case the job is owned by the
         corresponding configuration.
+
+        The jobs of events owning an option 'memoize' set to True, or of all
+        events if the environment variable WPIPE_MEMOIZE is set, are memoized:
+        before submitting such a job, Event.fire computes a digest of the task
+        executable, the name, tag, value and options of the event, the
+        dataproducts that its options 'dp_id' or ending with '_dp_id' refer
+        to, and the parameters and raw and configuration dataproducts of the
+        configuration - the dataproducts enter by their contents, and the other
+        options which name ends with '_id', referring to table rows, are left
+        out. If a job of same task and digest completed before in the
+        pipeline, the new job is marked completed without running, and the
+        child events that job fired are fired again. This suits the tasks
+        which outputs are kept where their child tasks find them, through
+        pipeline resets included.
     """
-    __cache__ = pd.DataFrame(columns=[KEYID_ATTR]+UNIQ_ATTRS+[CLASS_LOW])
+    __cache__ = IdentityMap(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+    _event = ThreadLocalAttribute()
 
     @classmethod
     def _check_in_cache(cls, kind, loc):
@@ -154,7 +218,7 @@ class Event(OptOwner):
     
     @classmethod
     def _return_cached_instances(cls):
-        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__[CLASS_LOW]]
+        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__]
 
     def __new__(cls, *args, **kwargs):
         if hasattr(cls, '_inst'):
@@ -204,7 +268,7 @@ class Event(OptOwner):
         # add instance to cache dataframe
         if cls._to_cache:
             cls._to_cache[CLASS_LOW] = cls._inst
-            cls.__cache__.loc[len(cls.__cache__)] = cls._to_cache
+            cls.__cache__.add(cls._to_cache)
             del cls._to_cache
         new_cls_inst = cls._inst
         delattr(cls, '_inst')
@@ -399,72 +463,265 @@ class Event(OptOwner):
         job has completed. In the case it did, it calls the fire method of
         each child event of that jobs. In the case, it did not complete, it
         either fires the task again if the job did not complete due to an
-        error, or it does nothing if the job is just still running.
+        error, or it does nothing if the job is just still running. A job
+        which heartbeat is stale is expired and fired again - refer to
+        :meth:`Job.reap`.
         """
         if len(self.fired_jobs):
             fired_job = self.fired_jobs[-1]
             if fired_job.has_completed:
                 if len(fired_job.child_events):
-                    for child_event in fired_job.child_events:
-                        child_event.fire()
+                    self.fire_many(fired_job.child_events)
                 else:
                     print()  # that branch has completed
             else:
-                if fired_job.is_active:
+                if fired_job.is_active and not fired_job.is_stale:
                     print()  # fired_job keep going
                 else:
+                    if fired_job.is_active:
+                        fired_job.expire()  # fired_job stopped beating
                     if fired_job.has_expired or fired_job.task_changed:
                         self.__fire(fired_job.task)
                     else:
                         print()  # task will produce same error
         else:
-            for task in self.pipeline.tasks:
-                for mask in task.masks:
-                    if (self.name == mask.name) & ((self.value == mask.value) | (mask.value == '*')):
-                        self.__fire(task)
-                        return
-            raise ValueError(
-                "No mask corresponding to event signature {name='%s',value='%s'}" % (self.name, self.value))
+            self.__fire(self._route(self.pipeline))
 
-    def __fire(self, task):  # MEH
-        my_pipe = self.pipeline
-        with my_pipe.dummy_job.logprint().open("a") as stdouterr:
-            options = self.options
-
-            print(options)
-            submission_type = None
-
-            # TODO: Clean this mess up
-            if self.config is not None:
-                try:
-                    configParameters = self.config.parameters  # dict
-                    submission_type = configParameters['submission_type']
-                except KeyError:
-                    pass
+    @classmethod
+    def fire_many(cls, events):
+        """
+        Fire the tasks associated to given events, as a batch.
+
+        Parameters
+        ----------
+        events : iterable of :obj:`Event`
+            Events to fire.
+
+        Notes
+        -----
+        The state that the firing of the events reads is queried once for the
+        whole batch: whether they were already fired, their signatures and
+        options, the nodes and configurations of their parent jobs, and the
+        memoized jobs matching their digests. The mask to task routing uses
+        the routing index of each pipeline, the log of each pipeline is
+        opened once, and all jobs to submit to the scheduler are sent
+        together in a single transmission. Events that were already
+        previously fired go through the fire method one by one.
+        """
+        events = list(events)
+        if not events:
+            return
+        fired, signatures, options, parent_jobs, submission_types = cls._query_batch(
+            [event.event_id for event in events])
+        pipes = {}
+        routes = {}
+        to_fire = []
+        contents = {}
+        for event in events:
+            if event.event_id in fired:
+                event.fire()
+                continue
+            signature = signatures[event.event_id]
+            if signature.parent_job_id not in pipes:
+                pipes[signature.parent_job_id] = event.pipeline
+            my_pipe = pipes[signature.parent_job_id]
+            route = (my_pipe.pipeline_id, signature.name, signature.value)
+            if route not in routes:
+                routes[route] = event._route(my_pipe)
+            task = routes[route]
+            parent_job = parent_jobs[signature.parent_job_id]
+            these_options = options[event.event_id]
+            config_id = _config_id(these_options, parent_job.config_id)
+            memo_digest = event._memo_digest(task, these_options, config_id, contents)
+            for_scheduler = cls._for_scheduler(submission_types.get(config_id),
+                                               _option_value(these_options, 'submission_type'),
+                                               parent_job.node_name)
+            to_fire.append((event, my_pipe, task, memo_digest, for_scheduler))
+        memos = cls._query_memos(set((task.pipeline_id, task.name, memo_digest)
+                                     for _, _, task, memo_digest, _ in to_fire if memo_digest is not None))
+        to_schedule = []
+        with contextlib.ExitStack() as stack:
+            logs = {}
+            for event, my_pipe, task, memo_digest, for_scheduler in to_fire:
+                if event._replay_memo(task, memo_digest, memos):
+                    continue
+                if for_scheduler:
+                    to_schedule.append(event._generate_new_job(task, memo_digest))
+                    continue
+                if my_pipe.pipeline_id not in logs:
+                    logs[my_pipe.pipeline_id] = stack.enter_context(my_pipe.dummy_job.logprint().open("a"))
+                event._spawn(task, my_pipe, logs[my_pipe.pipeline_id], memo_digest)
+        if to_schedule:
+            consumer = get_consumer_factory()
+            send_job = get_send_job_factory()
+
+            consumer('start')
+            send_job(to_schedule)
+
+    @staticmethod
+    def _query_batch(event_ids):
+        jobs = si.Job.__table__
+        events = si.Event.__table__
+        options = si.Option.__table__
+        nodes = si.Node.__table__
+        parameters = si.Parameter.__table__
+        for session in si.begin_session():
+            with session as session:
+                fired = set(session.execute(si.sa.select(jobs.c.firing_event_id).distinct().
+                                            where(jobs.c.firing_event_id.in_(event_ids))).scalars())
+                signatures = dict((row.id, row) for row in
+                                  session.execute(si.sa.select(events.c.id, events.c.name, events.c.value,
+                                                               events.c.parent_job_id).
+                                                  where(events.c.id.in_(event_ids))))
+                event_options = dict((event_id, []) for event_id in event_ids)
+                for row in session.execute(si.sa.select(options.c.optowner_id, options.c.name, options.c.value,
+                                                        options.c.value_type).
+                                           where(options.c.optowner_id.in_(event_ids))):
+                    event_options[row.optowner_id].append(row)
+                parent_jobs = dict((row.id, row) for row in
+                                   session.execute(si.sa.select(jobs.c.id, jobs.c.config_id,
+                                                                nodes.c.name.label('node_name')).
+                                                   select_from(jobs.outerjoin(nodes, jobs.c.node_id == nodes.c.id)).
+                                                   where(jobs.c.id.in_(set(row.parent_job_id
+                                                                           for row in signatures.values())))))
+                config_ids = set(_config_id(event_options[event_id], parent_jobs[row.parent_job_id].config_id)
+                                 for event_id, row in signatures.items())
+                submission_types = dict((row.config_id, decode_value(row.value, row.value_type)) for row in
+                                        session.execute(si.sa.select(parameters.c.config_id, parameters.c.value,
+                                                                     parameters.c.value_type).
+                                                        where(parameters.c.name == 'submission_type').
+                                                        where(parameters.c.config_id.in_(config_ids))))
+                return fired, signatures, event_options, parent_jobs, submission_types
+
+    @staticmethod
+    def _query_memos(keys):
+        if not keys:
+            return {}
+        memos = si.Memo.__table__
+        for session in si.begin_session():
+            with session as session:
+                return dict(((row.pipeline_id, row.task_name, row.digest), row) for row in
+                            session.execute(si.sa.select(memos.c.pipeline_id, memos.c.task_name, memos.c.digest,
+                                                         memos.c.job_id, memos.c.child_events).
+                                            where(memos.c.pipeline_id.in_(set(key[0] for key in keys))).
+                                            where(memos.c.digest.in_(set(key[2] for key in keys))))
+                            if (row.pipeline_id, row.task_name, row.digest) in keys)
+
+    def _route(self, my_pipe):
+        name, value = self.name, self.value
+        task = my_pipe._route(name, value)
+        if task is not None:
+            return task
+        raise ValueError(
+            "No mask corresponding to event signature {name='%s',value='%s'}" % (name, value))
+
+    def _is_for_scheduler(self):
+        options = self.options
+        config_type = None
+        if self.config is not None:
             try:
-                submission_type = options['submission_type']
+                config_type = self.config.parameters['submission_type']
             except KeyError:
                 pass
-            if self.parent_job.has_a_node:
-                # if not self.parent_job.node.is_head:  # TODO
-                if self.parent_job.node.name[:1] == 'r':
-                    submission_type = 'scheduler'
-            if 'scheduler' == submission_type and 'WPIPE_NO_SCHEDULER' not in os.environ.keys():
+        try:
+            option_type = options['submission_type']
+        except KeyError:
+            option_type = None
+        node_name = self.parent_job.node.name if self.parent_job.has_a_node else None
+        return self._for_scheduler(config_type, option_type, node_name)
+
+    @staticmethod
+    def _for_scheduler(config_type, option_type, node_name):
+        # the event options take precedence over the configuration parameters
+        submission_type = config_type if option_type is None else option_type
+        # if not self.parent_job.node.is_head:  # TODO
+        if node_name is not None and node_name[:1] == 'r':
+            submission_type = 'scheduler'
+        return 'scheduler' == submission_type and 'WPIPE_NO_SCHEDULER' not in os.environ.keys()
+
+    def _spawn(self, task, my_pipe, stdouterr, memo_digest=None):
+        if WPIPE_LOCAL_EXECUTOR:
+            # queued to the LocalConsumer daemon, which bounds the number of
+            # concurrent job processes on this machine
+            localconsumer('start')
+            sendJobToLocal(self._generate_new_job(task, memo_digest), stdouterr.name)
+            return
+        if memo_digest is not None:
+            # made beforehand to hold the digest the job records at its end
+            job_args = ['-j', str(self._generate_new_job(task, memo_digest).job_id)]
+        else:
+            job_args = ['-e', str(self.event_id)]
+        print(task.executable, *job_args, ''+si.core.verbose*'-v')
+        subprocess.Popen([task.executable]+job_args+si.core.verbose*['-v'],
+                         cwd=my_pipe.pipe_root, stdout=stdouterr, stderr=stdouterr)
+
+    def __fire(self, task):  # MEH
+        memo_digest = self._memo_digest(task)
+        if self._replay_memo(task, memo_digest):
+            return
+        my_pipe = self.pipeline
+        with my_pipe.dummy_job.logprint().open("a") as stdouterr:
+            if self._is_for_scheduler():
                 consumer = get_consumer_factory()
                 send_job = get_send_job_factory()
 
                 consumer('start')
-                send_job(self._generate_new_job(task))
+                send_job(self._generate_new_job(task, memo_digest))
                 return
             else:  # TODO elif submission_type is None:
-                print(task.executable, '-e', str(self.event_id), ''+si.core.verbose*'-v')
-                subprocess.Popen([task.executable, '-e', str(self.event_id)]+si.core.verbose*['-v'],
-                                 cwd=my_pipe.pipe_root, stdout=stdouterr, stderr=stdouterr)
+                self._spawn(task, my_pipe, stdouterr, memo_digest)
             # else:
             #     raise ValueError("'%s' isn't a valid 'submission_type'" % submission_type)
 
-    def _generate_new_job(self, task):
-        return self.fired_job(len(self.fired_jobs) + 1, task, self.config)
+    def _generate_new_job(self, task, memo_digest=None):
+        return self.fired_job(len(self.fired_jobs) + 1, task, self.config,
+                              options={} if memo_digest is None else {'memo_digest': memo_digest})
+
+    @_in_session()
+    def _memo_digest(self, task, options=None, config_id=None, contents=None):
+        if options is None:
+            options = self._session.query(si.Option.name, si.Option.value, si.Option.value_type). \
+                filter_by(optowner_id=self._event.id).all()
+            if not _memoizes(options):
+                return None
+            config = self.config
+            config_id = None if config is None else config.config_id
+        elif not _memoizes(options):
+            return None
+        if contents is None:
+            contents = {}
+        content = [[task.name, file_digest(task.executable)],
+                   [self._event.name, self._event.tag, self._event.value]]
+        content += sorted([option.name, option.value, option.value_type] for option in options
+                          if not option.name.endswith('_id') and option.name != 'memoize')
+        for option in sorted(options, key=lambda option: option.name):
+            if _refers_to_dataproduct(option.name):
+                dp_id = decode_value(option.value, option.value_type)
+                if ('dataproduct', dp_id) not in contents:
+                    contents['dataproduct', dp_id] = _dataproduct_memo_content(self._session, dp_id)
+                content.append([option.name] + contents['dataproduct', dp_id])
+        if config_id is not None:
+            if ('configuration', config_id) not in contents:
+                contents['configuration', config_id] = _config_memo_content(self._session, config_id)
+            content += contents['configuration', config_id]
+        return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+    def _replay_memo(self, task, memo_digest, memos=None):
+        if memo_digest is None:
+            return False
+        if memos is None:
+            memos = self._query_memos({(task.pipeline_id, task.name, memo_digest)})
+        memo = memos.get((task.pipeline_id, task.name, memo_digest))
+        if memo is None:
+            return False
+        job = self._generate_new_job(task, memo_digest)
+        job._complete_from_memo(memo.job_id)
+        events = job.child_events_bulk([dict(spec, options=dict((name, decode_value(value, value_type))
+                                                                for name, value, value_type in spec['options']))
+                                        for spec in json.loads(memo.child_events)])
+        if events:
+            self.fire_many(events)
+        return True
 
     def delete(self):
         """
@@ -472,4 +729,4 @@ class Event(OptOwner):
         """
         self.fired_jobs.delete()
         super(Event, self).delete()
-        self.__class__.__cache__ = self.__cache__[self.__cache__[CLASS_LOW] != self]
+        self.__cache__.discard(self)
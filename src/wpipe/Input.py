@@ -5,9 +5,9 @@ Contains the Input class definition
 Please note that this module is private. The Input class is
 available in the main ``wpipe`` namespace - use that instead.
 """
-from .core import os, glob, shutil, datetime, pd, si
-from .core import make_yield_session_if_not_cached, make_query_rtn_upd
-from .core import initialize_args, wpipe_to_sqlintf_connection, in_session
+from .core import os, glob, shutil, datetime, si
+from .core import IdentityMap, make_yield_session_if_not_cached, make_query_rtn_upd
+from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, ThreadLocalAttribute, ThreadLocalMeta
 from .core import clean_path, remove_path, split_path
 from .proxies import ChildrenProxy
 from .DPOwner import DPOwner
@@ -29,7 +29,7 @@ _check_in_cache = make_yield_session_if_not_cached(KEYID_ATTR, UNIQ_ATTRS, CLASS
 _query_return_and_update_cached_row = make_query_rtn_upd(CLASS_LOW, KEYID_ATTR, UNIQ_ATTRS)
 
 
-class Input(DPOwner):
+class Input(DPOwner, metaclass=ThreadLocalMeta):
     """
         Represents a pipeline's input.
 
@@ -138,7 +138,8 @@ class Input(DPOwner):
         >>> # else
         >>> new_target = my_input.target()
     """
-    __cache__ = pd.DataFrame(columns=[KEYID_ATTR]+UNIQ_ATTRS+[CLASS_LOW])
+    __cache__ = IdentityMap(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+    _input = ThreadLocalAttribute()
 
     @classmethod
     def _check_in_cache(cls, kind, loc):
@@ -153,7 +154,7 @@ class Input(DPOwner):
     
     @classmethod
     def _return_cached_instances(cls):
-        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__[CLASS_LOW]]
+        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__]
 
     def __new__(cls, *args, **kwargs):
         if hasattr(cls, '_inst'):
@@ -203,7 +204,7 @@ class Input(DPOwner):
         # add instance to cache dataframe
         if cls._to_cache:
             cls._to_cache[CLASS_LOW] = cls._inst
-            cls.__cache__.loc[len(cls.__cache__)] = cls._to_cache
+            cls.__cache__.add(cls._to_cache)
             del cls._to_cache
         new_cls_inst = cls._inst
         delattr(cls, '_inst')
@@ -259,13 +260,15 @@ class Input(DPOwner):
                         shutil.copy2(filepath, cls._input.rawspath + '/')
 
     def _verify_raws(self):
+        records = []
         for filename in glob.glob(self.rawspath+'/*'):
             if os.path.splitext(filename)[-1] == '.conf':
                 self.make_config(filename)
                 os.remove(filename)
             else:
                 base, name = os.path.split(filename)
-                self.dataproduct(filename=name, relativepath=base, group='raw')
+                records.append(dict(filename=name, relativepath=base, group='raw'))
+        self.dataproducts_bulk(records)
 
     @property
     def parents(self):
@@ -392,4 +395,4 @@ class Input(DPOwner):
         """
         self.reset()
         super(Input, self).delete(self.remove_data)
-        self.__class__.__cache__ = self.__cache__[self.__cache__[CLASS_LOW] != self]
+        self.__cache__.discard(self)
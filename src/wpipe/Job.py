@@ -5,22 +5,44 @@ Contains the Job class definition
 Please note that this module is private. The Job class is
 available in the main ``wpipe`` namespace - use that instead.
 """
+import resource
+import threading
 from .constants import LOGPRINT_TIMESTAMP
-from .core import sys, logging, datetime, pd, si
-from .core import make_yield_session_if_not_cached, make_query_rtn_upd
-from .core import initialize_args, wpipe_to_sqlintf_connection, in_session
-from .core import as_int, split_path
+from .core import os, sys, logging, datetime, json, si
+from .core import IdentityMap, make_yield_session_if_not_cached, make_query_rtn_upd
+from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, ThreadLocalAttribute, ThreadLocalMeta
+from .core import as_int, split_path, in_chunks
 from .core import PARSER
 from .proxies import ChildrenProxy
 from .OptOwner import OptOwner
 
-__all__ = ['Job', 'JOBINITSTATE', 'JOBSUBMSTATE', 'JOBCOMPSTATE', 'JOBEXPISTATE']
+__all__ = ['Job', 'JOBINITSTATE', 'JOBSUBMSTATE', 'JOBCOMPSTATE', 'JOBEXPISTATE',
+           'HEARTBEAT_INTERVAL', 'HEARTBEAT_TIMEOUT']
 
 JOBINITSTATE = "Initialized"
 JOBSUBMSTATE = "Submitted"
 JOBCOMPSTATE = "Completed"
 JOBEXPISTATE = "Expired"
 
+MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+"""
+int: number of bytes in the unit of the peak resident set size given by
+resource.getrusage, which is bytes on macOS and kilobytes elsewhere.
+"""
+
+HEARTBEAT_INTERVAL = float(os.environ.get('WPIPE_HEARTBEAT_INTERVAL', 60))
+"""
+float: seconds between two heartbeats of a running job, given by the
+environment variable WPIPE_HEARTBEAT_INTERVAL - defaults to 60.
+"""
+
+HEARTBEAT_TIMEOUT = float(os.environ.get('WPIPE_HEARTBEAT_TIMEOUT', 600))
+"""
+float: age in seconds of the last heartbeat past which a submitted job is
+considered stale, given by the environment variable WPIPE_HEARTBEAT_TIMEOUT -
+defaults to 600.
+"""
+
 CLASS_NAME = split_path(__file__)[1]
 KEYID_ATTR = 'job_id'
 UNIQ_ATTRS = getattr(si, CLASS_NAME).__UNIQ_ATTRS__
@@ -35,8 +57,31 @@ _check_in_cache = make_yield_session_if_not_cached(KEYID_ATTR, UNIQ_ATTRS, CLASS
 
 _query_return_and_update_cached_row = make_query_rtn_upd(CLASS_LOW, KEYID_ATTR, UNIQ_ATTRS)
 
+_HEARTBEATS = {}
+
+
+class _Heartbeat(threading.Thread):
+    # updates the heartbeat of a running job until stopped, so that a job
+    # which process died is recognized by its stale heartbeat
+    def __init__(self, job_id):
+        super(_Heartbeat, self).__init__(name='wpipe-heartbeat-%d' % job_id, daemon=True)
+        self.job_id = job_id
+        self.stopped = threading.Event()
 
-class Job(OptOwner):
+    def run(self):
+        table = si.Job.__table__
+        while not self.stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                with si.get_engine().begin() as conn:
+                    conn.execute(si.sa.update(table).
+                                 where(table.c.id == self.job_id).
+                                 where(table.c.state == JOBSUBMSTATE).
+                                 values(heartbeat=datetime.datetime.utcnow()))
+            except si.exc.SQLAlchemyError as error:
+                logging.warning("Heartbeat of job %d failed: %r" % (self.job_id, error))
+
+
+class Job(OptOwner, metaclass=ThreadLocalMeta):
     """
         Represents a submitted job of a WINGS pipeline.
 
@@ -106,8 +151,15 @@ class Job(OptOwner):
             Timestamp of job starting time.
         endtime : datetime.datetime object
             Timestamp of job ending time.
+        heartbeat : datetime.datetime object
+            Timestamp of last heartbeat of the running job.
+        metrics : dict
+            Resources used by the last run of the job.
         is_active : boolean
             True if job is active, False if not.
+        is_stale : boolean
+            True if job is active but its heartbeat is older than
+            HEARTBEAT_TIMEOUT, False if not.
         has_completed : boolean
             True if job has ended, False if not.
         has_expired : boolean
@@ -142,6 +194,8 @@ class Job(OptOwner):
             Event object corresponding to parent event.
         child_events : core.ChildrenProxy object
             List of Event objects owned by the job.
+        barriers : core.ChildrenProxy object
+            List of Barrier objects owned by the job.
         optowner_id : int
             Points to attribute job_id.
         options : core.DictLikeChildrenProxy object
@@ -193,7 +247,8 @@ class Job(OptOwner):
          - Job.child_event is the Event-generating object method of Job, which
            handles the starting of new jobs from an existing job,
     """
-    __cache__ = pd.DataFrame(columns=[KEYID_ATTR]+UNIQ_ATTRS+[CLASS_LOW])
+    __cache__ = IdentityMap(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+    _job = ThreadLocalAttribute()
 
     @classmethod
     def _check_in_cache(cls, kind, loc):
@@ -254,7 +309,8 @@ class Job(OptOwner):
                                 filter_by(attempt=attempt).one_or_none()
                             if cls._job is None:
                                 cls._job = si.Job(attempt=attempt,
-                                                  state=JOBINITSTATE)
+                                                  state=JOBINITSTATE,
+                                                  timestamp=datetime.datetime.utcnow())
                                 task._task.jobs.append(cls._job)
                                 if config is not None:
                                     config._configuration.jobs.append(cls._job)
@@ -273,7 +329,7 @@ class Job(OptOwner):
         # add instance to cache dataframe
         if cls._to_cache:
             cls._to_cache[CLASS_LOW] = cls._inst
-            cls.__cache__.loc[len(cls.__cache__)] = cls._to_cache
+            cls.__cache__.add(cls._to_cache)
             del cls._to_cache
         new_cls_inst = cls._inst
         delattr(cls, '_inst')
@@ -283,12 +339,14 @@ class Job(OptOwner):
     
     @classmethod
     def _return_cached_instances(cls):
-        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__[CLASS_LOW]]
+        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__]
 
     @_in_session()
     def __init__(self, *args, **kwargs):
         if not hasattr(self, '_child_events_proxy'):
             self._child_events_proxy = ChildrenProxy(self._job, 'child_events', 'Event')
+        if not hasattr(self, '_barriers_proxy'):
+            self._barriers_proxy = ChildrenProxy(self._job, 'barriers', 'Barrier')
         if not hasattr(self, '_log_dp'):
             if not self.config_is_none:
                 logpath = self.target.datapath + '/log_' + self.config.name
@@ -390,6 +448,32 @@ class Job(OptOwner):
         self._session.refresh(self._job)
         return self._job.endtime
 
+    @property
+    @_in_session()
+    def heartbeat(self):
+        """
+        :obj:`datetime.datetime`: Timestamp of last heartbeat of the running
+        job.
+        """
+        self._session.refresh(self._job)
+        return self._job.heartbeat
+
+    @property
+    @_in_session()
+    def metrics(self):
+        """
+        dict: Resources used by the last run of the job, as recorded in the
+        `job_metrics` table when it ended - None if not recorded.
+        """
+        # ids of deleted jobs may be reused: the metrics precede the run
+        metric = self._session.query(si.JobMetric).filter_by(job_id=self._job.id). \
+            filter(si.JobMetric.timestamp >= self._job.starttime). \
+            order_by(si.JobMetric.id.desc()).first() if self._job.starttime is not None else None
+        if metric is None:
+            return None
+        return dict((column.name, getattr(metric, column.name))
+                    for column in si.JobMetric.__table__.columns if column.name != 'id')
+
     @property
     def not_submitted(self):
         """
@@ -404,6 +488,16 @@ class Job(OptOwner):
         """
         return self.state == JOBSUBMSTATE
 
+    @property
+    def is_stale(self):
+        """
+        bool: True if job is active but its heartbeat is older than
+        HEARTBEAT_TIMEOUT, False if not.
+        """
+        if not self.is_active or self.heartbeat is None:
+            return False
+        return (datetime.datetime.utcnow() - self.heartbeat).total_seconds() > HEARTBEAT_TIMEOUT
+
     @property
     def has_completed(self):
         """
@@ -604,6 +698,123 @@ class Job(OptOwner):
         from .Event import Event
         return Event(self, *args, **kwargs)
 
+    @property
+    def barriers(self):
+        """
+        :obj:`core.ChildrenProxy`: List of Barrier objects owned by the job.
+        """
+        return self._barriers_proxy
+
+    def barrier(self, *args, **kwargs):
+        """
+        Returns a barrier owned by the job.
+
+        Parameters
+        ----------
+        kwargs
+            Refer to :class:`Barrier` for parameters.
+
+        Returns
+        -------
+        barrier : :obj:`Barrier`
+            Barrier corresponding to given kwargs.
+        """
+        from .Barrier import Barrier
+        return Barrier(self, *args, **kwargs)
+
+    def child_events_bulk(self, specs):
+        """
+        Returns a list of events owned by the job, creating in bulk those that
+        do not exist yet together with their options.
+
+        Existing events and options are resolved with a single query each per
+        IN_CHUNK_SIZE names or events, the missing events are inserted with a
+        single flush and commit, and the missing options with a single
+        multi-row insert.
+
+        Parameters
+        ----------
+        specs : iterable of dict
+            Construction kwargs of each event: name, and optionally tag,
+            jargs, value and options - refer to :class:`Event`.
+
+        Returns
+        -------
+        events : list of :obj:`Event`
+            Events corresponding to given specs, in the same order.
+        """
+        from .Event import Event
+        from .Option import _return_counter
+        from .proxies.core import encode_value
+        specs = [dict((key, item) for key, item in spec.items() if item is not None) for spec in specs]
+        # the tags are stored and read back as strings
+        keys = [(spec['name'], str(spec.get('tag', ''))) for spec in specs]
+        if not keys:
+            return []
+        for session in si.begin_session():
+            with session as session:
+                session.add(self._job)
+                job_id = self._job.id
+
+                def query_rows(this_session):
+                    rows = {}
+                    for names in in_chunks(set(key[0] for key in keys)):
+                        rows.update(((row.name, row.tag), row) for row in
+                                    this_session.query(si.Event).
+                                    filter_by(parent_job_id=job_id).
+                                    filter(si.Event.name.in_(names)).all())
+                    return rows
+
+                for retry in session.retrying_nested():
+                    with retry:
+                        this_nested = retry.retry_state.begin_nested()
+                        rows = query_rows(this_nested.session)
+                        missing = {}
+                        for key, spec in zip(keys, specs):
+                            if key not in rows and key not in missing:
+                                missing[key] = si.Event(parent_job_id=job_id,
+                                                        name=key[0],
+                                                        tag=key[1],
+                                                        jargs=spec.get('jargs', ''),
+                                                        value=spec.get('value', ''))
+                        if missing:
+                            this_nested.session.add_all(list(missing.values()))
+                            this_nested.commit()
+                            session.expire(self._job, ['child_events'])
+                        else:
+                            this_nested.rollback()
+                        retry.retry_state.commit()
+                rows = query_rows(session)
+                event_ids = dict((key, row.id) for key, row in rows.items())
+                for retry in session.retrying_nested():
+                    with retry:
+                        this_nested = retry.retry_state.begin_nested()
+                        existing = set()
+                        for optowner_ids in in_chunks(set(event_ids.values())):
+                            existing.update(this_nested.session.query(si.Option.optowner_id, si.Option.name).
+                                            filter(si.Option.optowner_id.in_(optowner_ids)).all())
+                        missing = {}
+                        for key, spec in zip(keys, specs):
+                            for name, value in spec.get('options', {}).items():
+                                if (event_ids[key], name) not in existing:
+                                    string, value_type = encode_value(value)
+                                    missing[(event_ids[key], name)] = dict(optowner_id=event_ids[key],
+                                                                           name=name,
+                                                                           value=string,
+                                                                           value_type=value_type,
+                                                                           counter=_return_counter(value))
+                        if missing:
+                            this_nested.session.execute(si.Option.__table__.insert(), list(missing.values()))
+                            this_nested.commit()
+                        else:
+                            this_nested.rollback()
+                        retry.retry_state.commit()
+                # reloading all rows in one query as the commits expired them
+                rows = query_rows(session)
+                for row in rows.values():
+                    session.expire(row, ['options'])
+                return [Event(rows[key]) for key in keys]
+
     def logprint(self, log_text=None):
         """
         Log given text in a log dataproduct.
@@ -622,30 +833,104 @@ class Job(OptOwner):
 
     @_in_session()
     def _starting_todo(self, logprint=True):
-        if not self.has_a_node:
-            from . import DefaultNode
-            self.node = DefaultNode
-        if logprint:
-            logprint = self.logprint()
-            sys.stdout = sys.stderr = logprint.open("a")
-            logging.basicConfig(filename=logprint.path, format="%(asctime)s %(levelname)s %(name)s %(message)s")
-        self.state = JOBSUBMSTATE
-        self._job.starttime = datetime.datetime.utcnow()
-        self.update_timestamp()
+        with si.batch():
+            if not self.has_a_node:
+                from . import DefaultNode
+                self.node = DefaultNode
+            if logprint:
+                logprint = self.logprint()
+                sys.stdout = sys.stderr = logprint.open("a")
+                logging.basicConfig(filename=logprint.path, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+            self.state = JOBSUBMSTATE
+            self._job.starttime = self._job.heartbeat = datetime.datetime.utcnow()
+            self.update_timestamp()
+        if self._job.id not in _HEARTBEATS:
+            _HEARTBEATS[self._job.id] = _Heartbeat(self._job.id)
+            _HEARTBEATS[self._job.id].start()
         # self._job.timestamp = datetime.datetime.utcnow()
         # self._session.commit()
 
     @_in_session()
     def _ending_todo(self):
-        if hasattr(sys, "last_value"):
-            self.state = repr(sys.last_value)
-        else:
-            self.state = JOBCOMPSTATE
-            self._job.endtime = datetime.datetime.utcnow()
-        self.update_timestamp()
+        if self._job.id in _HEARTBEATS:
+            _HEARTBEATS.pop(self._job.id).stopped.set()
+        with si.batch():
+            if hasattr(sys, "last_value"):
+                self.state = repr(sys.last_value)
+            else:
+                self.state = JOBCOMPSTATE
+                self._job.endtime = datetime.datetime.utcnow()
+            self.update_timestamp()
+        self._record_metrics()
+        if self._job.state == JOBCOMPSTATE:
+            self._record_memo()
         # self._job.timestamp = datetime.datetime.utcnow()
         # self._session.commit()
 
+    @_in_session()
+    def _record_metrics(self):
+        now = datetime.datetime.utcnow()
+        starttime, endtime = self._job.starttime, self._job.endtime or now
+        walltime = None if starttime is None else (endtime - starttime).total_seconds()
+        usages = {'': resource.getrusage(resource.RUSAGE_SELF),
+                  'children_': resource.getrusage(resource.RUSAGE_CHILDREN)}
+        metrics = dict(job_id=self._job.id, task_name=self._job.task.name, pipeline_id=self._job.task.pipeline_id,
+                       state=self._job.state, timestamp=now, walltime=walltime)
+        for prefix, usage in usages.items():
+            metrics.update({prefix + 'user_time': usage.ru_utime,
+                            prefix + 'sys_time': usage.ru_stime,
+                            prefix + 'maxrss': usage.ru_maxrss * MAXRSS_UNIT,
+                            prefix + 'inblock': usage.ru_inblock,
+                            prefix + 'oublock': usage.ru_oublock})
+        tasks = si.Task.__table__
+        for retry in self._session.retrying_nested():
+            with retry:
+                this_nested = retry.retry_state.begin_nested()
+                this_nested.session.add(si.JobMetric(**metrics))
+                this_nested.session.execute(
+                    si.sa.update(tasks).where(tasks.c.id == self._job.task_id).
+                    values(nruns=si.sa.func.coalesce(tasks.c.nruns, 0) + 1,
+                           run_time=si.sa.func.coalesce(tasks.c.run_time, 0) + (walltime or 0)).
+                    execution_options(synchronize_session=False))
+                this_nested.commit()
+                retry.retry_state.commit()
+
+    @_in_session()
+    def _record_memo(self):
+        memo_digest = self._session.query(si.Option.value). \
+            filter_by(optowner_id=self._job.id, name='memo_digest').scalar()
+        if memo_digest is None:
+            return
+        # the events of barriers are fired by the last arrival, not by the job
+        barrier_events = self._session.query(si.Barrier.event_id).filter_by(job_id=self._job.id)
+        child_events = [{'name': event.name, 'tag': event.tag, 'jargs': event.jargs, 'value': event.value,
+                         'options': [[option.name, option.value, option.value_type] for option in event.options]}
+                        for event in self._session.query(si.Event).
+                        filter_by(parent_job_id=self._job.id).
+                        filter(si.Event.id.notin_(barrier_events)).order_by(si.Event.id)]
+        pipeline_id, task_name = self._job.task.pipeline_id, self._job.task.name
+        for retry in self._session.retrying_nested():
+            with retry:
+                this_nested = retry.retry_state.begin_nested()
+                memo = this_nested.session.query(si.Memo).with_for_update(). \
+                    filter_by(pipeline_id=pipeline_id, task_name=task_name, digest=memo_digest).one_or_none()
+                if memo is None:
+                    memo = si.Memo(pipeline_id=pipeline_id, task_name=task_name, digest=memo_digest)
+                    this_nested.session.add(memo)
+                memo.job_id = self._job.id
+                memo.child_events = json.dumps(child_events)
+                memo.timestamp = datetime.datetime.utcnow()
+                this_nested.commit()
+                retry.retry_state.commit()
+
+    @_in_session()
+    def _complete_from_memo(self, memo_job_id):
+        self.option(name='memo_job_id', value=memo_job_id)
+        with si.batch():
+            self.state = JOBCOMPSTATE
+            self._job.starttime = self._job.endtime = datetime.datetime.utcnow()
+            self.update_timestamp()
+
     @_in_session()
     def expire(self):
         self.state = JOBEXPISTATE
@@ -654,6 +939,62 @@ class Job(OptOwner):
         # self._job.timestamp = datetime.datetime.utcnow()
         # self._session.commit()
 
+    @classmethod
+    def reap(cls, timeout=None, refire=False, pipeline=None):
+        """
+        Expires the submitted jobs which heartbeat is older than given
+        timeout, their process having died without ending them.
+
+        Parameters
+        ----------
+        timeout : float
+            Age in seconds of the last heartbeat past which a job is expired
+            - defaults to HEARTBEAT_TIMEOUT.
+        refire : bool
+            If True, fire again the events of the expired jobs, so that new
+            attempts of these jobs are submitted - defaults to False.
+        pipeline : Pipeline object
+            Pipeline which jobs are reaped - defaults to None for all
+            pipelines.
+
+        Returns
+        -------
+        jobs : list of Job object
+            Jobs expired.
+
+        Notes
+        -----
+        The stale jobs are selected for update with a single query over the
+        index of the `jobs` table on state and heartbeat, then expired with a
+        single update in the same transaction. Jobs started by an earlier
+        version of wpipe, without heartbeat, are never reaped. The expired
+        jobs are returned rather than reported, for the caller to report them.
+        """
+        now = datetime.datetime.utcnow()
+        cutoff = now - datetime.timedelta(seconds=HEARTBEAT_TIMEOUT if timeout is None else timeout)
+        jobs, tasks = si.Job.__table__, si.Task.__table__
+        stale = si.sa.and_(jobs.c.state == JOBSUBMSTATE, jobs.c.heartbeat < cutoff)
+        query = si.sa.select(jobs.c.id).where(stale)
+        if pipeline is not None:
+            query = query.join(tasks, jobs.c.task_id == tasks.c.id).where(tasks.c.pipeline_id == pipeline.pipeline_id)
+        for session in si.begin_session():
+            with session as session:
+                for retry in session.retrying_nested():
+                    with retry:
+                        job_ids = retry.retry_state.session.execute(query.with_for_update()).scalars().all()
+                        if job_ids:
+                            retry.retry_state.session.execute(
+                                si.sa.update(jobs).where(jobs.c.id.in_(job_ids)).where(stale).
+                                values(state=JOBEXPISTATE, endtime=now).
+                                execution_options(synchronize_session=False))
+                        retry.retry_state.commit()
+        reaped = [cls(job_id) for job_id in job_ids]
+        if refire:
+            for job in reaped:
+                if job.firing_event is not None:
+                    job.firing_event.fire()
+        return reaped
+
     def reset(self):
         """
         Reset job.
@@ -669,6 +1010,7 @@ class Job(OptOwner):
         Delete corresponding row from the database.
         """
         self._log_dp.delete()
+        self.barriers.delete()
         self.child_events.delete()
         super(Job, self).delete()
-        self.__class__.__cache__ = self.__cache__[self.__cache__[CLASS_LOW] != self]
+        self.__cache__.discard(self)
@@ -5,9 +5,9 @@ Contains the Mask class definition
 Please note that this module is private. The Mask class is
 available in the main ``wpipe`` namespace - use that instead.
 """
-from .core import datetime, pd, si
-from .core import make_yield_session_if_not_cached, make_query_rtn_upd
-from .core import initialize_args, wpipe_to_sqlintf_connection, in_session
+from .core import datetime, si
+from .core import IdentityMap, make_yield_session_if_not_cached, make_query_rtn_upd
+from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, ThreadLocalAttribute, ThreadLocalMeta
 from .core import split_path
 
 __all__ = ['Mask']
@@ -27,7 +27,7 @@ _check_in_cache = make_yield_session_if_not_cached(KEYID_ATTR, UNIQ_ATTRS, CLASS
 _query_return_and_update_cached_row = make_query_rtn_upd(CLASS_LOW, KEYID_ATTR, UNIQ_ATTRS)
 
 
-class Mask:
+class Mask(metaclass=ThreadLocalMeta):
     """
         Represents a mask associated to a task.
 
@@ -84,7 +84,9 @@ class Mask:
         task_id : int
             Primary key id of the table row of parent task.
     """
-    __cache__ = pd.DataFrame(columns=[KEYID_ATTR]+UNIQ_ATTRS+[CLASS_LOW])
+    __cache__ = IdentityMap(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+    _mask = ThreadLocalAttribute()
+    _session = ThreadLocalAttribute(default=None)
 
     @classmethod
     def _check_in_cache(cls, kind, loc):
@@ -99,7 +101,7 @@ class Mask:
     
     @classmethod
     def _return_cached_instances(cls):
-        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__[CLASS_LOW]]
+        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__]
 
     def __new__(cls, *args, **kwargs):
         if hasattr(cls, '_inst'):
@@ -136,6 +138,8 @@ class Mask:
                                                     value=value)
                                 task._task.masks.append(cls._mask)
                                 this_nested.commit()
+                                from .Pipeline import Pipeline
+                                Pipeline._invalidate_routing(task.pipeline_id)
                             else:
                                 this_nested.rollback()
                             retry.retry_state.commit()
@@ -146,7 +150,7 @@ class Mask:
         # add instance to cache dataframe
         if cls._to_cache:
             cls._to_cache[CLASS_LOW] = cls._inst
-            cls.__cache__.loc[len(cls.__cache__)] = cls._to_cache
+            cls.__cache__.add(cls._to_cache)
             del cls._to_cache
         new_cls_inst = cls._inst
         delattr(cls, '_inst')
@@ -209,6 +213,8 @@ class Mask:
         self._mask.name = name
         _temp = _query_return_and_update_cached_row(self, 'name')
         self.update_timestamp()
+        from .Pipeline import Pipeline
+        Pipeline._invalidate_routing(self.task.pipeline_id)
         # self._mask.timestamp = datetime.datetime.utcnow()
         # self._session.commit()
 
@@ -270,12 +276,14 @@ class Mask:
         """
 
         """
-        self._mask.timestamp = datetime.datetime.utcnow()
+        si.touch(self._mask)
         self._session.commit()
 
     def delete(self):
         """
         Delete corresponding row from the database.
         """
+        from .Pipeline import Pipeline
+        Pipeline._invalidate_routing(self.task.pipeline_id)
         si.delete(self._mask)
-        self.__class__.__cache__ = self.__cache__[self.__cache__[CLASS_LOW] != self]
+        self.__cache__.discard(self)
@@ -6,9 +6,9 @@ Please note that this module is private. The Node class is
 available in the main ``wpipe`` namespace - use that instead.
 """
 import socket
-from .core import datetime, pd, si
-from .core import make_yield_session_if_not_cached, make_query_rtn_upd
-from .core import initialize_args, wpipe_to_sqlintf_connection, in_session
+from .core import datetime, si
+from .core import IdentityMap, make_yield_session_if_not_cached, make_query_rtn_upd
+from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, ThreadLocalAttribute, ThreadLocalMeta
 from .core import split_path
 from .proxies import ChildrenProxy
 
@@ -29,7 +29,7 @@ _check_in_cache = make_yield_session_if_not_cached(KEYID_ATTR, UNIQ_ATTRS, CLASS
 _query_return_and_update_cached_row = make_query_rtn_upd(CLASS_LOW, KEYID_ATTR, UNIQ_ATTRS)
 
 
-class Node:
+class Node(metaclass=ThreadLocalMeta):
     """
         Represents a node of the local machine.
 
@@ -84,15 +84,17 @@ class Node:
 
         See Also
         --------
-        DefaultNode : Node constructed at wpipe importation.
+        DefaultNode : Node constructed at first access.
 
         Notes
         -----
-        Importing wpipe constructs a default node stored in DefaultNode. This
+        Accessing wpipe.DefaultNode constructs a default node. This
         makes use of the socket.gethostname method that returns the current
         host name.
     """
-    __cache__ = pd.DataFrame(columns=[KEYID_ATTR]+UNIQ_ATTRS+[CLASS_LOW])
+    __cache__ = IdentityMap(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+    _node = ThreadLocalAttribute()
+    _session = ThreadLocalAttribute(default=None)
 
     @classmethod
     def _check_in_cache(cls, kind, loc):
@@ -107,7 +109,7 @@ class Node:
     
     @classmethod
     def _return_cached_instances(cls):
-        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__[CLASS_LOW]]
+        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__]
 
     def __new__(cls, *args, **kwargs):
         if hasattr(cls, '_inst'):
@@ -152,7 +154,7 @@ class Node:
         # add instance to cache dataframe
         if cls._to_cache:
             cls._to_cache[CLASS_LOW] = cls._inst
-            cls.__cache__.loc[len(cls.__cache__)] = cls._to_cache
+            cls.__cache__.add(cls._to_cache)
             del cls._to_cache
         new_cls_inst = cls._inst
         delattr(cls, '_inst')
@@ -282,7 +284,7 @@ class Node:
         """
 
         """
-        self._node.timestamp = datetime.datetime.utcnow()
+        si.touch(self._node)
         self._session.commit()
 
     def delete(self):
@@ -290,4 +292,4 @@ class Node:
         Delete corresponding row from the database.
         """
         si.delete(self._node)
-        self.__class__.__cache__ = self.__cache__[self.__cache__[CLASS_LOW] != self]
+        self.__cache__.discard(self)
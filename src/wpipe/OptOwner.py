@@ -7,7 +7,7 @@ be used by itself, but through its inherited classes Target, Job, Event and
 DataProduct.
 """
 from .core import datetime, si
-from .core import in_session
+from .core import in_session, ThreadLocalAttribute, ThreadLocalMeta
 from .core import split_path
 from .proxies import DictLikeChildrenProxy
 from .Option import Option
@@ -21,7 +21,7 @@ def _in_session(**local_kw):
     return in_session('_%s' % CLASS_LOW, **local_kw)
 
 
-class OptOwner:
+class OptOwner(metaclass=ThreadLocalMeta):
     """
         Represents an option owner.
 
@@ -30,6 +30,9 @@ class OptOwner:
         capability to parent options. Please refer to their respective
         documentation for specific instructions.
     """
+    _optowner = ThreadLocalAttribute()
+    _session = ThreadLocalAttribute(default=None)
+
     # @_in_session()
     def __init__(self, options):
         if not hasattr(self, '_optowner'):
@@ -91,7 +94,7 @@ class OptOwner:
         """
 
         """
-        self._optowner.timestamp = datetime.datetime.utcnow()
+        si.touch(self._optowner)
         self._session.commit()
 
     def delete(self):
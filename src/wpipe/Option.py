@@ -5,10 +5,11 @@ Contains the Option class definition
 Please note that this module is private. The Option class is
 available in the main ``wpipe`` namespace - use that instead.
 """
-from .core import datetime, pd, si
-from .core import make_yield_session_if_not_cached, make_query_rtn_upd
-from .core import initialize_args, wpipe_to_sqlintf_connection, in_session
+from .core import datetime, si
+from .core import IdentityMap, make_yield_session_if_not_cached, make_query_rtn_upd
+from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, ThreadLocalAttribute, ThreadLocalMeta
 from .core import split_path
+from .proxies.core import encode_value
 
 __all__ = ['Option']
 
@@ -27,7 +28,11 @@ _check_in_cache = make_yield_session_if_not_cached(KEYID_ATTR, UNIQ_ATTRS, CLASS
 _query_return_and_update_cached_row = make_query_rtn_upd(CLASS_LOW, KEYID_ATTR, UNIQ_ATTRS)
 
 
-class Option:
+def _return_counter(value):
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+class Option(metaclass=ThreadLocalMeta):
     """
         Represents an option given to a target, job, event or dataproduct.
 
@@ -82,7 +87,9 @@ class Option:
         optowner_id : int
             Primary key id of the table row of parent optowner.
     """
-    __cache__ = pd.DataFrame(columns=[KEYID_ATTR]+UNIQ_ATTRS+[CLASS_LOW])
+    __cache__ = IdentityMap(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+    _option = ThreadLocalAttribute()
+    _session = ThreadLocalAttribute(default=None)
 
     @classmethod
     def _check_in_cache(cls, kind, loc):
@@ -90,7 +97,7 @@ class Option:
     
     @classmethod
     def _return_cached_instances(cls):
-        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__[CLASS_LOW]]
+        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__]
 
     @classmethod
     def _sqlintf_instance_argument(cls):
@@ -130,8 +137,12 @@ class Option:
                                 filter_by(optowner_id=optowner.optowner_id). \
                                 filter_by(name=name).one_or_none()
                             if cls._option is None:
+                                counter = _return_counter(value)
+                                value, value_type = encode_value(value)
                                 cls._option = si.Option(name=name,
-                                                        value=str(value))
+                                                        value=value,
+                                                        value_type=value_type,
+                                                        counter=counter)
                                 optowner._optowner.options.append(cls._option)
                                 this_nested.commit()
                             else:
@@ -144,7 +155,7 @@ class Option:
         # add instance to cache dataframe
         if cls._to_cache:
             cls._to_cache[CLASS_LOW] = cls._inst
-            cls.__cache__.loc[len(cls.__cache__)] = cls._to_cache
+            cls.__cache__.add(cls._to_cache)
             del cls._to_cache
         new_cls_inst = cls._inst
         delattr(cls, '_inst')
@@ -240,7 +251,8 @@ class Option:
     @value.setter
     @_in_session()
     def value(self, value):
-        self._option.value = value
+        self._option.counter = _return_counter(value)
+        self._option.value, self._option.value_type = encode_value(value)
         self.update_timestamp()
         # self._option.timestamp = datetime.datetime.utcnow()
         # self._session.commit()
@@ -281,7 +293,7 @@ class Option:
         """
 
         """
-        self._option.timestamp = datetime.datetime.utcnow()
+        si.touch(self._option)
         self._session.commit()
 
     def delete(self):
@@ -289,4 +301,4 @@ class Option:
         Delete corresponding row from the database.
         """
         si.delete(self._option)
-        self.__class__.__cache__ = self.__cache__[self.__cache__[CLASS_LOW] != self]
+        self.__cache__.discard(self)
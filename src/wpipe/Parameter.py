@@ -5,10 +5,11 @@ Contains the Parameter class definition
 Please note that this module is private. The Parameter class is
 available in the main ``wpipe`` namespace - use that instead.
 """
-from .core import datetime, pd, si
-from .core import make_yield_session_if_not_cached, make_query_rtn_upd
-from .core import initialize_args, wpipe_to_sqlintf_connection, in_session
+from .core import datetime, si
+from .core import IdentityMap, make_yield_session_if_not_cached, make_query_rtn_upd
+from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, ThreadLocalAttribute, ThreadLocalMeta
 from .core import split_path
+from .proxies.core import encode_value
 
 __all__ = ['Parameter']
 
@@ -27,7 +28,7 @@ _check_in_cache = make_yield_session_if_not_cached(KEYID_ATTR, UNIQ_ATTRS, CLASS
 _query_return_and_update_cached_row = make_query_rtn_upd(CLASS_LOW, KEYID_ATTR, UNIQ_ATTRS)
 
 
-class Parameter:
+class Parameter(metaclass=ThreadLocalMeta):
     """
         Represents a configuration's parameter.
 
@@ -81,7 +82,9 @@ class Parameter:
         config_id : int
             Primary key id of the table row of parent configuration.
     """
-    __cache__ = pd.DataFrame(columns=[KEYID_ATTR]+UNIQ_ATTRS+[CLASS_LOW])
+    __cache__ = IdentityMap(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+    _parameter = ThreadLocalAttribute()
+    _session = ThreadLocalAttribute(default=None)
 
     @classmethod
     def _check_in_cache(cls, kind, loc):
@@ -96,7 +99,7 @@ class Parameter:
     
     @classmethod
     def _return_cached_instances(cls):
-        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__[CLASS_LOW]]
+        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__]
 
     def __new__(cls, *args, **kwargs):
         if hasattr(cls, '_inst'):
@@ -127,8 +130,10 @@ class Parameter:
                                 filter_by(config_id=config.config_id). \
                                 filter_by(name=name).one_or_none()
                             if cls._parameter is None:
+                                value, value_type = encode_value(value)
                                 cls._parameter = si.Parameter(name=name,
-                                                              value=str(value))
+                                                              value=value,
+                                                              value_type=value_type)
                                 config._configuration.parameters.append(cls._parameter)
                                 this_nested.commit()
                             else:
@@ -141,7 +146,7 @@ class Parameter:
         # add instance to cache dataframe
         if cls._to_cache:
             cls._to_cache[CLASS_LOW] = cls._inst
-            cls.__cache__.loc[len(cls.__cache__)] = cls._to_cache
+            cls.__cache__.add(cls._to_cache)
             del cls._to_cache
         new_cls_inst = cls._inst
         delattr(cls, '_inst')
@@ -236,7 +241,7 @@ class Parameter:
     @value.setter
     @_in_session()
     def value(self, value):
-        self._parameter.value = value
+        self._parameter.value, self._parameter.value_type = encode_value(value)
         self.update_timestamp()
         # self._parameter.timestamp = datetime.datetime.utcnow()
         # self._session.commit()
@@ -267,7 +272,7 @@ class Parameter:
         """
 
         """
-        self._parameter.timestamp = datetime.datetime.utcnow()
+        si.touch(self._parameter)
         self._session.commit()
 
     def delete(self):
@@ -275,4 +280,4 @@ class Parameter:
         Delete corresponding row from the database.
         """
         si.delete(self._parameter)
-        self.__class__.__cache__ = self.__cache__[self.__cache__[CLASS_LOW] != self]
+        self.__cache__.discard(self)
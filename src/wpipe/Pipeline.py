@@ -6,8 +6,8 @@ Please note that this module is private. The Pipeline class is
 available in the main ``wpipe`` namespace - use that instead.
 """
 from .core import os, sys, glob, datetime, json, pd, si
-from .core import make_yield_session_if_not_cached, make_query_rtn_upd
-from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, to_json
+from .core import IdentityMap, make_yield_session_if_not_cached, make_query_rtn_upd
+from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, ThreadLocalAttribute, ThreadLocalMeta, to_json
 from .core import as_int, clean_path, remove_path, split_path
 from .core import PARSER
 from .proxies import ChildrenProxy
@@ -29,8 +29,23 @@ _check_in_cache = make_yield_session_if_not_cached(KEYID_ATTR, UNIQ_ATTRS, CLASS
 
 _query_return_and_update_cached_row = make_query_rtn_upd(CLASS_LOW, KEYID_ATTR, UNIQ_ATTRS)
 
+_ROUTING_INDEXES = {}
 
-class Pipeline(DPOwner):
+DIAGNOSE_AGE_BINS = [('<1m', datetime.timedelta(minutes=1)),
+                     ('1m-10m', datetime.timedelta(minutes=10)),
+                     ('10m-1h', datetime.timedelta(hours=1)),
+                     ('1h-6h', datetime.timedelta(hours=6)),
+                     ('6h-1d', datetime.timedelta(days=1))]
+"""
+list: labels and upper bounds of the age bins of the queued and running jobs
+reported by Pipeline.diagnose, the bin '>1d' gathering the older ones and
+the bin 'unknown' those without timestamp.
+"""
+
+DIAGNOSE_COLUMNS = ['report', 'task', 'state', 'bin', 'count']
+
+
+class Pipeline(DPOwner, metaclass=ThreadLocalMeta):
     """
         Represents a WINGS pipeline.
 
@@ -180,7 +195,8 @@ class Pipeline(DPOwner):
         configuration file. The third and last one called run_pipeline
         simply starts the pipeline run.
     """
-    __cache__ = pd.DataFrame(columns=[KEYID_ATTR]+UNIQ_ATTRS+[CLASS_LOW])
+    __cache__ = IdentityMap(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+    _pipeline = ThreadLocalAttribute()
 
     @classmethod
     def _check_in_cache(cls, kind, loc):
@@ -195,7 +211,7 @@ class Pipeline(DPOwner):
     
     @classmethod
     def _return_cached_instances(cls):
-        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__[CLASS_LOW]]
+        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__]
 
     def __new__(cls, *args, **kwargs):
         if hasattr(cls, '_inst'):
@@ -291,7 +307,7 @@ class Pipeline(DPOwner):
         # add instance to cache dataframe
         if cls._to_cache:
             cls._to_cache[CLASS_LOW] = cls._inst
-            cls.__cache__.loc[len(cls.__cache__)] = cls._to_cache
+            cls.__cache__.add(cls._to_cache)
             del cls._to_cache
         new_cls_inst = cls._inst
         delattr(cls, '_inst')
@@ -506,6 +522,62 @@ class Pipeline(DPOwner):
         """
         return self._dummy_job
 
+    def _build_routing_index(self):
+        routing_index = {}
+        for session in si.begin_session():
+            with session as session:
+                rows = session.query(si.Mask.name, si.Mask.value, si.Mask.task_id). \
+                    join(si.Task, si.Mask.task_id == si.Task.id). \
+                    filter(si.Task.pipeline_id == self.pipeline_id). \
+                    order_by(si.Task.id, si.Mask.id).all()
+                for mask_name, mask_value, task_id in rows:
+                    routing_index.setdefault(mask_name, []).append((mask_value, task_id))
+        _ROUTING_INDEXES[self.pipeline_id] = routing_index
+        return routing_index
+
+    def _route(self, name, value):
+        """
+        Returns the task which mask matches the given event signature, or None
+        if no mask matches.
+
+        Parameters
+        ----------
+        name : str
+            Name of the event.
+        value : str
+            Value of the event.
+
+        Returns
+        -------
+        task : :obj:`Task`
+            First task, in order of registration, having a mask of given name
+            and of given value or of value '*'.
+
+        Notes
+        -----
+        The masks of the pipeline tasks are read with a single query into a
+        routing index keyed by mask name, holding the ids of their tasks. It
+        is kept for the next events until a mask of the pipeline is created,
+        renamed or deleted in this process. The changes made by other
+        processes are not tracked: a signature that the index does not route
+        rebuilds it once, which picks up their new masks, but a signature it
+        routes keeps its task until the index is rebuilt, even if another
+        process renamed or deleted the mask since.
+        """
+        from .Task import Task
+        routing_index = _ROUTING_INDEXES.get(self.pipeline_id)
+        for rebuild in ([False, True] if routing_index is not None else [True]):
+            if rebuild:
+                routing_index = self._build_routing_index()
+            for mask_value, task_id in routing_index.get(name, []):
+                if value == mask_value or mask_value == '*':
+                    return Task(task_id)
+        return None
+
+    @staticmethod
+    def _invalidate_routing(pipeline_id):
+        _ROUTING_INDEXES.pop(pipeline_id, None)
+
     def input(self, *args, **kwargs):
         """
         Returns an input owned by the pipeline.
@@ -580,11 +652,84 @@ class Pipeline(DPOwner):
         self.dummy_job.child_event('__init__').fire()
         self.dummy_job._ending_todo()
 
-    def diagnose(self):
-        """
-        Diagnose current state of the pipeline. TODO
+    def diagnose(self, window=datetime.timedelta(days=1), nbins=24):
         """
-        pass
+        Diagnose current state of the pipeline.
+
+        Parameters
+        ----------
+        window : datetime.timedelta
+            Period before now over which the throughput is reported - defaults
+            to a day.
+        nbins : int
+            Number of time bins of the throughput - defaults to 24.
+
+        Returns
+        -------
+        diagnosis : pandas.DataFrame
+            Counts of jobs with columns report, task, state, bin and count,
+            where report is one of:
+             - 'states': jobs by task and state
+             - 'failures': failed jobs by state string, across tasks
+             - 'queued': initialized jobs by task and age of their timestamp,
+               set as they are created and bumped as they are updated
+             - 'running': submitted jobs by task and time since their start
+             - 'throughput': completed jobs by task and end time bin, labelled
+               with the bin start
+
+        Notes
+        -----
+        A job is reported as failed if its state is none of the states set
+        by wpipe, which then holds the error that ended it. The counts are
+        aggregated by a few GROUP BY queries over the `jobs` table, the age
+        and time bins being CASE expressions over bounds computed beforehand,
+        so that the jobs rows are never loaded.
+        """
+        from .Job import JOBINITSTATE, JOBSUBMSTATE, JOBCOMPSTATE, JOBEXPISTATE
+        now = datetime.datetime.utcnow()
+        jobs, tasks, optowners = si.Job.__table__, si.Task.__table__, si.OptOwner.__table__
+        width = window / nbins
+        starts = [now - (i + 1) * width for i in range(nbins)]
+        age = si.sa.case((jobs.c.state == JOBSUBMSTATE, jobs.c.starttime), else_=optowners.c.timestamp)
+        age_bin = si.sa.case((age.is_(None), 'unknown'),
+                             *[(age >= now - bound, label) for label, bound in DIAGNOSE_AGE_BINS],
+                             else_='>1d').label('bin')
+        end_bin = si.sa.case(*[(jobs.c.endtime >= start, start.strftime('%Y-%m-%d %H:%M'))
+                               for start in starts]).label('bin')
+        count = si.sa.func.count(jobs.c.id).label('count')
+
+        def _grouped(columns, *criteria):
+            return si.sa.select(tasks.c.name.label('task'), *columns, count). \
+                select_from(jobs.join(tasks, jobs.c.task_id == tasks.c.id).
+                            join(optowners, jobs.c.id == optowners.c.id)). \
+                where(tasks.c.pipeline_id == self.pipeline_id, *criteria). \
+                group_by(tasks.c.name, *[column.name for column in columns])
+        queries = [('states', _grouped([jobs.c.state])),
+                   ('queued', _grouped([jobs.c.state, age_bin], jobs.c.state.in_([JOBINITSTATE, JOBSUBMSTATE]))),
+                   ('throughput', _grouped([end_bin], jobs.c.state == JOBCOMPSTATE, jobs.c.endtime >= starts[-1]))]
+        records = []
+        for session in si.begin_session():
+            with session as session:
+                for report, query in queries:
+                    for row in session.execute(query):
+                        row = dict(row._mapping)
+                        if report == 'queued' and row['state'] == JOBSUBMSTATE:
+                            records.append({'report': 'running', **row})
+                        else:
+                            records.append({'report': report, **row})
+        diagnosis = pd.DataFrame.from_records(records, columns=DIAGNOSE_COLUMNS, coerce_float=False)
+        states = diagnosis[diagnosis['report'] == 'states']
+        failures = states[~states['state'].isin([JOBINITSTATE, JOBSUBMSTATE, JOBCOMPSTATE, JOBEXPISTATE])]. \
+            groupby('state', as_index=False)['count'].sum().assign(report='failures')
+        diagnosis = pd.concat([diagnosis, failures], ignore_index=True)[DIAGNOSE_COLUMNS]
+        # sorting the reports in the order of the docstring, and the age bins by age
+        ranks = {'report': ['states', 'failures', 'queued', 'running', 'throughput'],
+                 'bin': [label for label, _ in DIAGNOSE_AGE_BINS] + ['>1d', 'unknown']}
+        return diagnosis.sort_values(['report', 'task', 'state', 'bin'], na_position='first',
+                                     key=lambda column: column.map(
+                                         lambda value: '%02d' % ranks[column.name].index(value)
+                                         if value in ranks[column.name] else value)
+                                     if column.name in ranks else column).reset_index(drop=True)
 
     def reset(self):
         """
@@ -611,11 +756,30 @@ class Pipeline(DPOwner):
         remove_path(self.software_root, self.input_root, self.data_root, self.config_root)
         remove_path(self.pipe_root + '/.wpipe', hard=True)
 
+    @_in_session()
+    def clear_memos(self, task=None):
+        """
+        Forget the memoized jobs of the pipeline, so that the jobs of
+        memoized events run again.
+
+        Parameters
+        ----------
+        task : Task object
+            Task which memoized jobs are forgotten - defaults to None for all
+            tasks.
+        """
+        query = self._session.query(si.Memo).filter_by(pipeline_id=self._pipeline.id)
+        if task is not None:
+            query = query.filter_by(task_name=task.name)
+        query.delete(synchronize_session=False)
+        self._session.commit()
+
     def delete(self):
         """
         Delete corresponding row from the database.
         """
+        self.clear_memos()
         self.clean()
         self.dummy_task.delete()
         super(Pipeline, self).delete(self.remove_data)
-        self.__class__.__cache__ = self.__cache__[self.__cache__[CLASS_LOW] != self]
+        self.__cache__.discard(self)
@@ -6,8 +6,8 @@ Please note that this module is private. The Task class is
 available in the main ``wpipe`` namespace - use that instead.
 """
 from .core import os, sys, shutil, warnings, datetime, pd, si
-from .core import make_yield_session_if_not_cached, make_query_rtn_upd
-from .core import initialize_args, wpipe_to_sqlintf_connection, in_session
+from .core import IdentityMap, make_yield_session_if_not_cached, make_query_rtn_upd
+from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, ThreadLocalAttribute, ThreadLocalMeta
 from .core import clean_path, remove_path, split_path
 from .proxies import ChildrenProxy
 
@@ -28,7 +28,7 @@ _check_in_cache = make_yield_session_if_not_cached(KEYID_ATTR, UNIQ_ATTRS, CLASS
 _query_return_and_update_cached_row = make_query_rtn_upd(CLASS_LOW, KEYID_ATTR, UNIQ_ATTRS)
 
 
-class Task:
+class Task(metaclass=ThreadLocalMeta):
     """
         Represents a pipeline's task.
 
@@ -64,9 +64,10 @@ class Task:
         path : string
             Path to the task script file.
         nruns : int
-            ###BEN### - defaults to 0.
-        run_time : int
-            ###BEN### - defaults to 0.
+            Number of job runs recorded - defaults to 0.
+        run_time : float
+            Total wall time in seconds of the job runs recorded - defaults
+            to 0.
         is_exclusive : int
             ###BEN### - defaults to 0.
         keyid : int
@@ -85,9 +86,11 @@ class Task:
         timestamp : datetime.datetime object
             Timestamp of last access to table row.
         nruns : int
-            ###BEN###
-        run_time : int
-            ###BEN###
+            Number of job runs recorded.
+        run_time : float
+            Total wall time in seconds of the job runs recorded.
+        metrics : pandas.DataFrame
+            Resources used by the job runs of the task.
         is_exclusive : int
             ###BEN###
         executable : str
@@ -123,7 +126,9 @@ class Task:
 
         >>> new_job = my_task.job(my_node, my_event, my_config)
     """
-    __cache__ = pd.DataFrame(columns=[KEYID_ATTR]+UNIQ_ATTRS+[CLASS_LOW])
+    __cache__ = IdentityMap(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+    _task = ThreadLocalAttribute()
+    _session = ThreadLocalAttribute(default=None)
 
     @classmethod
     def _check_in_cache(cls, kind, loc):
@@ -138,7 +143,7 @@ class Task:
     
     @classmethod
     def _return_cached_instances(cls):
-        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__[CLASS_LOW]]
+        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__]
 
     def __new__(cls, *args, **kwargs):
         if hasattr(cls, '_inst'):
@@ -189,7 +194,7 @@ class Task:
         # add instance to cache dataframe
         if cls._to_cache:
             cls._to_cache[CLASS_LOW] = cls._inst
-            cls.__cache__.loc[len(cls.__cache__)] = cls._to_cache
+            cls.__cache__.add(cls._to_cache)
             del cls._to_cache
         new_cls_inst = cls._inst
         delattr(cls, '_inst')
@@ -282,7 +287,8 @@ class Task:
     @_in_session()
     def nruns(self):
         """
-        int: ###BEN###
+        int: Number of job runs recorded, rolled up from the `job_metrics`
+        table as jobs end.
         """
         self._session.refresh(self._task)
         return self._task.nruns
@@ -291,11 +297,26 @@ class Task:
     @_in_session()
     def run_time(self):
         """
-        int: ###BEN###
+        float: Total wall time in seconds of the job runs recorded, rolled up
+        from the `job_metrics` table as jobs end.
         """
         self._session.refresh(self._task)
         return self._task.run_time
 
+    @property
+    @_in_session()
+    def metrics(self):
+        """
+        :obj:`pandas.DataFrame`: Resources used by the job runs of the task,
+        one row per run from the `job_metrics` table.
+        """
+        table = si.JobMetric.__table__
+        rows = self._session.execute(si.sa.select(table).
+                                     where(table.c.pipeline_id == self._task.pipeline_id).
+                                     where(table.c.task_name == self._task.name).
+                                     order_by(table.c.id)).all()
+        return pd.DataFrame.from_records(rows, columns=table.columns.keys(), coerce_float=False)
+
     @property
     @_in_session()
     def is_exclusive(self):
@@ -393,7 +414,7 @@ class Task:
         """
 
         """
-        self._task.timestamp = datetime.datetime.utcnow()
+        si.touch(self._task)
         self._session.commit()
 
     def register(self):
@@ -432,4 +453,4 @@ class Task:
         self.remove_data()
         self.jobs.delete()
         si.delete(self._task)
-        self.__class__.__cache__ = self.__cache__[self.__cache__[CLASS_LOW] != self]
+        self.__cache__.discard(self)
@@ -5,9 +5,9 @@ Contains the User class definition
 Please note that this module is private. The User class is
 available in the main ``wpipe`` namespace - use that instead.
 """
-from .core import datetime, pd, si
-from .core import make_yield_session_if_not_cached, make_query_rtn_upd
-from .core import initialize_args, wpipe_to_sqlintf_connection, in_session
+from .core import datetime, si
+from .core import IdentityMap, make_yield_session_if_not_cached, make_query_rtn_upd
+from .core import initialize_args, wpipe_to_sqlintf_connection, in_session, ThreadLocalAttribute, ThreadLocalMeta
 from .core import split_path
 from .core import PARSER
 from .proxies import ChildrenProxy
@@ -29,7 +29,7 @@ _check_in_cache = make_yield_session_if_not_cached(KEYID_ATTR, UNIQ_ATTRS, CLASS
 _query_return_and_update_cached_row = make_query_rtn_upd(CLASS_LOW, KEYID_ATTR, UNIQ_ATTRS)
 
 
-class User:
+class User(metaclass=ThreadLocalMeta):
     """
         Represents a wingspipe user.
 
@@ -76,17 +76,19 @@ class User:
 
         See Also
         --------
-        DefaultUser : User constructed at wpipe importation.
+        DefaultUser : User constructed at first access.
 
         Notes
         -----
-        Importing wpipe constructs a default user stored in DefaultUser. This
+        Accessing wpipe.DefaultUser constructs a default user. This
         makes use of the PARSER.user_name string which generally corresponds
         to the user named 'default' but can be configured:
         - either, evidently, via a parse argument -u/--user
         - or via a pre-defined environment variable WPIPE_USER (recommended)
     """
-    __cache__ = pd.DataFrame(columns=[KEYID_ATTR]+UNIQ_ATTRS+[CLASS_LOW])
+    __cache__ = IdentityMap(KEYID_ATTR, UNIQ_ATTRS, CLASS_LOW)
+    _user = ThreadLocalAttribute()
+    _session = ThreadLocalAttribute(default=None)
 
     @classmethod
     def _check_in_cache(cls, kind, loc):
@@ -101,7 +103,7 @@ class User:
     
     @classmethod
     def _return_cached_instances(cls):
-        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__[CLASS_LOW]]
+        return [getattr(obj, '_%s' % CLASS_LOW) for obj in cls.__cache__]
 
     def __new__(cls, *args, **kwargs):
         if hasattr(cls, '_inst'):
@@ -142,7 +144,7 @@ class User:
         # add instance to cache dataframe
         if cls._to_cache:
             cls._to_cache[CLASS_LOW] = cls._inst
-            cls.__cache__.loc[len(cls.__cache__)] = cls._to_cache
+            cls.__cache__.add(cls._to_cache)
             del cls._to_cache
         new_cls_inst = cls._inst
         delattr(cls, '_inst')
@@ -255,7 +257,7 @@ class User:
         """
 
         """
-        self._user.timestamp = datetime.datetime.utcnow()
+        si.touch(self._user)
         self._session.commit()
 
     def delete(self):
@@ -264,4 +266,4 @@ class User:
         """
         self.pipelines.delete()
         si.delete(self._user)
-        self.__class__.__cache__ = self.__cache__[self.__cache__[CLASS_LOW] != self]
+        self.__cache__.discard(self)
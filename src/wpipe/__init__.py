@@ -25,7 +25,9 @@ WINGS pipeline. These classes represent namely:
 - the jobs that are submitted by the pipeline from specific events (Job),
 - the events that are fired by the pipeline jobbing (Event),
 - the options that may be given to any target, job, event or dataproduct
-(Option).
+(Option),
+- the barriers that fire an event once a job's children have all arrived
+(Barrier).
 
 The core running of the pipeline is handled by its jobbing. This goes through
 the firing of events that search for tasks with matching masks. These events
@@ -103,16 +105,23 @@ sqlintf
     Suite of classes connected to the database tables
     - powered by the module `SQLAlchemy`
 
+aio
+    Asyncio counterparts of the classes Job, Event and Pipeline
+    - to import explicitly with `import wpipe.aio`
+
 Utilities
 ---------
 PARSER
     pre-instantiated parser powered by the module `argparse`
 
 DefaultUser
-    User object constructed at wpipe importation (see User doc Notes)
+    User object constructed at first access (see User doc Notes)
 
 DefaultNode
-    Node object constructed at wpipe importation (see Node doc Notes)
+    Node object constructed at first access (see Node doc Notes)
+
+batch
+    Unit of work committing the writes of its statements in one transaction
 
 wingspipe
     Function that runs the wingspipe executable functionalities
@@ -136,30 +145,33 @@ from .Task import Task
 from .Mask import Mask
 from .Job import Job
 from .Event import Event
+from .Barrier import Barrier
 from .scheduler import PbsConsumer
 from .scheduler import SlurmConsumer
 from .scheduler.ConsumerFactory import get_consumer_factory
+from .sqlintf import batch
 
 __all__ = ['__version__', 'PARSER', 'User', 'Node', 'Pipeline', 'Input',
            'Option', 'Target', 'Configuration', 'Parameter', 'DataProduct',
-           'Task', 'Mask', 'Job', 'Event',
-           'DefaultUser', 'DefaultNode', 'wingspipe']
+           'Task', 'Mask', 'Job', 'Event', 'Barrier',
+           'DefaultUser', 'DefaultNode', 'batch', 'wingspipe']
 
 
 warnings.filterwarnings("ignore", message=".*Cannot correctly sort tables;.*")
 
-DefaultUser = User()
-"""
-User object: User object constructed at wpipe importation (see User doc Notes)
-"""
 
-PbsConsumer.DEFAULT_PORT = PbsConsumer.BASE_PORT + DefaultUser.user_id
-SlurmConsumer.DEFAULT_PORT = SlurmConsumer.BASE_PORT + DefaultUser.user_id
+_DEFAULTS = {'DefaultUser': User,
+             'DefaultNode': Node}
+
+
+def __getattr__(name):
+    # DefaultUser and DefaultNode are constructed at first access so that
+    # importing wpipe does not query the database
+    if name in _DEFAULTS:
+        globals()[name] = _DEFAULTS[name]()
+        return globals()[name]
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
-DefaultNode = Node()
-"""
-Node object: Node object constructed at wpipe importation (see Node doc Notes)
-"""
 
 if pathlib.Path(sys.argv[0]).resolve().name != 'wingspipe':
     if PARSER.parse_known_args()[0].event_id is not None or PARSER.parse_known_args()[0].job_id is not None:
@@ -299,8 +311,17 @@ def wingspipe(args=None):
     parser_run.set_defaults(which='run')
     parser_diagnose = subparsers.add_parser('diagnose', parents=[parent_parser], add_help=False)
     parser_diagnose.set_defaults(which='diagnose')
+    parser_migrate = subparsers.add_parser('migrate', parents=[parent_parser], add_help=False)
+    parser_migrate.set_defaults(which='migrate')
     parser_expire = subparsers.add_parser('expire', parents=[parent_parser], add_help=False)
     parser_expire.set_defaults(which='expire')
+    parser_reap = subparsers.add_parser('reap', parents=[parent_parser], add_help=False)
+    parser_reap.add_argument('--timeout', '-t', type=float, dest='timeout', default=None,
+                             help='Age in seconds of the last heartbeat past which a submitted job is expired '
+                                  '- default to WPIPE_HEARTBEAT_TIMEOUT environment variable')
+    parser_reap.add_argument('--refire', '-f', dest='refire', action='store_true',
+                             help='Fire again the events of the expired jobs')
+    parser_reap.set_defaults(which='reap')
     parent_parser_with_yes_flag = si.argparse.ArgumentParser(parents=[parent_parser], add_help=False)
     parent_parser_with_yes_flag.add_argument('--yes', '-y', dest='yes', action='store_true',
                                              help="Don't ask for confirmation")
@@ -316,7 +337,12 @@ def wingspipe(args=None):
     if hasattr(args, 'which'):
         if args.which == 'expire':
             Job(args.job_id).expire()
+        elif args.which == 'migrate':
+            for version in si.migrate():
+                print("Applied schema migration %d" % version)
         else:
+            if args.which == 'init':
+                si.create_schema()
             my_pipe = Pipeline()
             command = parser.prog + " " + args.which
             if args.which == 'init':
@@ -330,8 +356,14 @@ def wingspipe(args=None):
                 # TODO if args.event_id or args.job_id
                 my_pipe.run()
 
+            elif args.which == 'reap':
+                for job in Job.reap(args.timeout, args.refire, my_pipe):
+                    print("Expired job %d of task %s" % (job.job_id, job.task.name))
             elif args.which == 'diagnose':
-                my_pipe.diagnose()
+                diagnosis = my_pipe.diagnose()
+                for report, frame in diagnosis.groupby('report', sort=False):
+                    print(report + ':')
+                    print(frame.dropna(axis=1, how='all').drop(columns='report').to_string(index=False))
             elif args.which == 'reset':
                 if True if args.yes \
                         else input(command + ': confirm reset of pipeline at ' +
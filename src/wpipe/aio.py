@@ -0,0 +1,415 @@
+#!/usr/bin/env python
+"""
+Contains the asyncio interface of wpipe
+
+The classes of this module are lightweight asyncio counterparts of the Wpipe
+classes Job, Event and Pipeline, for services that drive many jobs and events
+concurrently from a single event loop. They are identified by the primary key
+id of their table row and do not cache it: each coroutine issues its queries
+through the asynchronous engine of SQLAlchemy, so that waiting on the
+database does not block the event loop. This module is not imported by wpipe
+and must be imported explicitly with::
+
+    import wpipe.aio
+
+It requires the package greenlet and the asyncio driver of the database,
+aiomysql for MySQL or aiosqlite for SQLite, which are installed with::
+
+    pip install .[aio]
+
+Example::
+
+    async def complete(pipeline_id):
+        async for job in wpipe.aio.Pipeline(pipeline_id).jobs_where(state='Submitted'):
+            await job.set_state('Completed')
+            await job.set_option('done', 1)
+"""
+import os
+import asyncio
+import datetime
+from .core import si
+from .proxies.core import encode_value, decode_value
+from .Option import _return_counter
+
+__all__ = ['ASYNC_DRIVERS', 'AIO_POOL_SIZE', 'async_engine_url', 'get_async_engine',
+           'dispose_async_engine', 'OptOwner', 'Job', 'Event', 'Pipeline']
+
+ASYNC_DRIVERS = {'mysql': 'mysql+aiomysql', 'sqlite': 'sqlite+aiosqlite'}
+"""
+dict: asyncio driver name of each supported database backend.
+"""
+
+AIO_POOL_SIZE = int(os.environ.get('WPIPE_AIO_POOL_SIZE', 10))
+"""
+int: number of connections kept open by the asynchronous engine - defaults
+to the environment variable WPIPE_AIO_POOL_SIZE, or 10.
+"""
+
+_ASYNC_ENGINE = None
+
+
+def async_engine_url(engine_url=None):
+    """
+    Returns given engine URL with its driver replaced by the asyncio driver of
+    its database backend.
+
+    Parameters
+    ----------
+    engine_url : str
+        URL of the wpipe database - defaults to the environment variable
+        WPIPE_AIO_ENGINEURL if set, or to the engine URL of sqlintf.
+
+    Returns
+    -------
+    engine_url : sqlalchemy.engine.URL object
+        URL of the wpipe database using the asyncio driver.
+    """
+    if engine_url is None:
+        engine_url = os.environ.get('WPIPE_AIO_ENGINEURL', si.core.ENGINE_URL)
+    url = si.sa.engine.make_url(engine_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError("No asyncio driver supported for database backend %s" % backend)
+    if backend == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            raise ValueError("The in-memory SQLite database cannot be shared with the asyncio "
+                             "engine: use a file-backed SQLite database")
+    else:
+        url = si.sa.engine.make_url(si.core.resolve_engine_url(str(url)))
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def get_async_engine():
+    """
+    Returns the asynchronous engine of the wpipe database, making it on the
+    first call.
+
+    Returns
+    -------
+    engine : sqlalchemy.ext.asyncio.AsyncEngine object
+        Asynchronous engine handling the connection to the database.
+    """
+    global _ASYNC_ENGINE
+    if _ASYNC_ENGINE is None:
+        url = async_engine_url()
+        try:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            if url.get_backend_name() == 'sqlite':
+                engine = create_async_engine(url, echo=si.core.verbose,
+                                             connect_args={'timeout': si.core.SQLITE_BUSY_TIMEOUT})
+                si.core.listen_sqlite_engine(engine.sync_engine)
+            else:
+                engine = create_async_engine(url, echo=si.core.verbose, pool_size=AIO_POOL_SIZE,
+                                             pool_recycle=si.core.POOL_RECYLE)
+        except ImportError as error:
+            raise ImportError("wpipe.aio requires greenlet and the %s driver: install them with "
+                              "pip install .[aio]" % url.drivername.split('+')[-1]) from error
+        _ASYNC_ENGINE = engine
+    return _ASYNC_ENGINE
+
+
+async def dispose_async_engine():
+    """
+    Closes the connections of the asynchronous engine, to be awaited before
+    closing the event loop that used it.
+    """
+    global _ASYNC_ENGINE
+    if _ASYNC_ENGINE is not None:
+        await _ASYNC_ENGINE.dispose()
+        _ASYNC_ENGINE = None
+
+
+def _return_id(obj, keyid_attr):
+    return obj if isinstance(obj, int) else getattr(obj, keyid_attr)
+
+
+class OptOwner:
+    """
+        Represents an option owner in the asyncio interface.
+
+        This class is not meant to be used by itself, but through its
+        inherited classes Job and Event to give them asynchronous access to
+        their options.
+
+        Parameters
+        ----------
+        optowner_id : int
+            Primary key id of the table row.
+    """
+    def __init__(self, optowner_id):
+        self._optowner_id = optowner_id
+
+    def __repr__(self):
+        return '%s(%d)' % (self.__class__.__name__, self._optowner_id)
+
+    async def _touch(self, conn, timestamp):
+        await conn.execute(si.sa.update(si.OptOwner.__table__).
+                           where(si.OptOwner.__table__.c.id == self._optowner_id).
+                           values(timestamp=timestamp))
+
+    async def options(self):
+        """
+        Returns the options of the option owner.
+
+        Returns
+        -------
+        options : dict
+            Option values keyed by option name.
+        """
+        table = si.Option.__table__
+        async with get_async_engine().connect() as conn:
+            result = await conn.execute(si.sa.select(table.c.name, table.c.value, table.c.value_type).
+                                        where(table.c.optowner_id == self._optowner_id))
+            return dict((row.name, decode_value(row.value, row.value_type)) for row in result)
+
+    async def get_option(self, name):
+        """
+        Returns the value of the option of given name.
+
+        Parameters
+        ----------
+        name : str
+            Name of the option.
+
+        Returns
+        -------
+        value
+            Decoded value of the option.
+        """
+        table = si.Option.__table__
+        async with get_async_engine().connect() as conn:
+            row = (await conn.execute(si.sa.select(table.c.value, table.c.value_type).
+                                      where(table.c.optowner_id == self._optowner_id).
+                                      where(table.c.name == name))).first()
+        if row is None:
+            raise KeyError(name)
+        return decode_value(row.value, row.value_type)
+
+    async def set_option(self, name, value):
+        """
+        Sets the value of the option of given name, creating the option if it
+        does not exist.
+
+        Parameters
+        ----------
+        name : str
+            Name of the option.
+        value
+            Value of the option.
+        """
+        table = si.Option.__table__
+        string, value_type = encode_value(value)
+        values = dict(value=string, value_type=value_type, counter=_return_counter(value),
+                      timestamp=datetime.datetime.utcnow())
+        update = si.sa.update(table).where(table.c.optowner_id == self._optowner_id). \
+            where(table.c.name == name).values(**values)
+        async with get_async_engine().begin() as conn:
+            if (await conn.execute(update)).rowcount:
+                return
+            try:
+                async with conn.begin_nested():
+                    await conn.execute(si.sa.insert(table).values(optowner_id=self._optowner_id,
+                                                                  name=name, **values))
+            except si.exc.IntegrityError:
+                # inserted concurrently by another coroutine or process
+                await conn.execute(update)
+
+
+class Job(OptOwner):
+    """
+        Represents a job in the asyncio interface.
+
+        Call signatures::
+
+            Job(job_id)
+            Job(job)
+
+        Parameters
+        ----------
+        job : int or :obj:`wpipe.Job`
+            Primary key id of the `jobs` table row, or Job object of that row.
+    """
+    def __init__(self, job):
+        super().__init__(_return_id(job, 'job_id'))
+        self._row = None
+
+    @property
+    def job_id(self):
+        """
+        int: Primary key id of the table row.
+        """
+        return self._optowner_id
+
+    @property
+    def row(self):
+        """
+        dict: Column values of the `jobs` table row, as last read by
+        :meth:`refresh` or by :meth:`Pipeline.jobs_where` - None if not read.
+        """
+        return self._row
+
+    async def refresh(self):
+        """
+        Reads the column values of the `jobs` table row.
+
+        Returns
+        -------
+        row : dict
+            Column values of the row.
+        """
+        table = si.Job.__table__
+        async with get_async_engine().connect() as conn:
+            row = (await conn.execute(si.sa.select(table).where(table.c.id == self.job_id))).first()
+        if row is None:
+            raise LookupError("No job of id %d" % self.job_id)
+        self._row = dict(row._mapping)
+        return self._row
+
+    async def state(self):
+        """
+        Returns the state of the job.
+
+        Returns
+        -------
+        state : str
+            State of the job.
+        """
+        return (await self.refresh())['state']
+
+    async def set_state(self, state):
+        """
+        Sets the state of the job and updates its timestamp.
+
+        Parameters
+        ----------
+        state : str
+            New state of the job.
+        """
+        table = si.Job.__table__
+        async with get_async_engine().begin() as conn:
+            await conn.execute(si.sa.update(table).where(table.c.id == self.job_id).
+                               values(state=state[:256]))
+            await self._touch(conn, datetime.datetime.utcnow())
+        if self._row is not None:
+            self._row['state'] = state[:256]
+
+
+class Event(OptOwner):
+    """
+        Represents an event in the asyncio interface.
+
+        Call signatures::
+
+            Event(event_id)
+            Event(event)
+
+        Parameters
+        ----------
+        event : int or :obj:`wpipe.Event`
+            Primary key id of the `events` table row, or Event object of that
+            row.
+    """
+    def __init__(self, event):
+        super().__init__(_return_id(event, 'event_id'))
+
+    @property
+    def event_id(self):
+        """
+        int: Primary key id of the table row.
+        """
+        return self._optowner_id
+
+    def _fire(self):
+        from .Event import Event as _Event
+        return _Event(self.event_id).fire()
+
+    async def fire(self):
+        """
+        Fires the event, submitting the jobs of the tasks it triggers - see
+        :meth:`wpipe.Event.fire`.
+
+        Notes
+        -----
+        The firing reuses the routing and submission logic of wpipe.Event,
+        run in the default executor of the event loop so that it does not
+        block it.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self._fire)
+
+
+class Pipeline:
+    """
+        Represents a pipeline in the asyncio interface.
+
+        Call signatures::
+
+            Pipeline(pipeline_id)
+            Pipeline(pipeline)
+
+        Parameters
+        ----------
+        pipeline : int or :obj:`wpipe.Pipeline`
+            Primary key id of the `pipelines` table row, or Pipeline object of
+            that row.
+    """
+    def __init__(self, pipeline):
+        self._pipeline_id = _return_id(pipeline, 'pipeline_id')
+
+    def __repr__(self):
+        return 'Pipeline(%d)' % self._pipeline_id
+
+    @property
+    def pipeline_id(self):
+        """
+        int: Primary key id of the table row.
+        """
+        return self._pipeline_id
+
+    async def jobs_where(self, *criteria, task_name=None, yield_per=1000, **filters):
+        """
+        Iterates asynchronously over the jobs of the pipeline matching given
+        criteria, reading them from the database by pages.
+
+        Parameters
+        ----------
+        criteria
+            SQL expressions on the columns of the tables `jobs` and `tasks`.
+        task_name : str
+            Name of the task of the jobs - defaults to None for all tasks.
+        yield_per : int
+            Number of jobs read per query - defaults to 1000.
+        filters
+            Values of the columns of the table `jobs`, such as state.
+
+        Yields
+        ------
+        job : :obj:`Job`
+            Matching job, with its column values in attribute row.
+
+        Notes
+        -----
+        Each page is read with its own short transaction, released before its
+        jobs are yielded, so that the iterating coroutine may update them
+        without waiting on its own read. Pages are delimited by job id, and
+        jobs updated so that they stop matching the criteria during the
+        iteration do not shift the following pages.
+        """
+        jobs, tasks = si.Job.__table__, si.Task.__table__
+        query = si.sa.select(jobs).join(tasks, jobs.c.task_id == tasks.c.id). \
+            where(tasks.c.pipeline_id == self._pipeline_id).where(*criteria). \
+            where(*[jobs.c[key] == value for key, value in filters.items()]). \
+            order_by(jobs.c.id).limit(yield_per)
+        if task_name is not None:
+            query = query.where(tasks.c.name == task_name)
+        last_id = None
+        while True:
+            async with get_async_engine().connect() as conn:
+                rows = (await conn.execute(query if last_id is None else
+                                           query.where(jobs.c.id > last_id))).all()
+            for row in rows:
+                job = Job(row.id)
+                job._row = dict(row._mapping)
+                yield job
+            if len(rows) < yield_per:
+                break
+            last_id = rows[-1].id
@@ -1,4 +1,6 @@
 import os
 
 WPIPE_NO_SCHEDULER = os.getenv('WPIPE_NO_SCHEDULER') is not None
+WPIPE_LOCAL_EXECUTOR = os.getenv('WPIPE_LOCAL_EXECUTOR') is not None
 LOGPRINT_TIMESTAMP = os.getenv('WPIPE_LOGPRINT_TIMESTAMP') is not None
+WPIPE_MEMOIZE = os.getenv('WPIPE_MEMOIZE') is not None
@@ -22,6 +22,9 @@ import warnings
 import json
 import ast
 import atexit
+import weakref
+import hashlib
+import threading
 
 import numpy as np
 import pandas as pd
@@ -30,8 +33,9 @@ from . import sqlintf as si
 
 __all__ = ['importlib', 'contextlib', 'os', 'sys', 'pathlib', 'types',
            'datetime', 'time', 'subprocess', 'logging', 'glob', 'shutil',
-           'warnings', 'json', 'ast', 'atexit', 'np', 'pd', 'si', 'PARSER',
-           'as_int', 'clean_path', 'split_path', 'remove_path',
+           'warnings', 'json', 'ast', 'atexit', 'hashlib', 'np', 'pd', 'si', 'PARSER',
+           'as_int', 'clean_path', 'split_path', 'remove_path', 'file_digest', 'in_chunks',
+           'IdentityMap', 'ThreadLocalAttribute', 'ThreadLocalMeta',
            'make_yield_session_if_not_cached', 'make_query_rtn_upd',
            'key_wpipe_separator', 'initialize_args',
            'wpipe_to_sqlintf_connection', 'in_session',
@@ -147,12 +151,291 @@ def remove_path(*paths, hard=False):
         raise TypeError('remove_path expected at least 1 arguments, get 0')
 
 
+def file_digest(path):
+    """
+    Returns the SHA-256 hexadecimal digest of the content of file at path.
+
+    Parameters
+    ----------
+    path : string
+        Path where file is located.
+
+    Returns
+    -------
+    out : string
+        Digest of the file content, or None if there is no file at path.
+    """
+    if not os.path.isfile(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+IN_CHUNK_SIZE = 500
+"""
+int: largest number of values bound in a single IN clause, well below the
+limits of the database backends on the number of parameters of a statement.
+"""
+
+
+def in_chunks(values):
+    """
+    Returns given values split into lists of at most IN_CHUNK_SIZE values, to
+    bind in successive IN clauses.
+
+    Parameters
+    ----------
+    values : iterable
+        Values to split.
+
+    Returns
+    -------
+    out : list of lists
+        Successive chunks of the values.
+    """
+    values = list(values)
+    return [values[i:i + IN_CHUNK_SIZE] for i in range(0, len(values), IN_CHUNK_SIZE)]
+
+
+class IdentityMap:
+    """
+        Cache of the Wpipe objects of a class, hash-indexed by primary key id
+        and by the tuple of unique attributes of their table row.
+
+        Lookups, insertions and removals are constant-time. The objects are
+        held through weak references: an object that is not referenced
+        anywhere else anymore leaves the cache, which hence does not grow
+        without limit in long-running processes. Its updates are guarded by
+        a lock, so that the threads of a process can share it.
+
+        Parameters
+        ----------
+        keyid_attr : string
+            Name of the Wpipe attribute holding the primary key id.
+        uniq_attrs : list of string
+            Names of the columns uniquely identifying a table row.
+        class_low : string
+            Lower case name of the Wpipe class.
+    """
+    def __init__(self, keyid_attr, uniq_attrs, class_low):
+        self.keyid_attr = keyid_attr
+        self.uniq_attrs = list(uniq_attrs)
+        self.class_low = class_low
+        self._keyid_index = weakref.WeakValueDictionary()
+        self._args_index = weakref.WeakValueDictionary()
+        self._keys = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._keys.keys()))
+
+    def __contains__(self, obj):
+        return obj in self._keys
+
+    def locate(self, kind, loc):
+        """
+        Returns the cached object corresponding to given key.
+
+        Parameters
+        ----------
+        kind : string
+            Kind of key: 'keyid' for the primary key id, 'args' for the tuple
+            of unique attributes.
+        loc : int or tuple
+            Key to look for.
+
+        Returns
+        -------
+        obj
+            Cached Wpipe object - raise a KeyError if not cached.
+        """
+        if kind == 'keyid':
+            return self._keyid_index[loc]
+        elif kind == 'args':
+            return self._args_index[tuple(loc)]
+        else:
+            raise KeyError(kind)
+
+    def add(self, row):
+        """
+        Cache an object, or re-index it if already cached.
+
+        Parameters
+        ----------
+        row : dict
+            Dictionary with the object under the key class_low, and the values
+            of its primary key id and unique attributes under their names.
+        """
+        obj = row[self.class_low]
+        keyid = row[self.keyid_attr]
+        args = tuple(row[attr] for attr in self.uniq_attrs)
+        with self._lock:
+            if self._keys.get(obj, None) != (keyid, args):
+                self._discard(obj)
+                self._keyid_index[keyid] = obj
+                self._args_index[args] = obj
+                self._keys[obj] = (keyid, args)
+
+    def discard(self, obj):
+        """
+        Remove an object from the cache if cached.
+
+        Parameters
+        ----------
+        obj
+            Wpipe object to remove.
+        """
+        with self._lock:
+            self._discard(obj)
+
+    def _discard(self, obj):
+        keyid, args = self._keys.pop(obj, (None, None))
+        if self._keyid_index.get(keyid, None) is obj:
+            del self._keyid_index[keyid]
+        if self._args_index.get(args, None) is obj:
+            del self._args_index[args]
+
+
+_NO_DEFAULT = object()
+
+
+class ThreadLocalAttribute:
+    """
+        Descriptor of an attribute of the Wpipe objects which value is
+        specific to each thread.
+
+        The Wpipe objects are shared by all threads of a process, while each
+        thread accesses the database with its own session: the sqlintf row
+        that a Wpipe object wraps, and the session it swaps in during its
+        methods, are hence held per thread. A thread reading the attribute
+        before setting it gets the default value if any, or a copy of the
+        row last set by another thread, loaded in its own session.
+
+        Parameters
+        ----------
+        default
+            Value of the attribute in a thread that did not set it - if not
+            given, the attribute holds a sqlintf row.
+    """
+    def __init__(self, default=_NO_DEFAULT):
+        self.default = default
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        try:
+            row, local = obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+        try:
+            return local.value
+        except AttributeError:
+            local.value = self.default if self.default is not _NO_DEFAULT else _thread_row(row)
+            return local.value
+
+    def __set__(self, obj, value):
+        _row, local = obj.__dict__.get(self.name, (None, threading.local()))
+        obj.__dict__[self.name] = (value, local)
+        local.value = value
+
+    def thread_value(self, obj, default=None):
+        """
+        Returns the value of the attribute set in the current thread, or
+        given default value if it was not set in this thread.
+        """
+        try:
+            return obj.__dict__[self.name][1].value
+        except (KeyError, AttributeError):
+            return default
+
+
+def _thread_row(row):
+    # the row of another thread is attached to its session: this thread gets
+    # the same table row from its own session instead
+    state = si.sa.inspect(row, raiseerr=False)
+    if state is None or state.identity is None:
+        return row
+    if si.SCOPE.session is not None:
+        copy = si.SCOPE.session.get(type(row), state.identity)
+    else:
+        for session in si.begin_session():
+            with session as session:
+                copy = session.get(type(row), state.identity)
+    if copy is None:
+        return row
+    if hasattr(row, '_wpipe_object'):
+        copy._wpipe_object = row._wpipe_object
+    return copy
+
+
+class _ThreadLocalClassAttribute:
+    # class attribute which value is specific to each thread
+    def __init__(self, name):
+        self.name = name
+        self._local = threading.local()
+
+    def _values(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            self._local.values = {}
+            return self._local.values
+
+    def __get__(self, cls, metacls=None):
+        if cls is None:
+            return self
+        try:
+            return self._values()[cls]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+    def __set__(self, cls, value):
+        self._values()[cls] = value
+
+    def __delete__(self, cls):
+        try:
+            del self._values()[cls]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+
+class ThreadLocalMeta(type):
+    """
+        Metaclass of the Wpipe classes which constructors keep their
+        intermediate state in class attributes: these attributes, as well as
+        the class attributes named after the ThreadLocalAttribute descriptors
+        of the class, are specific to each thread, so that the threads of a
+        process can construct Wpipe objects concurrently.
+    """
+    _inst = _ThreadLocalClassAttribute('_inst')
+    _to_cache = _ThreadLocalClassAttribute('_to_cache')
+    _temp = _ThreadLocalClassAttribute('_temp')
+
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        for attr, value in namespace.items():
+            if isinstance(value, ThreadLocalAttribute) and value.default is _NO_DEFAULT \
+                    and attr not in vars(ThreadLocalMeta):
+                setattr(ThreadLocalMeta, attr, _ThreadLocalClassAttribute(attr))
+
+
 def make_yield_session_if_not_cached(keyid_attr, uniq_attrs, class_low):
     def yield_session_if_not_cached(cls, kind, loc):
         if kind not in ['keyid', 'args']:
             raise KeyError(kind)
         try:
-            cls._inst = cls.__cache__.set_index({'keyid': keyid_attr, 'args': uniq_attrs}[kind]).loc[loc][class_low]
+            cls._inst = cls.__cache__.locate(kind, loc)
             setattr(cls, '_%s' % class_low, getattr(cls._inst, '_%s' % class_low))
         except KeyError:
             for session in si.begin_session():
@@ -169,22 +452,11 @@ def make_yield_session_if_not_cached(keyid_attr, uniq_attrs, class_low):
 def make_query_rtn_upd(class_low, keyid_attr, uniq_attrs):
     def query_return_and_update_cached_row(self, value_attr):
         _sqlintf = getattr(self, '_%s' % class_low)
-        value = getattr(_sqlintf, value_attr)
-        temp = self.__cache__[class_low] == self
-        # SOMEHOW, THIS BLOC BELOW IS NECESSARY
-        if temp.sum() == 0:
-            keyid = _sqlintf
-            temp = self.__cache__[keyid_attr] == keyid
-        if temp.sum() == 0:
-            _to_cache = {keyid_attr: keyid}
-            for attr in uniq_attrs:
-                _to_cache[attr] = getattr(_sqlintf, attr)
-            _to_cache[class_low] = self
-            self.__class__.__cache__.loc[len(self.__cache__)] = _to_cache
-        ########################################
-        elif (getattr(self.__cache__[temp], value_attr) != value).iloc[0]:
-            self.__cache__.loc[temp, value_attr] = value
-        return value
+        _to_cache = {keyid_attr: _sqlintf.id, class_low: self}
+        for attr in uniq_attrs:
+            _to_cache[attr] = getattr(_sqlintf, attr)
+        self.__cache__.add(_to_cache)
+        return getattr(_sqlintf, value_attr)
     return query_return_and_update_cached_row
 
 
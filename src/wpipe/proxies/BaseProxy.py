@@ -6,10 +6,12 @@ classes
 Please note that this module is private. The proxies.BaseProxy class is
 available in the ``wpipe.proxies`` namespace - use that instead.
 """
-from .core import numbers, datetime, si, in_session, try_scalar
+from .core import numbers, datetime, si, in_session, ThreadLocalAttribute, encode_value, decode_value, decoded_attribute
 
 __all__ = ['BaseProxy']
 
+COUNTER_ATTR = 'counter'
+
 
 class BaseProxy:
     """
@@ -23,6 +25,8 @@ class BaseProxy:
             TODO
         try_scalar : boolean
             TODO
+        value
+            Already known value of the attribute, spares its query.
 
         Attributes
         ----------
@@ -35,15 +39,30 @@ class BaseProxy:
         try_scalar : boolean
             TODO
     """
+    _parent = ThreadLocalAttribute()
+    _session = ThreadLocalAttribute(default=None)
+
     def __new__(cls, *args, **kwargs):
         if cls is BaseProxy:
             parent = kwargs.pop('parent', None)
-            for session in si.begin_session():
-                with session as session:
-                    session.add(parent)
-                    proxy = getattr(parent, kwargs.pop('attr_name', ''))
-            if kwargs.pop('try_scalar', False):
-                proxy = try_scalar(proxy)
+            attr_name = kwargs.pop('attr_name', '')
+            if 'value' in kwargs:
+                kwargs.pop('try_scalar', False)
+                proxy = kwargs.pop('value')
+            elif not {attr_name, 'value_type'} & si.sa.inspect(parent).unloaded:
+                # already loaded by the query that located the parent
+                if kwargs.pop('try_scalar', False):
+                    proxy = decoded_attribute(parent, attr_name)
+                else:
+                    proxy = getattr(parent, attr_name)
+            else:
+                for session in si.begin_session():
+                    with session as session:
+                        session.add(parent)
+                        if kwargs.pop('try_scalar', False):
+                            proxy = decoded_attribute(parent, attr_name)
+                        else:
+                            proxy = getattr(parent, attr_name)
             if proxy is None:
                 cls = type(None)
                 args = []
@@ -66,7 +85,8 @@ class BaseProxy:
         self._attr_name = kwargs.pop('attr_name', '')
         self._try_scalar = kwargs.pop('try_scalar', False)
         self._session = None
-        self._parent_id = self._get_parent_id()
+        identity = si.sa.inspect(self._parent).identity
+        self._parent_id = self._get_parent_id() if identity is None else int(identity[0])
 
     @property
     def parent(self):
@@ -109,16 +129,24 @@ class BaseProxy:
         """
         TODO
         """
+        if operator in ['__add__', '__sub__'] and isinstance(other, int) and not isinstance(other, bool):
+            _result = self._atomic_increment(other if operator == '__add__' else -other)
+            if _result is not None:
+                return BaseProxy(parent=self.parent,
+                                 attr_name=self.attr_name,
+                                 try_scalar=self.try_scalar,
+                                 value=_result)
         for retry in self._session.retrying_nested():
             with retry:
                 _temp = retry.retry_state.query(self.parent.__class__).with_for_update(). \
                     filter_by(id=self.parent_id).one()
                 retry.retry_state.refresh(_temp)
-                _result = getattr(
-                    [lambda x: x, try_scalar][self._try_scalar](getattr(_temp, self.attr_name)),
-                    operator)(other)
+                _current = getattr(_temp, self.attr_name)
+                if self._try_scalar:
+                    _current = decode_value(_current, getattr(_temp, 'value_type', None))
+                _result = getattr(_current, operator)(other)
                 if _result is not NotImplemented:
-                    setattr(_temp, self.attr_name, _result)
+                    self._set_attribute(_temp, _result)
                     _temp = BaseProxy(parent=self.parent,
                                       attr_name=self.attr_name,
                                       try_scalar=self.try_scalar)
@@ -127,3 +155,36 @@ class BaseProxy:
             raise TypeError("unsupported operand type(s) for augmented assignment")
         else:
             return _temp
+
+    def _set_attribute(self, row, value):
+        if self.attr_name == 'value' and hasattr(row, 'value_type'):
+            if hasattr(row, COUNTER_ATTR):
+                setattr(row, COUNTER_ATTR, value if isinstance(value, int) and not isinstance(value, bool) else None)
+            row.value, row.value_type = encode_value(value)
+        else:
+            setattr(row, self.attr_name, value)
+
+    def _atomic_increment(self, step):
+        """
+        Increments the integer counter column of the parent row in place with
+        a single UPDATE statement, and returns its new value, or None if the
+        parent row does not hold a counter.
+        """
+        table = self.parent.__class__
+        if self.attr_name != 'value' or not hasattr(table, COUNTER_ATTR):
+            return None
+        counter = getattr(table, COUNTER_ATTR)
+        for retry in self._session.retrying_nested():
+            with retry:
+                # value is assigned first so that it reads the counter before its update on all backends
+                updated = retry.retry_state.session.execute(
+                    si.sa.update(table).
+                    where(table.id == self.parent_id).
+                    where(counter.isnot(None)).
+                    ordered_values((getattr(table, self.attr_name), si.sa.cast(counter + step, si.sa.String(256))),
+                                   (counter, counter + step)).
+                    execution_options(synchronize_session=False)).rowcount
+                _result = retry.retry_state.session.query(counter).filter(table.id == self.parent_id).scalar() \
+                    if updated else None
+                retry.retry_state.commit()
+        return _result
@@ -5,7 +5,7 @@ Contains the proxies.ChildrenProxy class definition
 Please note that this module is private. The proxies.ChildrenProxy class is
 available in the ``wpipe.proxies`` namespace - use that instead.
 """
-from .core import contextlib, sys, np, in_session
+from .core import contextlib, sys, np, pd, si, in_session, ThreadLocalAttribute
 
 __all__ = ['ChildrenProxy']
 
@@ -25,6 +25,10 @@ class ChildrenProxy:  # TODO: Generalize proxy object with the BaseProxy
         child_attr : string
             Child attribute that distinguishes the children from one another.
     """
+    _parent = ThreadLocalAttribute()
+    _session = ThreadLocalAttribute(default=None)
+    _work_with_sqlintf = ThreadLocalAttribute(default=0)
+    _hold_struct_children = ThreadLocalAttribute(default=None)
 
     def __init__(self, parent, children_attr, cls_name, child_attr='name'):
         self._parent = parent
@@ -47,20 +51,56 @@ class ChildrenProxy:  # TODO: Generalize proxy object with the BaseProxy
         return len(self.children)
 
     def __iter__(self):
-        self.n = 0
-        self.len = len(self)  # CURRENTLY NEEDED FOR DELETION ISSUES
-        return self
-
-    def __next__(self):
-        self.n -= self.len - len(self)  # CURRENTLY NEEDED FOR DELETION ISSUES
-        self.len = len(self)  # CURRENTLY NEEDED FOR DELETION ISSUES
-        if 0 <= self.n < self.len:
-            result = self[self.n]
-            self.n += 1
-            return result
-        else:
-            del self.n, self.len
-            raise StopIteration
+        return self.snapshot()
+
+    def snapshot(self, yield_per=None):
+        """
+        Returns an iterator over the children loaded from the database at the
+        start of the iteration, either all at once or by chunks.
+
+        Parameters
+        ----------
+        yield_per : int
+            Number of children to load per query - defaults to None, in which
+            case all children are loaded with a single query.
+
+        Returns
+        -------
+        iterator
+            Iterator over the children.
+        """
+        if self._hold_struct_children is not None:
+            yield from map(self._wrap_child, list(self._hold_struct_children))
+            return
+        last_id = None
+        while True:
+            children = self._load_children(last_id, yield_per)
+            yield from map(self._wrap_child, children)
+            if yield_per is None or len(children) < yield_per:
+                return
+            last_id = children[-1].id
+
+    def live(self):
+        """
+        Returns an iterator over the children that refreshes the collection at
+        every step, hence supporting deletion of children while iterating.
+
+        Returns
+        -------
+        iterator
+            Iterator over the children.
+        """
+        n = 0
+        length = len(self)
+        while True:
+            new_length = len(self)
+            n -= length - new_length
+            length = new_length
+            if 0 <= n < length:
+                yield self[n]
+                n += 1
+            else:
+                return
 
     def __getitem__(self, item):
         if isinstance(item, str):
@@ -72,16 +112,80 @@ class ChildrenProxy:  # TODO: Generalize proxy object with the BaseProxy
         elif np.ndim(item) == 0:
             return self._get_child_of_index(item)
         elif hasattr(item, '__len__'):  # TODO: what about slices?
-            return [self[i] for i in np.arange(len(self))[item]]  # TODO: cannot work well if collection change size
+            return self._get_children_of_ids(self.column('id')[np.asarray(item)])
         else:
             raise TypeError  # TODO
 
     @in_session('_parent')
     def __getattr__(self, item):
         if hasattr(getattr(sys.modules['wpipe'], self._cls_name), item):
+            return self.column(item)
+
+    @in_session('_parent')
+    def column(self, item):
+        """
+        Returns the values of an attribute of all children, ordered by their
+        primary key id.
+
+        Parameters
+        ----------
+        item : string
+            Name of the attribute of the children sqlintf objects.
+
+        Returns
+        -------
+        values : :obj:`numpy.ndarray`
+            Array of the attribute values.
+
+        Notes
+        -----
+        If the attribute is a column of the children table, the values are
+        fetched with a single query without building any child object.
+        """
+        return self.frame([item])[item].to_numpy()
+
+    @in_session('_parent')
+    def frame(self, items):
+        """
+        Returns the values of attributes of all children, ordered by their
+        primary key id.
+
+        Parameters
+        ----------
+        items : list of string
+            Names of the attributes of the children sqlintf objects.
+
+        Returns
+        -------
+        values : :obj:`pandas.DataFrame`
+            DataFrame of the attribute values indexed by the children primary
+            key ids.
+
+        Notes
+        -----
+        If all attributes are columns of the children table, the values are
+        fetched with a single query without building any child object. The
+        columns holding NULL values keep them as None, with the other values
+        as they are, in columns of dtype object.
+        """
+        items = list(items)
+        child_cls, parent_key = self._children_class_and_key()
+        mapper = si.sa.inspect(child_cls)
+        if self._hold_struct_children is None and \
+                all(item in mapper.column_attrs.keys() or item in mapper.synonyms.keys() for item in items):
+            rows = self._session.query(child_cls.id, *[getattr(child_cls, item) for item in items]). \
+                filter(parent_key == self._parent_id).order_by(child_cls.id).all()
+        else:
             self._refresh()
-            with self._with_sqlintf():
-                return np.array([getattr(self[i], item) for i in range(len(self))])
+            children = sorted(self.children, key=lambda child: child.id)
+            rows = [[child.id] + [getattr(child, item) for item in items] for child in children]
+        frame = pd.DataFrame.from_records(rows, columns=['_id'] + items, coerce_float=False)
+        for position, item in enumerate(items, 1):
+            values = [row[position] for row in rows]
+            if any(value is None for value in values):
+                # keeping None, and the integers of an integer column, instead of NaN
+                frame[item] = pd.Series(values, index=frame.index, dtype=object)
+        return frame.set_index('_id').rename_axis('id')
 
     @property
     def children(self):
@@ -109,28 +213,60 @@ class ChildrenProxy:  # TODO: Generalize proxy object with the BaseProxy
 
     @in_session('_parent')
     def _get_child_of_index(self, item):
+        return self._wrap_child(self.children[item])
+
+    @in_session('_parent')
+    def _get_children_of_ids(self, ids):
+        ids = [int(_id) for _id in ids]
+        if not ids:
+            return []
+        if self._hold_struct_children is None:
+            child_cls, parent_key = self._children_class_and_key()
+            children = self._session.query(child_cls).filter(child_cls.id.in_(ids)).all()
+        else:
+            children = self._hold_struct_children
+        children = dict((child.id, child) for child in children)
+        return [self._wrap_child(children[_id]) for _id in ids if _id in children]
+
+    def _wrap_child(self, child):
         if self._work_with_sqlintf == 0:
-            return getattr(sys.modules['wpipe'], self._cls_name)(self.children[item])
+            return getattr(sys.modules['wpipe'], self._cls_name)(child)
         else:
-            return self.children[item]
+            return child
+
+    @in_session('_parent')
+    def _load_children(self, last_id=None, limit=None):
+        child_cls, parent_key = self._children_class_and_key()
+        query = self._session.query(child_cls).populate_existing().filter(parent_key == self._parent_id)
+        if last_id is not None:
+            query = query.filter(child_cls.id > last_id)
+        query = query.order_by(child_cls.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def _children_class_and_key(self):
+        prop = getattr(self._parent.__class__, self._children_attr).property
+        (_, parent_key), = prop.local_remote_pairs
+        return prop.mapper.class_, parent_key
 
     @in_session('_parent')
     def _search_child_from_attritem(self, item):
-        for retry in self._session.retrying_nested():
-            with retry:
-                _temp = retry.retry_state.query(self._parent.__class__).with_for_update(). \
-                    filter_by(id=self._parent_id).one()
-                _temp = None
-                for child in self.children:
-                    if getattr(child, self._child_attr) == item:
-                        _temp = child
-                        break
-                retry.retry_state.commit()
+        if self._hold_struct_children is None:
+            # reading only: single indexed query without locking the parent row
+            child_cls, parent_key = self._children_class_and_key()
+            _temp = self._session.query(child_cls).populate_existing(). \
+                filter(parent_key == self._parent_id). \
+                filter(getattr(child_cls, self._child_attr) == item). \
+                order_by(child_cls.id).first()
+        else:
+            _temp = None
+            for child in self.children:
+                if getattr(child, self._child_attr) == item:
+                    _temp = child
+                    break
         if _temp is not None:
-            if self._work_with_sqlintf == 0:
-                return getattr(sys.modules['wpipe'], self._cls_name)(_temp)
-            else:
-                return _temp
+            return self._wrap_child(_temp)
 
     @contextlib.contextmanager
     def _with_sqlintf(self):
@@ -39,7 +39,27 @@ class DictLikeChildrenProxy(ChildrenProxy):
         return repr(dict(self._items))
 
     def __getitem__(self, item):
-        child = super(DictLikeChildrenProxy, self).__getitem__(item)
+        return self._value_proxy(super(DictLikeChildrenProxy, self).__getitem__(item))
+
+    def snapshot(self, yield_per=None):
+        """
+        Returns an iterator over the children values loaded from the database
+        at the start of the iteration, either all at once or by chunks.
+
+        Parameters
+        ----------
+        yield_per : int
+            Number of children to load per query - defaults to None, in which
+            case all children are loaded with a single query.
+
+        Returns
+        -------
+        iterator
+            Iterator over the children values.
+        """
+        return map(self._value_proxy, super(DictLikeChildrenProxy, self).snapshot(yield_per))
+
+    def _value_proxy(self, child):
         return BaseProxy(parent=getattr(child, '_'+self._cls_name.lower()),
                          attr_name=self._child_value,
                          try_scalar=True)
@@ -7,17 +7,26 @@ are available in the main ``wpipe.proxies`` namespace - use that instead.
 """
 import ast
 import contextlib
+import functools
 import sys
 import itertools
 import numbers
 import datetime
 
 import numpy as np
+import pandas as pd
 
-from ..core import si, in_session
+from ..core import si, in_session, ThreadLocalAttribute
 
-__all__ = ['contextlib', 'sys', 'itertools', 'numbers', 'datetime', 'np',
-           'si', 'in_session', 'try_scalar']
+__all__ = ['contextlib', 'sys', 'itertools', 'numbers', 'datetime', 'np', 'pd',
+           'si', 'in_session', 'ThreadLocalAttribute', 'try_scalar', 'VALUE_TYPES', 'encode_value', 'decode_value',
+           'decoded_attribute']
+
+VALUE_TYPES = {int: 'int', float: 'float', bool: 'bool', str: 'str'}
+"""
+dict: names of the value types stored next to the values, other values being
+stored as python literals under the type name 'literal'.
+"""
 
 _try_scalar_nan_dict = {'nan': float('NaN'),
                         'inf': float('Inf'),
@@ -42,3 +51,110 @@ def try_scalar(string):
         return ast.literal_eval(string)
     except (ValueError, NameError, SyntaxError):
         return _try_scalar_nan_dict.get(string.lower() if isinstance(string, str) else None, string)
+
+
+def encode_value(value):
+    """
+    Returns given value as string to store, together with its type name.
+
+    Parameters
+    ----------
+    value
+        Input value.
+
+    Returns
+    -------
+    string : string
+        String conversion of the value.
+    value_type : string
+        Name of the type the string decodes into: 'int', 'float', 'bool',
+        'str' or 'literal'.
+
+    Notes
+    -----
+    The type name is that of the value itself, so that strings are stored as
+    'str' and read back as strings whatever they hold, such as '5'.
+    """
+    if isinstance(value, (bool, np.bool_)):
+        value_type = 'bool'
+    elif isinstance(value, numbers.Integral):
+        value_type = 'int'
+    elif isinstance(value, numbers.Real):
+        value_type = 'float'
+    elif isinstance(value, str):
+        value_type = 'str'
+    else:
+        value_type = 'literal'
+    return str(value), value_type
+
+
+def decode_value(string, value_type=None):
+    """
+    Returns given stored string decoded according to given type name.
+
+    Parameters
+    ----------
+    string : string
+        Stored string.
+    value_type : string
+        Name of the type the string decodes into - defaults to None, in which
+        case the type is guessed with try_scalar, as for the values stored
+        before the types were.
+
+    Returns
+    -------
+    value
+        Decoded value.
+    """
+    if string is None:
+        return None
+    elif value_type == 'int':
+        return int(string, 0)
+    elif value_type == 'float':
+        return float(string)
+    elif value_type == 'bool':
+        return string == 'True'
+    elif value_type == 'str':
+        return string
+    else:
+        return try_scalar(string)
+
+
+DECODED_CACHE_SIZE = 4096
+"""
+int: number of decoded values kept in the cache of decoded_attribute.
+"""
+
+
+@functools.lru_cache(maxsize=DECODED_CACHE_SIZE)
+def _decoded_value(tablename, row_id, string, value_type):
+    return decode_value(string, value_type)
+
+
+def decoded_attribute(parent, attr_name):
+    """
+    Returns the decoded value of the attribute of given sqlintf object.
+
+    The values which type is not stored, or is a python literal, are decoded
+    by literal_eval: they are kept in a cache keyed by the table row together
+    with the stored string and its type, so that a string changed by any
+    writer misses the cache and is decoded again rather than returning a
+    stale value. Values of scalar types are quicker to convert than to cache.
+
+    Parameters
+    ----------
+    parent : sqlintf object
+        Sqlintf object holding the attribute.
+    attr_name : string
+        Name of the attribute.
+
+    Returns
+    -------
+    value
+        Decoded value.
+    """
+    string = getattr(parent, attr_name)
+    value_type = getattr(parent, 'value_type', None) if attr_name == 'value' else None
+    if string is None or value_type in VALUE_TYPES.values():
+        return decode_value(string, value_type)
+    return _decoded_value(parent.__tablename__, parent.id, string, value_type)
@@ -6,16 +6,18 @@ Please note that this module is private. The scheduler.JobData class is
 available in the ``wpipe.scheduler`` namespace - use that instead.
 """
 import os
+import logging
 from .. import si
 from .PbsScheduler import DEFAULT_NODE_MODEL, DEFAULT_WALLTIME
 from .SlurmScheduler import DEFAULT_MEMORY, DEFAULT_WALLTIME, DEFAULT_ACCOUNT, DEFAULT_PARTITION, DEFAULT_NCPUS
+from .ResourceEstimator import estimateResources
 
 __all__ = ['JobData']
 
 
 # This class makes it so we can pickle and unpickle the info we need for the pbs scheduler for a job
 class JobData:
-    def __init__(self, job):
+    def __init__(self, job, estimate_resources=True):
         # Attributes for PbsKey
         self._task_name = job.task.name
 
@@ -40,14 +42,38 @@ class JobData:
             self._node_model = '' + event_options['node_model']
         except KeyError:
             self._node_model = DEFAULT_NODE_MODEL
+        # the requests given by the event options are kept, the others are
+        # estimated from the recorded runs of the task, if any, for the jobs
+        # sent to a scheduler
+        estimate = None
+        if estimate_resources and ('walltime' not in event_options or 'memory' not in event_options) and \
+                not os.environ.get('WPIPE_NO_RESOURCE_ESTIMATES'):
+            estimate = estimateResources(self._task_name, DEFAULT_WALLTIME, DEFAULT_MEMORY)
+        self._memory_per_job = False
         try:
             self._walltime = str(event_options['walltime'])
+            walltime_source = 'event option'
         except KeyError:
-            self._walltime = DEFAULT_WALLTIME
+            if estimate is not None:
+                self._walltime = estimate[0]
+                walltime_source = 'estimate from %d runs' % estimate[2]
+            else:
+                self._walltime = DEFAULT_WALLTIME
+                walltime_source = 'default'
         try:
             self._memory = str(event_options['memory'])
+            memory_source = 'event option'
         except KeyError:
-            self._memory = DEFAULT_MEMORY
+            if estimate is not None:
+                self._memory = estimate[1]
+                self._memory_per_job = True
+                memory_source = 'estimate from %d runs' % estimate[2]
+            else:
+                self._memory = DEFAULT_MEMORY
+                memory_source = 'default'
+        logging.debug("Requesting wall time %s (%s) and memory %s%s (%s) for job %d of task %s" %
+                      (self._walltime, walltime_source, self._memory, self._memory_per_job * ' per job',
+                       memory_source, self._job_id, self._task_name))
         try:
             self._slurm_partition = str(event_options['partition'])
         except KeyError:
@@ -128,6 +154,10 @@ class JobData:
     def getMemory(self):
         return self._memory
 
+    # True if the memory is that of a single job rather than that of a node
+    def getMemoryPerJob(self):
+        return self._memory_per_job
+
     def getNcpus(self):
         return self._ncpus
 
@@ -160,6 +190,8 @@ class JobData:
             string += '\tRequested Node model: {}\n'.format(self.getNodemodel())
         if self.getWalltime() is not None:
             string += '\tRequested Wall time: {}\n'.format(self.getWalltime())
+        if self.getMemory() is not None:
+            string += '\tRequested Memory: {}{}\n'.format(self.getMemory(), self.getMemoryPerJob() * ' per job')
         if self.getJobOpenMP():
             string += '\tJob requires OpenMP resources\n'
         if self.getCondaEnv():
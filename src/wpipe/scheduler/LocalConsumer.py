@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+"""
+Contains the LocalConsumer utilities including the scheduler.checkLocalConnection
+and scheduler.sendJobToLocal function definitions
+
+Please note that this module is private. These functions are available in the
+main ``wpipe.scheduler`` namespace - use that instead.
+
+The LocalConsumer is a daemon running on the local machine the jobs that are
+not submitted to a scheduler, with a bounded number of worker processes. The
+jobs sent to it are queued as files in the directory QUEUE_DIR, which persists
+the pending jobs across restarts of the daemon: a job is moved to RUNNING_DIR
+while its process runs, and removed when it exits. As for the jobs submitted
+to Slurm or PBS, the task process is given the id of its job, so that it
+records its start and end in the database.
+
+A daemon serves the pipelines of a single database, and runs each job with
+the environment variables and working directory of the process that sent
+it, rather than those of the process that started the daemon.
+"""
+import os
+import sys
+import json
+import time
+import fcntl
+import hashlib
+import logging
+import subprocess
+from datetime import datetime
+
+from .StreamToLogger import StreamToLogger
+from .JobData import JobData
+from .Utils import parse_memory
+
+__all__ = ['HOME_DIR', 'QUEUE_DIR', 'RUNNING_DIR', 'LOCAL_JOB_MEMORY', 'LOCAL_WORKERS',
+           'checkLocalConnection', 'sendJobToLocal']
+
+HOME_DIR = os.path.expanduser('~/.localconsumer/' +
+                              hashlib.sha256(os.environ.get('WPIPE_ENGINEURL', '').encode()).hexdigest()[:16])
+"""
+str: directory of the LocalConsumer of the database given by the environment
+variable WPIPE_ENGINEURL, so that the jobs of another database are never
+run, nor their exits recorded, by a daemon connected to this one.
+"""
+QUEUE_DIR = HOME_DIR + '/queue'
+RUNNING_DIR = HOME_DIR + '/running'
+LOCK_FILE = HOME_DIR + '/lock'
+STOP_FILE = HOME_DIR + '/stop'
+
+POLL_INTERVAL = 0.5
+IDLE_TIMEOUT = 600  # the daemon exits after 10 minutes without jobs
+
+
+def _total_memory():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _available_memory():
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return 1024 * int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _default_workers():
+    ncpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    memory = _total_memory()
+    if memory is None:
+        return ncpus
+    return max(1, min(ncpus, memory // LOCAL_JOB_MEMORY))
+
+
+LOCAL_JOB_MEMORY = parse_memory(os.environ.get('WPIPE_LOCAL_JOB_MEMORY', '2G'))
+"""
+int: memory in bytes that a local job is expected to use, given by the
+environment variable WPIPE_LOCAL_JOB_MEMORY with suffix K, M, G or T - defaults
+to 2G. A new job starts only if that much memory is available, unless no job
+is running.
+"""
+
+LOCAL_WORKERS = int(os.environ.get('WPIPE_LOCAL_WORKERS', _default_workers()))
+"""
+int: maximum number of jobs run concurrently by the LocalConsumer, given by
+the environment variable WPIPE_LOCAL_WORKERS - defaults to the number of
+available CPUs, limited by the number of jobs that fit in memory.
+"""
+
+
+def _make_dirs():
+    for directory in [HOME_DIR, QUEUE_DIR, RUNNING_DIR]:
+        if not os.path.exists(directory):
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        elif not os.path.isdir(directory):
+            raise FileExistsError("%s is not a directory" % directory)
+
+
+def checkLocalConnection():
+    _make_dirs()
+    with open(LOCK_FILE, 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            connected = 0
+        else:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            connected = 1
+    logging.info("Checking connection: {} ...".format(connected))
+    return connected  # non zero for unconnected
+
+
+def _enqueue(entry):
+    # written aside then renamed so that the daemon never reads a partial entry
+    filename = '%020d-%d.json' % (time.time_ns(), entry['job_id'])
+    temp_path = HOME_DIR + '/.' + filename
+    # readable by the user only, as it holds the environment of the sender
+    with os.fdopen(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'w') as temp_file:
+        json.dump(entry, temp_file)
+    os.replace(temp_path, QUEUE_DIR + '/' + filename)
+
+
+# Used by clients to send to the LocalConsumer, either a single job or a list of jobs
+def sendJobToLocal(pipejob, logpath=None):
+    _make_dirs()
+    if isinstance(pipejob, str) and pipejob == "poisonpill":
+        logging.info("Got poisonpill for sending ...")
+        open(STOP_FILE, 'a').close()
+        return
+    for job in (pipejob if isinstance(pipejob, list) else [pipejob]):
+        # the resource requests only matter to Slurm and PBS
+        jobdata = JobData(job, estimate_resources=False)
+
+        errors = jobdata.validate()
+        if errors != "":
+            print("Errors in JobData (will not send): %s" % errors)
+            continue
+
+        _enqueue({'job_id': jobdata.getJobId(),
+                  'command': [jobdata.getTaskExecutable(),
+                              '-p', str(jobdata.getPipelineId()),
+                              '-u', str(jobdata.getPipelineUserName()),
+                              '-j', str(jobdata.getJobId())] + bool(jobdata.getVerbose()) * ['-v'],
+                  'cwd': jobdata.getPipelinePipeRoot(),
+                  'env': dict(os.environ),
+                  'logpath': logpath})
+
+
+def _start(filename):
+    running_path = RUNNING_DIR + '/' + filename
+    os.replace(QUEUE_DIR + '/' + filename, running_path)
+    with open(running_path) as entry_file:
+        entry = json.load(entry_file)
+    logging.info('Starting job %d: %s ...' % (entry['job_id'], ' '.join(entry['command'])))
+    output = open(entry['logpath'], 'a') if entry.get('logpath') else subprocess.DEVNULL
+    try:
+        return entry, subprocess.Popen(entry['command'], cwd=entry['cwd'], env=entry.get('env'),
+                                       stdout=output, stderr=output)
+    except OSError as error:
+        logging.error('Job %d could not start: %s' % (entry['job_id'], error))
+        _record_exit(entry['job_id'], repr(error))
+        os.remove(running_path)
+        return entry, None
+    finally:
+        if output is not subprocess.DEVNULL:
+            output.close()
+
+
+def _record_exit(job_id, reason):
+    # a job process that did not reach its own ending, killed for instance,
+    # would otherwise stay in the initialized or submitted state
+    try:
+        from wpipe import Job
+        from wpipe.Job import JOBINITSTATE, JOBSUBMSTATE
+        job = Job(job_id)
+        if job.state in [JOBINITSTATE, JOBSUBMSTATE]:
+            job.state = reason
+    except Exception as error:
+        logging.error('Could not record the exit of job %d: %r' % (job_id, error))
+
+
+def consume(workers=None):
+    """
+    Runs the queued jobs with at most given number of concurrent processes,
+    until stopped by a poisonpill or idle for IDLE_TIMEOUT seconds.
+
+    Parameters
+    ----------
+    workers : int
+        Maximum number of concurrent job processes - defaults to
+        LOCAL_WORKERS.
+    """
+    workers = LOCAL_WORKERS if workers is None else workers
+    # jobs interrupted by the end of a previous daemon are run again
+    for filename in os.listdir(RUNNING_DIR):
+        os.replace(RUNNING_DIR + '/' + filename, QUEUE_DIR + '/' + filename)
+    running = {}
+    last_activity = time.time()
+    while True:
+        for filename, (entry, process) in list(running.items()):
+            returncode = process.poll()
+            if returncode is not None:
+                logging.info('Job %d exited with code %d ...' % (entry['job_id'], returncode))
+                if returncode != 0:
+                    _record_exit(entry['job_id'], 'Exited with code %d' % returncode)
+                os.remove(RUNNING_DIR + '/' + filename)
+                del running[filename]
+        if os.path.exists(STOP_FILE):
+            if not running:
+                os.remove(STOP_FILE)
+                logging.info('Stopping after poisonpill ...')
+                return
+        else:
+            pending = sorted(filename for filename in os.listdir(QUEUE_DIR) if filename.endswith('.json'))
+            while pending and len(running) < workers:
+                available = _available_memory()
+                if running and available is not None and available < LOCAL_JOB_MEMORY:
+                    break
+                filename = pending.pop(0)
+                entry, process = _start(filename)
+                if process is not None:
+                    running[filename] = (entry, process)
+            if running or pending:
+                last_activity = time.time()
+            elif time.time() - last_activity > IDLE_TIMEOUT:
+                logging.info('Stopping after %d seconds without jobs ...' % IDLE_TIMEOUT)
+                return
+        time.sleep(POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    _make_dirs()
+    lock = open(LOCK_FILE, 'a')
+    # retrying briefly as checkLocalConnection takes the lock for a moment
+    for attempt in range(20):
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            break
+        except BlockingIOError:
+            time.sleep(0.05)
+    else:
+        sys.exit("LocalConsumer is already running ...")
+
+    # Setup the logging
+    logging.basicConfig(filename='LocalConsumerLog-{}.log'.format(datetime.today().strftime('%m-%d-%Y-%H-%M-%S')),
+                        level=logging.DEBUG, filemode='a',
+                        format="[%(asctime)s][%(levelname)s][%(name)s]: %(message)s")
+
+    # capture stdout into log file
+    stdout_logger = logging.getLogger('STDOUT')
+    sl = StreamToLogger(stdout_logger, logging.INFO)
+    sys.stdout = sl
+
+    # capture stderr into log file
+    stderr_logger = logging.getLogger('STDERR')
+    sl = StreamToLogger(stderr_logger, logging.ERROR)
+    sys.stderr = sl
+
+    logging.info('Running LocalConsumer with %d workers ...' % LOCAL_WORKERS)
+    try:
+        consume()
+    finally:
+        logging.info('Closing LocalConsumer ...')
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
@@ -14,14 +14,29 @@ import sys
 from datetime import datetime
 from .StreamToLogger import StreamToLogger
 from .JobData import JobData
+from .Utils import periodic_reap
 from .PbsScheduler import PbsScheduler
-from wpipe.sqlintf import SESSION
+from wpipe.sqlintf import close_session
 
 __all__ = ['BASE_PORT', 'DEFAULT_PORT', 'checkPbsConnection', 'sendJobToPbs']
 
 # TODO: Make this not hardcoded
 HOST_MACHINE = '10.150.27.94'
-BASE_PORT = DEFAULT_PORT = 5000
+BASE_PORT = 5000
+
+
+def _default_port():
+    # BASE_PORT offset by the id of the user, queried at the first connection
+    if 'DEFAULT_PORT' not in globals():
+        from wpipe import DefaultUser
+        globals()['DEFAULT_PORT'] = BASE_PORT + DefaultUser.user_id
+    return globals()['DEFAULT_PORT']
+
+
+def __getattr__(name):
+    if name == 'DEFAULT_PORT':
+        return _default_port()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 
 # HOST_MACHINE = '127.0.0.1' # For debugging
@@ -31,6 +46,7 @@ class PipelineObjectProtocol(asyncio.Protocol):
 
     def __init__(self):
         self.transport = None
+        self.buffer = b''
 
     # Called when a connection is made.
     # Transport is like a socket but we don't really use it.
@@ -42,8 +58,8 @@ class PipelineObjectProtocol(asyncio.Protocol):
         logging.info('Connection was lost ...')
 
     # This is called when data is incoming.
-    # With socket.sendall client side it seems to only call once versus called more than once
-    # and having to put the data into a buffer.
+    # With socket.sendall client side it seems to only call once for a single job, but a batch
+    # of jobs can come in several calls, so the data is put into a buffer until it unpickles.
     def data_received(self, data):
         try:
             if data.decode() == "poisonpill":
@@ -51,50 +67,63 @@ class PipelineObjectProtocol(asyncio.Protocol):
                 asyncio.get_event_loop().stop()
                 return
         except UnicodeDecodeError:
-            jobdata = pickle.loads(data)
+            pass
+        self.buffer += data
+        try:
+            received = pickle.loads(self.buffer)
+        except (EOFError, pickle.UnpicklingError):
+            return  # waiting for the rest of the data
+        self.buffer = b''
+        for jobdata in (received if isinstance(received, list) else [received]):
             errors = jobdata.validate()
             if errors != "":
                 logging.error("Errors in received JobData object (nothing to do): %s" % errors)
-                return
+                continue
 
-        logging.info('Submitting job to scheduler ...')
-        logging.info(jobdata.toString())
-        PbsScheduler.submit(jobdata)
+            logging.info('Submitting job to scheduler ...')
+            logging.info(jobdata.toString())
+            PbsScheduler.submit(jobdata)
 
 
 def checkPbsConnection():
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    connected = s.connect_ex((HOST_MACHINE, DEFAULT_PORT))
+    connected = s.connect_ex((HOST_MACHINE, _default_port()))
     s.close()
     logging.info("Checking connection: {} ...".format(connected))
     return connected  # non zero for unconnected
 
 
-# Used by clients to send to the PbsConsumer
+# Used by clients to send to the PbsConsumer, either a single job or a list of jobs sent as one batch
 def sendJobToPbs(pipejob):
     # TODO: How do we parse for the host machine automatically?
 
     # Turn our object into bytes for sending
     serialized = None
-    if pipejob == "poisonpill":
+    if isinstance(pipejob, str) and pipejob == "poisonpill":
         logging.info("Got poisonpill for sending ...")
         serialized = pipejob.encode()
     else:
         # Store what we need in a new class and pickle
-        jobData = JobData(pipejob)
+        jobDatas = []
+        for job in (pipejob if isinstance(pipejob, list) else [pipejob]):
+            jobData = JobData(job)
+
+            errors = jobData.validate()
+            if errors != "":
+                print("Errors in JobData (will not send): %s" % errors)
+                continue
 
-        errors = jobData.validate()
-        if errors != "":
-            print("Errors in JobData (will not send): %s" % errors)
+            jobDatas.append(jobData)
+        if not jobDatas:
             return
 
-        serialized = pickle.dumps(jobData)
+        serialized = pickle.dumps(jobDatas if isinstance(pipejob, list) else jobDatas[0])
 
     logging.info('Sending to server ...')
 
     # open TCP connection and sendall bytes
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.connect((HOST_MACHINE, DEFAULT_PORT))
+        s.connect((HOST_MACHINE, _default_port()))
         s.sendall(serialized)
         s.close()
 
@@ -105,6 +134,7 @@ def periodicLog():
 
 
 if __name__ == "__main__":
+    from wpipe.Job import HEARTBEAT_TIMEOUT
     from wpipe.scheduler.PbsConsumer import DEFAULT_PORT
     # Setup the logging
     logging.basicConfig(filename='PbsConsumerLog-{}.log'.format(datetime.today().strftime('%m-%d-%Y-%H-%M-%S')),
@@ -136,11 +166,11 @@ if __name__ == "__main__":
         # TODO: Make this more sophisticated
         # Set to turn off after two days.
         logging.info('Running loop forever ...')
-        if SESSION is not None:
-            SESSION.close()
-            # SESSION = None
+        close_session()
         loop.call_later(172800, lambda: sendJobToPbs("poisonpill"))  # This kills the server after some time
         loop.call_later(60 * 30, lambda: periodicLog())
+        # expires and fires again the jobs which process died without ending them
+        loop.call_later(HEARTBEAT_TIMEOUT, lambda: periodic_reap(HEARTBEAT_TIMEOUT))
         loop.run_forever()
     finally:
         # Shutdown server
@@ -6,6 +6,7 @@ Please note that this module is private. The scheduler.PbsScheduler class is
 available in the ``wpipe.scheduler`` namespace - use that instead.
 """
 import datetime
+import logging
 import math
 
 from .BaseScheduler import BaseScheduler
@@ -126,6 +127,8 @@ class PbsScheduler(BaseScheduler):
         n_cpus = node_cores[node_model]
         n_jobs_per_node = [n_cpus, 1][omp_threads]
         omp_threads = ['', 'ompthreads=%d:' % n_cpus][omp_threads]
+        logging.info("Requesting wall time %s for %d jobs of %s ..." %
+                     (self._jobList[0].getWalltime(), n_jobs, self._jobList[0].getTaskName()))
 
         # create a dictionary
         pbsDict = {'model': node_model,
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+Contains the scheduler.estimateResources function definition
+
+Please note that this module is private. The scheduler.estimateResources
+function is available in the ``wpipe.scheduler`` namespace - use that instead.
+
+The wall time and memory requested to the scheduler for the jobs of a task
+are estimated from the resources used by its last completed runs, recorded in
+the `job_metrics` table: a high percentile of their wall time and peak memory,
+multiplied by a safety margin. Tasks with too few recorded runs are not
+estimated, so that their jobs fall back to the default requests.
+"""
+import os
+import math
+import time
+
+from .. import si
+from .Utils import parse_memory, format_memory
+
+__all__ = ['ESTIMATE_PERCENTILE', 'ESTIMATE_MARGIN', 'ESTIMATE_MIN_RUNS', 'ESTIMATE_HISTORY',
+           'parseWalltime', 'formatWalltime', 'estimateResources', 'scaleMemory']
+
+ESTIMATE_PERCENTILE = float(os.environ.get('WPIPE_ESTIMATE_PERCENTILE', 95))
+"""
+float: percentile of the wall times and peak memories of the recorded runs of
+a task that its estimates are based on, given by the environment variable
+WPIPE_ESTIMATE_PERCENTILE - defaults to 95.
+"""
+
+ESTIMATE_MARGIN = float(os.environ.get('WPIPE_ESTIMATE_MARGIN', 1.5))
+"""
+float: factor applied to the percentiles of the recorded runs of a task to
+make its estimates, given by the environment variable WPIPE_ESTIMATE_MARGIN -
+defaults to 1.5.
+"""
+
+ESTIMATE_MIN_RUNS = int(os.environ.get('WPIPE_ESTIMATE_MIN_RUNS', 3))
+"""
+int: number of recorded completed runs of a task needed to estimate its
+resources, given by the environment variable WPIPE_ESTIMATE_MIN_RUNS -
+defaults to 3.
+"""
+
+ESTIMATE_HISTORY = int(os.environ.get('WPIPE_ESTIMATE_HISTORY', 100))
+"""
+int: number of most recent completed runs of a task the estimates are based
+on, given by the environment variable WPIPE_ESTIMATE_HISTORY - defaults to
+100.
+"""
+
+MIN_WALLTIME = 600  # seconds, leaving room for the environment setup of the job
+MIN_MEMORY = '1G'
+CACHE_TIMEOUT = 300  # seconds before the history of a task is queried again
+
+_ESTIMATES = {}
+
+
+def parseWalltime(walltime):
+    """
+    Returns the number of seconds of a wall time given as [[HH:]MM:]SS.
+    """
+    seconds = 0
+    for field in str(walltime).split(':'):
+        seconds = 60 * seconds + int(field)
+    return seconds
+
+
+def formatWalltime(seconds):
+    """
+    Returns given number of seconds as a wall time HH:MM:SS, rounded up to
+    the minute.
+    """
+    minutes = math.ceil(seconds / 60)
+    return '%02d:%02d:00' % divmod(minutes, 60)
+
+
+def _percentile(values, percentile):
+    # nearest-rank percentile, which is one of the recorded values
+    values = sorted(values)
+    rank = math.ceil(percentile / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+def _query_history(task_name):
+    from wpipe.Job import JOBCOMPSTATE
+    table = si.JobMetric.__table__
+    for session in si.begin_session():
+        with session as session:
+            return session.execute(si.sa.select(table.c.walltime, table.c.maxrss, table.c.children_maxrss).
+                                   where(table.c.task_name == task_name).
+                                   where(table.c.state == JOBCOMPSTATE).
+                                   order_by(table.c.id.desc()).
+                                   limit(ESTIMATE_HISTORY)).all()
+
+
+def estimateResources(task_name, max_walltime, max_memory):
+    """
+    Returns the wall time and memory to request for a job of given task,
+    estimated from its recorded completed runs.
+
+    Parameters
+    ----------
+    task_name : str
+        Name of the task of the job.
+    max_walltime : str
+        Wall time HH:MM:SS that caps the estimated wall time.
+    max_memory : str
+        Memory with suffix K, M, G or T that caps the estimated memory.
+
+    Returns
+    -------
+    estimate : tuple or None
+        Estimated wall time HH:MM:SS, estimated memory of a single job and
+        number of runs the estimates are based on - None if the task has
+        fewer than ESTIMATE_MIN_RUNS recorded completed runs.
+
+    Notes
+    -----
+    The history of a task is queried once every CACHE_TIMEOUT seconds per
+    process, so that firing many jobs of a task issues a single query.
+    """
+    cached = _ESTIMATES.get(task_name)
+    if cached is None or time.time() - cached[0] > CACHE_TIMEOUT:
+        cached = _ESTIMATES[task_name] = (time.time(), _query_history(task_name))
+    rows = [row for row in cached[1] if row.walltime is not None]
+    if len(rows) < ESTIMATE_MIN_RUNS:
+        return None
+    walltime = ESTIMATE_MARGIN * _percentile([row.walltime for row in rows], ESTIMATE_PERCENTILE)
+    walltime = min(max(walltime, MIN_WALLTIME), parseWalltime(max_walltime))
+    # the task process and the programs it runs are alive at the same time
+    memory = ESTIMATE_MARGIN * _percentile([(row.maxrss or 0) + (row.children_maxrss or 0) for row in rows],
+                                           ESTIMATE_PERCENTILE)
+    memory = min(max(memory, parse_memory(MIN_MEMORY)), parse_memory(max_memory))
+    return formatWalltime(walltime), format_memory(memory), len(rows)
+
+
+def scaleMemory(memory, njobs, max_memory):
+    """
+    Returns the memory needed by given number of jobs running together on a
+    node, capped by given memory.
+    """
+    return format_memory(min(njobs * parse_memory(memory), parse_memory(max_memory)))
@@ -6,10 +6,12 @@ Please note that this module is private. The scheduler.SlurmScheduler class is
 available in the ``wpipe.scheduler`` namespace - use that instead.
 """
 import datetime
+import logging
 import math
 
 from .BaseScheduler import BaseScheduler
 from .TemplateFactory import TemplateFactory
+from .ResourceEstimator import scaleMemory
 import subprocess
 
 __all__ = ['DEFAULT_NODE_MODEL', 'DEFAULT_WALLTIME', 'SlurmScheduler']
@@ -138,13 +140,18 @@ class SlurmScheduler(BaseScheduler):
         #n_jobs_per_node = [n_cpus, 1][omp_threads]
         n_jobs_per_node = n_jobs
         omp_threads = ['', 'ompthreads=%d:' % n_cpus][omp_threads]
+        memory = self._jobList[0].getMemory()
+        if self._jobList[0].getMemoryPerJob():
+            memory = scaleMemory(memory, n_jobs_per_node, DEFAULT_MEMORY)
+        logging.info("Requesting wall time %s and memory %s per node for %d jobs of %s ..." %
+                     (self._jobList[0].getWalltime(), memory, n_jobs, self._jobList[0].getTaskName()))
 
         # create a dictionary
         slurmDict = {'nnodes': n_nodes,
                    'njobs': n_jobs_per_node,
                    'ncpus': self._jobList[0].getNcpus(),
                    'walltime': self._jobList[0].getWalltime(),
-                   'mem' : self._jobList[0].getMemory(),
+                   'mem' : memory,
                    'account' : self._jobList[0].getAccount(),
                    'partition' : self._jobList[0].getPartition(),
                    'jobid' : self._jobList[0].getJobId(),
@@ -1,7 +1,27 @@
 import os
+import asyncio
+import logging
 from typing import Tuple
 
 
+MEMORY_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_memory(memory) -> int:
+    memory = str(memory).strip().upper().rstrip('B')
+    if memory[-1:] in MEMORY_UNITS:
+        return int(float(memory[:-1]) * MEMORY_UNITS[memory[-1]])
+    return int(memory)
+
+
+def format_memory(nbytes: int) -> str:
+    # rounded up to the megabyte, in gigabytes when they are whole
+    megabytes = -(-int(nbytes) // MEMORY_UNITS['M'])
+    if megabytes % 1024 == 0:
+        return '%dG' % (megabytes // 1024)
+    return '%dM' % megabytes
+
+
 def has_pbs_or_slurm() -> Tuple[bool, bool]:
     has_pbs = os.system("which qsub") == 0
     has_slurm = os.system("which sbatch") == 0
@@ -14,3 +34,20 @@ def has_pbs_or_slurm() -> Tuple[bool, bool]:
 def no_function_returned_related_to_scheduler() -> None:
     raise RuntimeError("Wasn't able to give a consumer when were expected to use one ...\n "
                        "please define the WPIPE_NO_SCHEDULER environment variable for no scheduler")
+
+
+def reap_stale_jobs() -> None:
+    # the consumers run it in a worker thread, so that the jobs fired again
+    # can be sent to their own server
+    from wpipe import DefaultUser, Job
+    for pipeline in DefaultUser.pipelines:
+        for job in Job.reap(refire=True, pipeline=pipeline):
+            logging.warning("Expired stale job %d of pipeline %s" % (job.job_id, pipeline.pipe_root))
+
+
+def periodic_reap(interval: float) -> None:
+    loop = asyncio.get_event_loop()
+    future = loop.run_in_executor(None, reap_stale_jobs)
+    future.add_done_callback(lambda done: done.exception() is not None and
+                             logging.error("Reaping of stale jobs failed: %r" % done.exception()))
+    loop.call_later(interval, lambda: periodic_reap(interval))
@@ -23,16 +23,37 @@ checkPbsConnection
 
 sendJobToPbs
     TODO
+
+localconsumer
+    Check, start or stop the LocalConsumer daemon running the jobs not
+    submitted to a scheduler, with a bounded number of worker processes
+
+checkLocalConnection
+    Return 0 if the LocalConsumer daemon is running
+
+sendJobToLocal
+    Queue jobs to run by the LocalConsumer daemon
+
+estimateResources
+    Estimate the wall time and memory to request for a job of a task from
+    its recorded completed runs
 """
 import os
+import sys
+import time
 import subprocess
 
 # from .PbsScheduler import PbsScheduler
 from .PbsConsumer import checkPbsConnection, sendJobToPbs
 from .SlurmConsumer import checkSlurmConnection, sendJobToSlurm
+from .LocalConsumer import checkLocalConnection, sendJobToLocal
 from .JobData import JobData
+from .ResourceEstimator import estimateResources
+
+__all__ = ['pbsconsumer', 'JobData', 'checkPbsConnection', 'sendJobToPbs', 'slurmconsumer', 'JobData', 'checkSlurmConnection', 'sendJobToSlurm',
+           'localconsumer', 'checkLocalConnection', 'sendJobToLocal', 'estimateResources']
 
-__all__ = ['pbsconsumer', 'JobData', 'checkPbsConnection', 'sendJobToPbs', 'slurmconsumer', 'JobData', 'checkSlurmConnection', 'sendJobToSlurm']
+LOCAL_START_TIMEOUT = 30
 
 
 def pbsconsumer(which):
@@ -91,3 +112,29 @@ def slurmconsumer(which):
         else:
             print("No server found, nothing to do ...")
 
+
+def localconsumer(which):
+    connection = checkLocalConnection()
+    if which == 'check':
+        return print(connection)
+    elif which == 'start':
+        if connection != 0:
+            print("Starting LocalConsumer ...")
+            from .LocalConsumer import HOME_DIR
+            subprocess.Popen(["nohup", sys.executable, "-m", "wpipe.scheduler.LocalConsumer"], cwd=HOME_DIR,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+            start = time.time()
+            while checkLocalConnection() != 0:
+                if time.time() - start > LOCAL_START_TIMEOUT:
+                    raise RuntimeError("LocalConsumer did not start within %d seconds" % LOCAL_START_TIMEOUT)
+                time.sleep(0.1)
+    else:
+        if connection == 0:
+            if which == 'stop':
+                print("Shutting down LocalConsumer ...")
+                sendJobToLocal('poisonpill')
+            elif which == 'log':
+                print("Printing current LocalConsumer log ...")
+                # TODO
+        else:
+            print("No server found, nothing to do ...")
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+"""
+Contains the sqlintf.Barrier class definition
+
+Please note that this module is private. The sqlintf.Barrier class is
+available in the ``wpipe.sqlintf`` namespace - use that instead.
+"""
+from .core import sa, orm, Base
+
+__all__ = ['Barrier']
+
+
+class Barrier(Base):
+    """
+        A Barrier object represents a row of the `barriers` table.
+
+        DO NOT USE CONSTRUCTOR: constructing a Barrier object adds a new row
+        to the database: USE INSTEAD ITS WPIPE COUNTERPART.
+    """
+    __UNIQ_ATTRS__ = ['job_id', 'name']
+    __tablename__ = 'barriers'
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.String(256))
+    timestamp = sa.Column(sa.TIMESTAMP)
+    expected = sa.Column(sa.Integer)
+    arrived = sa.Column(sa.Integer)
+    is_fired = sa.Column(sa.Boolean)
+    job_id = sa.Column(sa.Integer, sa.ForeignKey('jobs.id'))
+    job = orm.relationship("Job", back_populates="barriers", foreign_keys=[job_id])
+    event_id = sa.Column(sa.Integer, sa.ForeignKey('events.id'))
+    event = orm.relationship("Event", foreign_keys=[event_id])
+    __table_args__ = (sa.UniqueConstraint('job_id', 'name'),
+                      )
@@ -39,4 +39,6 @@ class DataProduct(OptOwner):
         'polymorphic_identity': 'dataproduct',
     }
     __table_args__ = (sa.UniqueConstraint('dpowner_id', 'group', 'filename'),
+                      sa.Index('ix_dataproducts_dpowner_id_subtype_data_type',
+                               'dpowner_id', 'subtype', 'data_type'),
                       )
@@ -25,6 +25,7 @@ class Job(OptOwner):
     state = sa.Column(sa.String(256))
     starttime = sa.Column(sa.TIMESTAMP)
     endtime = sa.Column(sa.TIMESTAMP)
+    heartbeat = sa.Column(sa.TIMESTAMP)
     node_id = sa.Column(sa.Integer, sa.ForeignKey('nodes.id'))
     node = orm.relationship("Node", back_populates="jobs")
     config_id = sa.Column(sa.Integer, sa.ForeignKey('configurations.id'))
@@ -34,8 +35,11 @@ class Job(OptOwner):
     firing_event_id = sa.Column(sa.Integer, sa.ForeignKey('events.id'))
     firing_event = orm.relationship("Event", back_populates="fired_jobs", foreign_keys=[firing_event_id])
     child_events = orm.relationship("Event", back_populates="parent_job", primaryjoin="Job.id==Event.parent_job_id")
+    barriers = orm.relationship("Barrier", back_populates="job", primaryjoin="Job.id==Barrier.job_id")
     __mapper_args__ = {
         'polymorphic_identity': 'job',
     }
     __table_args__ = (sa.UniqueConstraint('task_id', 'config_id', 'firing_event_id', 'attempt'),
+                      sa.Index('ix_jobs_task_id_state', 'task_id', 'state'),
+                      sa.Index('ix_jobs_state_heartbeat', 'state', 'heartbeat'),
                       )
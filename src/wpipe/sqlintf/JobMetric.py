@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+Contains the sqlintf.JobMetric class definition
+
+Please note that this module is private. The sqlintf.JobMetric class is
+available in the ``wpipe.sqlintf`` namespace - use that instead.
+"""
+from .core import sa, Base
+
+__all__ = ['JobMetric']
+
+
+class JobMetric(Base):
+    """
+        A JobMetric object represents a row of the `job_metrics` table.
+
+        Each row records the resources used by the process of a job, measured
+        when it ends. The rows refer to their job, task and pipeline by id and
+        name without foreign keys, so that the history of the resources used
+        by a task outlives the reset and deletion of its jobs.
+
+        DO NOT USE CONSTRUCTOR: constructing a JobMetric object adds a new row
+        to the database: USE INSTEAD THE ENDING OF WPIPE JOBS.
+    """
+    __UNIQ_ATTRS__ = ['job_id', 'timestamp']
+    __tablename__ = 'job_metrics'
+    id = sa.Column(sa.Integer, primary_key=True)
+    job_id = sa.Column(sa.Integer)
+    task_name = sa.Column(sa.String(256))
+    pipeline_id = sa.Column(sa.Integer)
+    state = sa.Column(sa.String(256))
+    timestamp = sa.Column(sa.TIMESTAMP)
+    walltime = sa.Column(sa.Float)
+    user_time = sa.Column(sa.Float)
+    sys_time = sa.Column(sa.Float)
+    maxrss = sa.Column(sa.BigInteger)
+    inblock = sa.Column(sa.BigInteger)
+    oublock = sa.Column(sa.BigInteger)
+    children_user_time = sa.Column(sa.Float)
+    children_sys_time = sa.Column(sa.Float)
+    children_maxrss = sa.Column(sa.BigInteger)
+    children_inblock = sa.Column(sa.BigInteger)
+    children_oublock = sa.Column(sa.BigInteger)
+    __table_args__ = (sa.Index('ix_job_metrics_task_name_state', 'task_name', 'state'),
+                      sa.Index('ix_job_metrics_job_id', 'job_id'),
+                      )
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+"""
+Contains the sqlintf.Memo class definition
+
+Please note that this module is private. The sqlintf.Memo class is
+available in the ``wpipe.sqlintf`` namespace - use that instead.
+"""
+from .core import sa, orm, Base
+
+__all__ = ['Memo']
+
+
+class Memo(Base):
+    """
+        A Memo object represents a row of the `memos` table.
+
+        Each row records, for a digest of the executable and inputs of a job
+        that completed, the child events that job fired, so that a job of same
+        digest completes from the memo instead of running again.
+
+        DO NOT USE CONSTRUCTOR: constructing a Memo object adds a new row
+        to the database: USE INSTEAD THE MEMOIZATION OF WPIPE EVENTS.
+    """
+    __UNIQ_ATTRS__ = ['pipeline_id', 'task_name', 'digest']
+    __tablename__ = 'memos'
+    id = sa.Column(sa.Integer, primary_key=True)
+    task_name = sa.Column(sa.String(256))
+    digest = sa.Column(sa.String(64))
+    timestamp = sa.Column(sa.TIMESTAMP)
+    job_id = sa.Column(sa.Integer)
+    child_events = sa.Column(sa.Text)
+    pipeline_id = sa.Column(sa.Integer, sa.ForeignKey('pipelines.id'))
+    pipeline = orm.relationship("Pipeline", back_populates="memos")
+    __table_args__ = (sa.UniqueConstraint('pipeline_id', 'task_name', 'digest'),
+                      )
@@ -22,6 +22,8 @@ class Option(Base):
     id = sa.Column(sa.Integer, primary_key=True)
     name = sa.Column(sa.String(256))
     value = sa.Column(sa.String(256))
+    value_type = sa.Column(sa.String(16))
+    counter = sa.Column(sa.BigInteger)
     timestamp = sa.Column(sa.TIMESTAMP)
     optowner_id = sa.Column(sa.Integer, sa.ForeignKey('optowners.id'))
     optowner = orm.relationship("OptOwner", back_populates="options")
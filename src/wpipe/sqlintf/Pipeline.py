@@ -32,6 +32,7 @@ class Pipeline(DPOwner):
     user = orm.relationship("User", back_populates="pipelines")
     inputs = orm.relationship("Input", back_populates="pipeline", primaryjoin="Pipeline.id==Input.pipeline_id")
     tasks = orm.relationship("Task", back_populates="pipeline")
+    memos = orm.relationship("Memo", back_populates="pipeline")
     __mapper_args__ = {
         'polymorphic_identity': 'pipeline',
     }
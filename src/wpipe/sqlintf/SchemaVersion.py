@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+"""
+Contains the sqlintf.SchemaVersion class definition
+
+Please note that this module is private. The sqlintf.SchemaVersion class is
+available in the ``wpipe.sqlintf`` namespace - use that instead.
+"""
+from .core import sa, Base
+
+__all__ = ['SchemaVersion']
+
+
+class SchemaVersion(Base):
+    """
+        A SchemaVersion object represents a row of the `schema_versions`
+        table, recording a migration applied to the database schema.
+
+        DO NOT USE CONSTRUCTOR: migrations are recorded by the function
+        sqlintf.migrate.
+    """
+    __tablename__ = 'schema_versions'
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=False)
+    description = sa.Column(sa.String(256))
+    timestamp = sa.Column(sa.TIMESTAMP)
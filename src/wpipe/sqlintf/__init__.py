@@ -22,16 +22,71 @@ PARSER
     pre-instantiated parser powered by the module `argparse`
 
 SESSION
-    session which SQLAlchemy uses to communicate with the database
+    session which SQLAlchemy uses to communicate with the database, in the
+    current thread
 
 COMMIT_FLAG
-    boolean flag to control the automatic committing
+    boolean flag to control the automatic committing, in the current thread
+
+SCOPE
+    thread-local SessionScope object holding SESSION, COMMIT_FLAG and BATCH
+
+SESSION_POOL
+    SessionPooling object keeping the long-lived session of each thread,
+    reused by all its begin_session calls
 
 commit
     Flush and commit pending changes if COMMIT_FLAG is True
+
+batch
+    Unit of work committing the writes of its statements in one transaction
+
+touch
+    Bump the timestamp of a row, once per row at the exit of a batch
+
+after_commit
+    Call a function once the writes of the batch in progress are committed
+
+flush_session
+    Explicit flush boundary: commit pending changes of the pooled session of
+    the current thread
+
+close_session
+    Close the pooled session of the current thread, a new one being opened
+    at next access
+
+RETRY_POLICY
+    RetryPolicy object bounding the retries of the database accesses, with
+    a process-wide circuit breaker
+
+retry_statistics
+    Return the counters of attempts, rollbacks and time spent retrying
+
+get_engine
+    Return the engine connected to the database, made at first access
+
+get_read_engine
+    Return the engine connected to the read replica given by the environment
+    variable WPIPE_READ_ENGINEURL, to which the read-only queries are routed
+
+create_schema
+    Create the wpipe database and its tables if they do not exist yet
+
+migrate
+    Upgrade the database schema in place with the pending migrations
 """
+import os
+import time
+import datetime
+import atexit
+import logging
+import warnings
 import itertools
-from .core import contextlib, argparse, tn, sa, orm, exc, PARSER, Engine, Base, Session
+import collections
+import threading
+from .core import contextlib, argparse, tn, sa, orm, exc, PARSER, SQLITE, Base, Session
+from .core import immediate_transactions
+from .core import get_engine, get_read_engine
 from .User import User
 from .Node import Node
 from .Pipeline import Pipeline
@@ -47,48 +102,100 @@ from .Task import Task
 from .Mask import Mask
 from .Job import Job
 from .Event import Event
+from .Barrier import Barrier
+from .Memo import Memo
+from .JobMetric import JobMetric
+from .SchemaVersion import SchemaVersion
+from .migrations import SCHEMA_VERSION, migrate, create_schema
+
+
+def __getattr__(name):
+    if name == 'Engine':
+        return get_engine()
+    if name in ['SESSION', 'COMMIT_FLAG', 'BATCH']:
+        return getattr(SCOPE, name.lower())
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 __all__ = ['sa', 'orm', 'exc', 'argparse', 'PARSER', 'Session', 'SESSION',
            'User', 'Node', 'Pipeline', 'DPOwner', 'Input', 'Option',
            'OptOwner', 'Target', 'Configuration', 'Parameter', 'DataProduct',
-           'Task', 'Mask', 'Job', 'Event',
-           'COMMIT_FLAG', 'hold_commit', 'begin_session', 'delete']
+           'Task', 'Mask', 'Job', 'Event', 'Barrier', 'Memo', 'JobMetric', 'SchemaVersion',
+           'COMMIT_FLAG', 'hold_commit', 'begin_session', 'delete',
+           'SESSION_POOL', 'SessionPooling', 'flush_session', 'close_session',
+           'get_engine', 'get_read_engine', 'create_schema', 'migrate', 'SCHEMA_VERSION',
+           'BATCH', 'UnitOfWork', 'batch', 'touch', 'after_commit',
+           'RETRY_POLICY', 'RetryPolicy', 'retry_statistics',
+           'SCOPE', 'SessionScope']
 
-Base.metadata.create_all(Engine)
 
-SESSION = None  # Session()  # TODO: SessionPooling
-"""
-sqlalchemy.orm.session.Session object: placeholder (manages database operations via the engine).
-"""
+class SessionScope(threading.local):
+    """
+        Thread-local state of the database accesses, so that the threads of a
+        process do not join each other's begin_session and batch statements.
+
+        Attributes
+        ----------
+        session : sqlalchemy.orm.session.Session object
+            Session in use by the current begin_session statement of the
+            thread, None outside of it - exposed as SESSION.
+        commit_flag : boolean
+            Flag to control the automatic committing in the thread - exposed
+            as COMMIT_FLAG.
+        batch : UnitOfWork object
+            Outermost batch statement in progress in the thread, None outside
+            of it - exposed as BATCH.
+    """
+    def __init__(self):
+        self.session = None
+        self.commit_flag = True
+        self.batch = None
+
 
-COMMIT_FLAG = True
+SCOPE = SessionScope()
 """
-boolean: flag to control the automatic committing.
+SessionScope object: thread-local state of the database accesses.
 """
 
 # INSTANCES = []
 
 
+def _thread_cached_instances(cls):
+    # rows of the cached Wpipe objects of given class held by the current
+    # thread, the rows of the other threads belonging to their own sessions
+    attr = vars(cls)['_%s' % cls.__name__.lower()]
+    return [(obj, row) for obj, row in ((obj, attr.thread_value(obj)) for obj in cls.__cache__)
+            if row is not None]
+
+
 def _consolidate_cached_instances():
     from .. import User, Node, Pipeline, Input, Option, Target, Configuration, Parameter, DataProduct, Task, Mask, Job, Event
-    return list(itertools.chain.from_iterable(
-        [cls._return_cached_instances()
-         for cls in [User, Node, Pipeline, Input, Option, Target, Configuration, Parameter, DataProduct, Task, Mask, Job, Event]]))
+    return [row for _obj, row in itertools.chain.from_iterable(
+        [_thread_cached_instances(cls)
+         for cls in [User, Node, Pipeline, Input, Option, Target, Configuration, Parameter, DataProduct, Task, Mask, Job, Event]])
+            if sa.inspect(row).detached]
+
+
+def _discard_rolled_back_instances():
+    # the rows created in a rolled back transaction are transient again: their
+    # Wpipe objects must leave the caches, or they would be added back
+    from .. import User, Node, Pipeline, Input, Option, Target, Configuration, Parameter, DataProduct, Task, Mask, Job, Event
+    for cls in [User, Node, Pipeline, Input, Option, Target, Configuration, Parameter, DataProduct, Task, Mask, Job, Event]:
+        for obj, row in _thread_cached_instances(cls):
+            if not sa.inspect(row).has_identity:
+                cls.__cache__.discard(obj)
 
 
 def deactivate_commit():
-    global COMMIT_FLAG
-    COMMIT_FLAG = False
+    SCOPE.commit_flag = False
 
 
 def activate_commit():
-    global COMMIT_FLAG
-    COMMIT_FLAG = True
+    SCOPE.commit_flag = True
 
 
 class HoldCommit:
     def __init__(self):
-        self.existing_flag = COMMIT_FLAG
+        self.existing_flag = SCOPE.commit_flag
 
     def __enter__(self):
         if self.existing_flag:
@@ -103,15 +210,378 @@ def hold_commit():
     return HoldCommit()
 
 
+class SessionPooling(threading.local):
+    """
+        Keeps a long-lived session per thread that is reused by every
+        top-level begin_session statement of that thread instead of building
+        and tearing down a new session at each database access.
+
+        Each thread gets its own session, so that the threads of a process
+        access the database concurrently: the Wpipe objects they share hold
+        a copy of their sqlintf row per thread, attached to its session. The
+        pooled session keeps its identity map between accesses: wpipe
+        objects stay attached to it and do not need to be re-added. At the
+        end of each top-level begin_session statement (the flush boundary),
+        its transaction is ended without expiring the loaded instances,
+        which releases the connection and the read snapshot as closing the
+        session used to do. Pending changes left at that boundary are
+        committed when the automatic committing is active, while hold_commit
+        keeps the transaction open with them until the next commit; they are
+        only rolled back when the statement raised an exception.
+
+        Parameters
+        ----------
+        max_age : float
+            Number of seconds after which the pooled session expires and is
+            closed at the next flush boundary - defaults to the environment
+            variable WPIPE_SESSION_MAX_AGE, or 300. A value of 0 disables the
+            pooling so that each begin_session statement gets a new session.
+        max_uses : int
+            Number of top-level begin_session statements after which the
+            pooled session expires - defaults to the environment variable
+            WPIPE_SESSION_MAX_USES, or 0 for no limit.
+    """
+    def __init__(self, max_age=None, max_uses=None):
+        self.max_age = float(os.environ.get('WPIPE_SESSION_MAX_AGE', 300) if max_age is None else max_age)
+        self.max_uses = int(os.environ.get('WPIPE_SESSION_MAX_USES', 0) if max_uses is None else max_uses)
+        self._session = None
+        self._birth = None
+        self._uses = 0
+
+    @property
+    def is_pooling(self):
+        """
+        boolean: True if the pooling is enabled, False if not.
+        """
+        return self.max_age > 0
+
+    @property
+    def has_expired(self):
+        """
+        boolean: True if the pooled session must be renewed, False if not.
+        """
+        if self._session is None:
+            return True
+        # a transaction left open while commits are held is kept until committed
+        if self._session.in_transaction():
+            return False
+        return time.monotonic() - self._birth > self.max_age or \
+            0 < self.max_uses <= self._uses
+
+    def acquire(self, **local_kw):
+        """
+        Returns the pooled session, or a new one if expired or not pooled.
+
+        Parameters
+        ----------
+        local_kw
+            Refer to :class:`sqlalchemy.orm.session.Session` for parameters:
+            a session made with specific parameters is never pooled.
+
+        Returns
+        -------
+        session : sqlalchemy.orm.session.Session object
+            Session to use.
+        is_new : boolean
+            True if the session was newly made, False if reused.
+        """
+        get_engine()
+        if local_kw or not self.is_pooling:
+            return Session(**local_kw), True
+        is_new = self.has_expired
+        if is_new:
+            self.close()
+            self._session = Session()
+            self._birth = time.monotonic()
+            self._uses = 0
+        self._uses += 1
+        return self._session, is_new
+
+    def release(self, session, error=None):
+        """
+        Flush boundary: end the transaction of the given session.
+
+        Parameters
+        ----------
+        session : sqlalchemy.orm.session.Session object
+            Session returned by acquire.
+        error : Exception
+            Exception raised during the session use if any, in which case a
+            pooled session is closed if it is a database error, and its
+            pending changes are rolled back otherwise - defaults to None.
+        """
+        pending = bool(session.new or session.dirty or session.deleted)
+        if session is not self._session:
+            if pending and error is None:
+                if SCOPE.commit_flag:
+                    session.commit()
+                else:
+                    warnings.warn("Closing a session that is not pooled discards the changes held by hold_commit")
+            session.close()
+        elif isinstance(error, exc.SQLAlchemyError):
+            if session.in_transaction():
+                RETRY_POLICY.count_rollback()
+            self.close()
+        elif error is not None:
+            # the statement failed half-way: its partial changes are dropped
+            if pending:
+                session.rollback()
+                RETRY_POLICY.count_rollback()
+        elif not SCOPE.commit_flag:
+            # commits are held: the transaction, with the changes flushed or
+            # pending in it, stays open until the next commit
+            pass
+        else:
+            try:
+                session.expire_on_commit = False
+                try:
+                    session.commit()
+                finally:
+                    session.expire_on_commit = True
+            except exc.SQLAlchemyError:
+                RETRY_POLICY.count_rollback()
+                self.close()
+                raise
+            if self.has_expired:
+                self.close()
+
+    def flush(self):
+        """
+        Explicit flush boundary: commit pending changes of the pooled session
+        of the current thread.
+        """
+        if self._session is not None and SCOPE.session is None:
+            self._session.commit()
+
+    def close(self):
+        """
+        Close the pooled session of the current thread.
+        """
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+SESSION_POOL = SessionPooling()
+"""
+SessionPooling object: keeps the long-lived session of each thread reused by
+begin_session.
+"""
+
+
+def flush_session():
+    """
+    Commit pending changes of the pooled session of the current thread.
+    """
+    SESSION_POOL.flush()
+
+
+def close_session():
+    """
+    Close the pooled session of the current thread, a new one being opened at
+    next access.
+    """
+    SESSION_POOL.close()
+
+
+atexit.register(close_session)
+
+
+class RetryPolicy:
+    """
+        Bounds the retries of the database accesses made by begin_session and
+        retrying_nested, and sheds the load of the process when the database
+        fails repeatedly.
+
+        Each retrying loop stops after max_attempts attempts or max_delay
+        seconds, whichever comes first, re-raising the last error; between
+        attempts it waits a random exponential backoff capped at max_wait
+        seconds. The circuit breaker is shared by all loops of the process:
+        when breaker_threshold failed attempts happen within breaker_window
+        seconds, it opens and every new attempt waits for breaker_cooldown
+        seconds before hitting the database. The attempts nested in a session
+        already open do not wait, which would hold its transaction.
+
+        The counters are shared by the threads of the process and updated
+        under a lock, which is never held while waiting.
+
+        Parameters
+        ----------
+        max_attempts : int
+            Maximum number of attempts of a retrying loop - defaults to the
+            environment variable WPIPE_RETRY_MAX_ATTEMPTS, or 30. A value of
+            0 removes that limit.
+        max_delay : float
+            Maximum number of seconds spent in a retrying loop - defaults to
+            the environment variable WPIPE_RETRY_MAX_DELAY, or 900. A value
+            of 0 removes that limit.
+        max_wait : float
+            Maximum number of seconds between two attempts - defaults to the
+            environment variable WPIPE_RETRY_MAX_WAIT, or 30.
+        breaker_threshold : int
+            Number of failed attempts opening the circuit breaker - defaults
+            to the environment variable WPIPE_BREAKER_THRESHOLD, or 20. A
+            value of 0 disables the circuit breaker.
+        breaker_window : float
+            Number of seconds over which the failed attempts are counted -
+            defaults to the environment variable WPIPE_BREAKER_WINDOW, or 10.
+        breaker_cooldown : float
+            Number of seconds the circuit breaker stays open - defaults to the
+            environment variable WPIPE_BREAKER_COOLDOWN, or 5.
+    """
+    def __init__(self, max_attempts=None, max_delay=None, max_wait=None,
+                 breaker_threshold=None, breaker_window=None, breaker_cooldown=None):
+        self.max_attempts = int(os.environ.get('WPIPE_RETRY_MAX_ATTEMPTS', 30) if max_attempts is None
+                                else max_attempts)
+        self.max_delay = float(os.environ.get('WPIPE_RETRY_MAX_DELAY', 900) if max_delay is None else max_delay)
+        self.max_wait = float(os.environ.get('WPIPE_RETRY_MAX_WAIT', 30) if max_wait is None else max_wait)
+        self.breaker_threshold = int(os.environ.get('WPIPE_BREAKER_THRESHOLD', 20) if breaker_threshold is None
+                                     else breaker_threshold)
+        self.breaker_window = float(os.environ.get('WPIPE_BREAKER_WINDOW', 10) if breaker_window is None
+                                    else breaker_window)
+        self.breaker_cooldown = float(os.environ.get('WPIPE_BREAKER_COOLDOWN', 5) if breaker_cooldown is None
+                                      else breaker_cooldown)
+        self.counters = dict.fromkeys(['attempts', 'failures', 'rollbacks', 'giveups', 'breaker_trips'], 0)
+        self.counters.update(dict.fromkeys(['retry_time', 'shed_time'], 0.))
+        self._failures = collections.deque()
+        self._open_until = 0.
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        """
+        boolean: True if the circuit breaker is open, False if not.
+        """
+        return time.monotonic() < self._open_until
+
+    def stop(self):
+        """
+        Returns the tenacity stop condition of a retrying loop.
+        """
+        stop = tn.stop_never
+        if self.max_attempts > 0:
+            stop = tn.stop_after_attempt(self.max_attempts)
+        if self.max_delay > 0:
+            stop = stop | tn.stop_after_delay(self.max_delay)
+        return stop
+
+    def wait(self, multiplier=0.1):
+        """
+        Returns the tenacity wait strategy of a retrying loop.
+        """
+        return tn.wait_random_exponential(multiplier=multiplier, max=self.max_wait)
+
+    def before_attempt(self):
+        """
+        Counts an attempt, waiting beforehand while the circuit breaker is
+        open if the attempt is not nested in an open session.
+        """
+        with self._lock:
+            self.counters['attempts'] += 1
+            remaining = self._open_until - time.monotonic() if SCOPE.session is None else 0
+        if remaining > 0:
+            time.sleep(remaining)
+            with self._lock:
+                self.counters['shed_time'] += remaining
+
+    def after_failure(self):
+        """
+        Counts a failed attempt, opening the circuit breaker if the failures
+        reach breaker_threshold within breaker_window seconds.
+        """
+        with self._lock:
+            self.counters['failures'] += 1
+            if self.breaker_threshold <= 0:
+                return
+            now = time.monotonic()
+            self._failures.append(now)
+            while self._failures and self._failures[0] < now - self.breaker_window:
+                self._failures.popleft()
+            if len(self._failures) < self.breaker_threshold:
+                return
+            self._failures.clear()
+            self._open_until = now + self.breaker_cooldown
+            self.counters['breaker_trips'] += 1
+        logging.warning("Database failure rate too high: pausing database accesses for %g seconds"
+                        % self.breaker_cooldown)
+
+    def count_rollback(self):
+        """
+        Counts a rollback of a failed transaction or savepoint.
+        """
+        with self._lock:
+            self.counters['rollbacks'] += 1
+
+    def before_sleep(self, retry_state):
+        with self._lock:
+            self.counters['retry_time'] += retry_state.next_action.sleep
+
+    def retrying(self, retry, before, after, wait):
+        """
+        Returns a tenacity Retrying object following this policy.
+        """
+        def _before(retry_state):
+            self.before_attempt()
+            before(retry_state)
+
+        def _after(retry_state):
+            self.after_failure()
+            after(retry_state)
+
+        def _retry_error_callback(retry_state):
+            with self._lock:
+                self.counters['giveups'] += 1
+            logging.warning("Giving up database access after %d attempts" % retry_state.attempt_number)
+            return retry_state.outcome.result()
+
+        return tn.Retrying(retry=retry, stop=self.stop(), wait=wait,
+                           before=_before, after=_after, before_sleep=self.before_sleep,
+                           retry_error_callback=_retry_error_callback)
+
+    def statistics(self):
+        """
+        Returns the counters of the database accesses of the process.
+
+        Returns
+        -------
+        statistics : dict
+            Number of attempts, failed attempts, rollbacks, loops that gave
+            up and circuit breaker trips, and numbers of seconds spent waiting
+            between attempts (retry_time) and for the circuit breaker
+            (shed_time).
+        """
+        with self._lock:
+            return dict(self.counters, breaker_open=self.is_open)
+
+
+RETRY_POLICY = RetryPolicy()
+"""
+RetryPolicy object: bounds the retries of begin_session and retrying_nested.
+"""
+
+
+def retry_statistics():
+    """
+    Returns the counters of the database accesses of the process.
+
+    Returns
+    -------
+    statistics : dict
+        Refer to :meth:`RetryPolicy.statistics`.
+    """
+    return RETRY_POLICY.statistics()
+
+
 class BeginSession:
     def __init__(self, **local_kw):
-        global SESSION  # , INSTANCES
-        self.EXISTING_SESSION = SESSION is not None
+        self.EXISTING_SESSION = SCOPE.session is not None
         if self.EXISTING_SESSION:
-            self.SESSION = SESSION
+            self.SESSION = SCOPE.session
         else:
-            SESSION = self.SESSION = Session(**local_kw)
-            self.add_all(_consolidate_cached_instances())
+            SCOPE.session, is_new = SESSION_POOL.acquire(**local_kw)
+            self.SESSION = SCOPE.session
+            if is_new:
+                self.add_all(_consolidate_cached_instances())
 
     def __dir__(self):
         return super(BeginSession, self).__dir__() + self.SESSION.__dir__()
@@ -122,12 +592,13 @@ class BeginSession:
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        global SESSION  # , INSTANCES
         if not self.EXISTING_SESSION:
             # INSTANCES = self.identity_map.values()[:]
-            self.close()
-            SESSION = None
-            del self.SESSION
+            try:
+                SESSION_POOL.release(self.SESSION, error=exc_value)
+            finally:
+                SCOPE.session = None
+                del self.SESSION
 
     def __getattr__(self, item):
         if (item in self.SESSION.__dir__() if self.is_alive() else False) if item != 'SESSION' else False:
@@ -139,7 +610,7 @@ class BeginSession:
         return hasattr(self, 'SESSION')
 
     def commit(self):
-        if COMMIT_FLAG:
+        if SCOPE.commit_flag:
             self.SESSION.commit()
 
     def retrying_nested(self):
@@ -153,10 +624,12 @@ class BeginSession:
                 retry_state.refresh = retry_state.session.refresh
                 retry_state.TRANSACTION = retry_state.begin_nested()
 
-                @tn.retry(retry=tn.retry_if_exception_type(exc.OperationalError))
+                @tn.retry(retry=tn.retry_if_exception_type(exc.OperationalError),
+                          stop=RETRY_POLICY.stop(), wait=RETRY_POLICY.wait(), reraise=True)
                 def _rollback():
                     if retry_state.TRANSACTION.is_active:
                         retry_state.TRANSACTION.rollback()
+                        RETRY_POLICY.count_rollback()
                     retry_state.TRANSACTION = retry_state.begin_nested()
 
                 retry_state.rollback = _rollback
@@ -164,7 +637,7 @@ class BeginSession:
                 def _commit():
                     if retry_state.TRANSACTION.is_active:
                         retry_state.TRANSACTION.commit()
-                    if COMMIT_FLAG:
+                    if SCOPE.commit_flag:
                         retry_state.session.commit()
 
                 retry_state.commit = _commit
@@ -176,11 +649,25 @@ class BeginSession:
                 print("Encountered %s\n%s\n\nAttempting rollback\n" % (Err.orig, Err.statement))
             retry_state.rollback()
 
-        return tn.Retrying(retry=(tn.retry_if_exception_type(exc.OperationalError) |
-                                  tn.retry_if_exception_type(exc.IntegrityError)),
-                           wait=tn.wait_random_exponential(multiplier=0.1),
-                           before=before,
-                           after=after)
+        # in a batch, an OperationalError such as a deadlock may have rolled
+        # back the whole transaction: it is raised to fail the batch instead.
+        # On SQLite, a busy database is not retried from the savepoint either,
+        # which would keep the snapshot of the transaction that a concurrent
+        # write made stale: begin_session retries it in a new transaction
+        attempts = RETRY_POLICY.retrying(retry=(tn.retry_if_exception_type(exc.IntegrityError) |
+                                            (tn.retry_if_exception_type(exc.OperationalError)
+                                             if SCOPE.batch is None and not SQLITE else tn.retry_never)),
+                                     before=before,
+                                     after=after,
+                                     wait=RETRY_POLICY.wait())
+        return _immediate_attempts(attempts) if SQLITE else attempts
+
+
+def _immediate_attempts(attempts):
+    # the rows read with_for_update, which SQLite ignores, are locked by
+    # taking the write lock of the database when the transaction begins
+    with immediate_transactions():
+        yield from attempts
 
 
 @contextlib.contextmanager
@@ -202,16 +689,148 @@ def begin_session(**local_kw):
                                                                                                      Err.statement))
         if retry_state.session.is_alive():
             retry_state.session.rollback()
-
-    for retry in tn.Retrying(retry=(tn.retry_if_exception_type(exc.OperationalError) |
-                                    tn.retry_if_exception_type(exc.PendingRollbackError)),
-                             before=__before,
-                             after=__after,
-                             wait=tn.wait_random()):
+            RETRY_POLICY.count_rollback()
+
+    # retrying a statement of a batch would replay it over a rolled back
+    # transaction that lost the previous statements: the batch fails instead
+    for retry in RETRY_POLICY.retrying(retry=((tn.retry_if_exception_type(exc.OperationalError) |
+                                               tn.retry_if_exception_type(exc.PendingRollbackError))
+                                              if SCOPE.batch is None else tn.retry_never),
+                                       before=__before,
+                                       after=__after,
+                                       wait=RETRY_POLICY.wait()):
         retry.session = retry.retry_state.session  # BeginSession(**local_kw)
         yield retrying_session(retry, retry.session)
 
 
+def touch(row):
+    """
+    Bump the timestamp of given row, or schedule its bump at the exit of the
+    batch statement in progress.
+
+    Parameters
+    ----------
+    row : sqlintf object
+        Row to bump the timestamp of.
+    """
+    if SCOPE.batch is None:
+        row.timestamp = datetime.datetime.utcnow()
+    else:
+        SCOPE.batch.touched[id(row)] = row
+
+
+def after_commit(func):
+    """
+    Call given function once the writes made so far by the thread are
+    committed: at once outside of a batch statement, whose statements commit
+    as they end, and at the exit of the outermost batch statement otherwise.
+    The call is dropped if the batch statement rolls back these writes.
+
+    Parameters
+    ----------
+    func : function
+        Function to call with no argument.
+    """
+    if SCOPE.batch is None:
+        func()
+    else:
+        SCOPE.batch.innermost.committed.append(func)
+
+
+class UnitOfWork:
+    """
+        Context manager that buffers the writes of the statements it contains
+        into a single transaction, committed at its exit.
+
+        Inside the outermost batch statement, a single session is shared by
+        all begin_session statements, the commits they request are held, and
+        the timestamp bumps are deduplicated per row and applied once at the
+        exit. An exception raised inside rolls back the whole unit of work.
+        A nested batch statement runs in a savepoint, so that only its own
+        writes are rolled back if an exception escapes it.
+
+        Database errors that the retrying logic would handle by rolling back
+        the transaction make the batch fail instead of silently replaying a
+        statement over lost writes; integrity errors of concurrent row
+        creations are still retried in their own savepoint.
+
+        The functions given to after_commit inside the statement are called
+        once the outermost batch statement committed, and dropped with the
+        writes of a batch statement that rolls back.
+    """
+    def __init__(self):
+        self.touched = {}
+        self.committed = []
+        self.parent = None
+        self.outer = None
+        self.innermost = self
+        self.session = None
+        self.transaction = None
+
+    def __enter__(self):
+        self.parent = SCOPE.batch
+        self.session = BeginSession()
+        self.session.__enter__()
+        if self.parent is None:
+            self.existing_flag = SCOPE.commit_flag
+            SCOPE.batch = self
+            deactivate_commit()
+        else:
+            self.transaction = self.session.begin_nested()
+            self.outer = self.parent.innermost
+            self.parent.innermost = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        committed = []
+        try:
+            if self.parent is None:
+                SCOPE.batch = None
+                if self.existing_flag:
+                    activate_commit()
+                if exc_type is None:
+                    now = datetime.datetime.utcnow()
+                    for row in self.touched.values():
+                        row.timestamp = now
+                    self.session.commit()
+                    committed = self.committed
+                else:
+                    self.session.rollback()
+                    _discard_rolled_back_instances()
+            else:
+                self.parent.innermost = self.outer
+                if exc_type is None:
+                    self.transaction.commit()
+                    self.outer.committed.extend(self.committed)
+                else:
+                    self.transaction.rollback()
+                    _discard_rolled_back_instances()
+        finally:
+            self.session.__exit__(exc_type, exc_value, exc_traceback)
+        for func in committed:
+            func()
+
+
+def batch():
+    """
+    Returns a unit of work context manager committing the writes of the
+    statements it contains in a single transaction.
+
+    Returns
+    -------
+    batch : UnitOfWork object
+        Context manager to use in a with statement.
+
+    Examples
+    --------
+    >>> with wp.batch():
+    >>>     my_job.state = 'started'
+    >>>     my_job.options['count'] = 0
+    >>>     my_event.value = 1
+    """
+    return UnitOfWork()
+
+
 # def begin_session(**local_kw):
 #     for retry in tn.Retrying(retry=tn.retry_if_exception_type(exc.OperationalError)):
 #         retry.session = BeginSession(**local_kw)
@@ -240,6 +859,9 @@ def delete(entry):
 
 
 def show_engine_status():
+    if SQLITE:
+        print("show_engine_status: the InnoDB status is only available with MySQL")
+        return None
     for session in begin_session():
         with session as session:
             a = session.execute("SHOW ENGINE INNODB STATUS;").fetchall()
@@ -248,6 +870,8 @@ def show_engine_status():
 
 def show_transactions_status():
     a = show_engine_status()
+    if a is None:
+        return None
     return a.split('\nTRANSACTIONS\n')[1].split('\nFILE I/O\n')[0]
 
 # import eralchemy as ERA
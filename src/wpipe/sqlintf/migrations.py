@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+Contains the versioned migrations of the database schema
+
+Please note that this module is private. All functions and objects
+are available in the main ``wpipe.sqlintf`` namespace - use that instead.
+
+Each migration is a numbered step that upgrades in place a database created
+by an earlier version of wpipe. Applied steps are recorded in the table
+`schema_versions`, so that the command wingspipe migrate only runs the
+pending ones. Steps check the existing schema before altering it: a database
+created from scratch with the current table definitions passes them all
+without change.
+"""
+import re
+import datetime
+from .core import sa, text, Base, SERVER_URL, make_engine, get_engine
+from .SchemaVersion import SchemaVersion
+
+__all__ = ['MIGRATIONS', 'SCHEMA_VERSION', 'migrate', 'create_schema', 'verify_schema']
+
+
+def _add_column(conn, table_name, column_name):
+    if column_name in [column['name'] for column in sa.inspect(conn).get_columns(table_name)]:
+        return
+    column = Base.metadata.tables[table_name].c[column_name]
+    quote = conn.dialect.identifier_preparer.quote
+    conn.execute(text('ALTER TABLE %s ADD COLUMN %s %s' % (quote(table_name), quote(column_name),
+                                                           column.type.compile(dialect=conn.dialect))))
+
+
+def _create_index(conn, table_name, index_name):
+    if index_name in [index['name'] for index in sa.inspect(conn).get_indexes(table_name)]:
+        return
+    for index in Base.metadata.tables[table_name].indexes:
+        if index.name == index_name:
+            index.create(bind=conn)
+
+
+_INTEGER_STRING = re.compile(r'-?(0|[1-9][0-9]*)')
+
+
+def _backfill_counters(conn):
+    # the atomic increments only apply to the options which counter is set
+    options = Base.metadata.tables['options']
+    query = sa.select(options.c.id, options.c.value).\
+        where(options.c.counter.is_(None)).where(options.c.value.isnot(None))
+    if 'value_type' in [column['name'] for column in sa.inspect(conn).get_columns('options')]:
+        query = query.where(sa.or_(options.c.value_type.is_(None), options.c.value_type == 'int'))
+    counters = [dict(option_id=row.id, counter=int(row.value)) for row in conn.execute(query)
+                if _INTEGER_STRING.fullmatch(row.value)]
+    if counters:
+        conn.execute(sa.update(options).where(options.c.id == sa.bindparam('option_id')).
+                     values(counter=sa.bindparam('counter')), counters)
+
+
+def _migration_1(conn):
+    _add_column(conn, 'options', 'counter')
+    _backfill_counters(conn)
+
+
+def _migration_2(conn):
+    _add_column(conn, 'options', 'value_type')
+    _add_column(conn, 'parameters', 'value_type')
+
+
+def _migration_3(conn):
+    _create_index(conn, 'dataproducts', 'ix_dataproducts_dpowner_id_subtype_data_type')
+    _create_index(conn, 'jobs', 'ix_jobs_task_id_state')
+
+
+def _migration_4(conn):
+    Base.metadata.tables['barriers'].create(bind=conn, checkfirst=True)
+
+
+def _migration_5(conn):
+    Base.metadata.tables['memos'].create(bind=conn, checkfirst=True)
+
+
+def _migration_6(conn):
+    _add_column(conn, 'jobs', 'heartbeat')
+    _create_index(conn, 'jobs', 'ix_jobs_state_heartbeat')
+
+
+def _migration_7(conn):
+    Base.metadata.tables['job_metrics'].create(bind=conn, checkfirst=True)
+
+
+MIGRATIONS = [(1, "options.counter column for atomic increments", _migration_1),
+              (2, "options.value_type and parameters.value_type columns", _migration_2),
+              (3, "dataproducts and jobs composite indexes", _migration_3),
+              (4, "barriers table", _migration_4),
+              (5, "memos table", _migration_5),
+              (6, "jobs.heartbeat column and index", _migration_6),
+              (7, "job_metrics table", _migration_7)]
+"""
+list of tuples: version number, description and step function of each
+migration, in order of application.
+"""
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+"""
+int: version of the database schema this wpipe version uses.
+"""
+
+
+def _applied_versions(conn):
+    return set(conn.execute(sa.select(SchemaVersion.id)).scalars())
+
+
+def migrate():
+    """
+    Upgrades the database schema in place by applying the pending migrations.
+
+    Returns
+    -------
+    applied : list of int
+        Version numbers of the migrations applied by this call.
+    """
+    engine = get_engine(check_schema=False)
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        applied_versions = _applied_versions(conn)
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version not in applied_versions:
+            with engine.begin() as conn:
+                step(conn)
+                conn.execute(sa.insert(SchemaVersion).values(id=version, description=description,
+                                                             timestamp=datetime.datetime.utcnow()))
+            applied.append(version)
+    return applied
+
+
+def create_schema():
+    """
+    Creates the wpipe database and its tables if they do not exist yet, and
+    upgrades the schema of an existing database.
+    """
+    if SERVER_URL is not None:
+        server_engine = make_engine(SERVER_URL)
+        with server_engine.connect() as conn:
+            conn.execute(text("CREATE DATABASE IF NOT EXISTS wpipe"))
+        server_engine.dispose()
+    for version in migrate():
+        print("Applied schema migration %d" % version)
+
+
+def verify_schema(engine):
+    """
+    Raises a RuntimeError if the database schema is missing or outdated.
+
+    Parameters
+    ----------
+    engine : sqlalchemy.engine.base.Engine object
+        Engine handling the connection to the database.
+    """
+    missing = set(Base.metadata.tables) - set(sa.inspect(engine).get_table_names())
+    if missing:
+        raise RuntimeError("Database schema is missing tables %s: run 'wingspipe init' first, "
+                           "or 'wingspipe migrate' to upgrade an existing database" % sorted(missing))
+    with engine.connect() as conn:
+        applied_versions = _applied_versions(conn)
+    pending = [version for version, _, _ in MIGRATIONS if version not in applied_versions]
+    if pending:
+        raise RuntimeError("Database schema is missing migrations %s: run 'wingspipe migrate' first"
+                           % pending)
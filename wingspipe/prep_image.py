@@ -29,22 +29,24 @@ def prep_images(config):
     target = config.target
     targ = target.name
     print("TARGET NAME: ", targ, "\n")
-    comp_name = 'completed' + targ
-    options = {comp_name: 0}
-    my_job.options = options
+    # fires images_prepped once all images went through prep_image
+    done_event = my_job.child_event('images_prepped', tag=targ,
+                                    options={'target_id': target.target_id, 'detname': targ,
+                                             'submission_type': 'scheduler'})
+    my_barrier = my_job.barrier('completed' + targ, len(imagedp), done_event)
     for dp_id in imagedp.dp_id:
         print("DP_ID ", str(dp_id), " sent\n")
         my_job.logprint(''.join(["DP_ID ", str(dp_id), " sent\n"]))
-        send(dp_id, config, comp_name, len(imagedp), my_job)  # send catalog to next step
+        send(dp_id, config, my_barrier, len(imagedp), my_job)  # send catalog to next step
     return
 
 
-def send(dpid, conf, comp_name, total, job):
+def send(dpid, conf, barrier, total, job):
     dp = wp.DataProduct(int(dpid))
     target_id = conf.target_id
     filepath = dp.relativepath + '/' + dp.filename
     event = job.child_event('stips_done', tag=dpid,
-                            options={'dp_id': dpid, 'target_id': target_id, 'to_run': total, 'name': comp_name})
+                            options={'dp_id': dpid, 'target_id': target_id, 'barrier_id': barrier.barrier_id})
     job.logprint(''.join(["Firing stips_done for ", str(filepath), " one of ", str(total), "\n"]))
     event.fire()
     return
@@ -153,57 +155,14 @@ if __name__ == '__main__':
         imagepath = this_dp.relativepath + '/' + this_dp.filename
         needcheck = prep_image(imagepath, filtername, this_config, this_job, this_dp_id)
         this_job.logprint(''.join(["Needcheck ", str(needcheck), "\n"]))
-        parent_job_id = this_event.parent_job_id
-        parent_job = this_event.parent_job
-        compname = this_event.options['name']
-        this_job.logprint(''.join(["Compname is ", str(compname), "\n"]))
-        #########
-        # wp.si.session.execute('LOCK TABLES options WRITE, optowners WRITE, jobs WRITE')
-        # update_option = parent_job.options[compname]
-        # update_option = update_option + 1
-        # parent_job.options[compname] = update_option
-        # wp.si.session.execute('UNLOCK TABLES')
-        ######
-        update_option = parent_job.options[compname]
+        this_barrier = wp.Barrier(int(this_event.options['barrier_id']))
         if (needcheck == 1):
-            update_option += 1
+            fired = this_barrier.arrive()
         else:
-            #update_option += 1
+            # the image was prepped by an earlier attempt, which already arrived
+            fired = False
             this_job.logprint(''.join(["Needcheck not 1", str(needcheck), "\n"]))
-        ######
-        to_run = this_event.options['to_run']
-        catalogID = this_event.options['dp_id']
-        catalogDP = wp.DataProduct(catalogID)
-        this_conf = catalogDP.config
-        this_job.logprint(''.join(["Completed ", str(update_option), " of ", str(to_run), "\n"]))
-        if update_option == to_run:
-            '''
-            this_job.logprint(''.join(["Detnames =",detnames1,"\n"]))
-            for i in range(numdet):
-                try: 
-                    detname = this_event.options['detname'] 
-                except:
-                    detname = this_target.name
-                print(detname)
-         
-                new_event = this_job.child_event('images_prepped', tag=detname, options={'target_id': tid,'detname': detname,'submission_type': 'scheduler'})
-                this_job.logprint('about to fire')
-                new_event.fire()
-                this_job.logprint('fired')
-                this_job.logprint('images_prepped\n')
-                this_job.logprint(''.join(["Event= ", str(new_event.event_id),"\n",detname,"\n","images_prepped\n"]))
-                time.sleep(1)
-            '''
-            try:
-                detname = this_event.options['detname']
-            except:
-                detname = this_target.name
-                my_job.logprint(''.join(["FAILED TEST event detname is ", str(detname)]))
-            new_event = this_job.child_event('images_prepped', tag=detname, options={'target_id': tid,'detname': detname,'submission_type': 'scheduler'})
-            this_job.logprint('about to fire')
-            this_job.logprint(''.join(["event detname is ", str(detname)]))
-            new_event.fire()
-            this_job.logprint('fired')
-            this_job.logprint('images_prepped\n')
-            this_job.logprint(''.join(["Event= ", str(new_event.event_id),"\n",detname,"\n","images_prepped\n"]))
-
+        this_job.logprint(''.join(["Completed ", str(this_barrier.arrived), " of ", str(this_barrier.expected), "\n"]))
+        if fired:
+            this_job.logprint(''.join(["Event= ", str(this_barrier.event_id), "\n", this_barrier.event.tag, "\n",
+                                       "images_prepped\n"]))
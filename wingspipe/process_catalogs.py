@@ -57,6 +57,7 @@ def process_fixed_catalog(my_job_id, my_dp_id, racent, deccent, detname):
             stipsfilepath = my_config.procpath + '/' + stips_cat
             dpid = _dp.dp_id
             dithnum = 0
+            dithers = []
             for k in range(int(ra_dithers)):
                 ra_dither = float(dither_size) * np.cos(float(centdec) * 3.14159 / 180.0) * int(k)
                 for j in range(int(dec_dithers)):
@@ -66,20 +67,27 @@ def process_fixed_catalog(my_job_id, my_dp_id, racent, deccent, detname):
                     dithfilepath = stipsfilepath.replace(''.join(['_', str(filtroot)]),
                                                          ''.join(['_', str(dithnum), '_', str(filtroot)]))
                     print("DITHFILE ", dithfilepath)
-                    subprocess.run(['ln', '-s', stipsfilepath, dithfilepath], stdout=subprocess.PIPE)
+                    if not os.path.lexists(dithfilepath):
+                        os.symlink(stipsfilepath, dithfilepath)
                     dithfilename = dithfilepath.split('/')[-1]
-                    _dp = my_config.dataproduct(filename=dithfilename, relativepath=my_config.procpath, group='raw')
-                    newdpid = _dp.dp_id
-                    eventtag = filtname+'_ra:'+str(k)+'/'+str(ra_dithers)+'_dec:'+str(j)+'/'+str(dec_dithers)
-                    #new_event = my_job.child_event('new_stips_catalog', tag=eventtag,
-                    #                               options={'dp_id': newdpid, 'to_run': total, 'name': comp_name,'submission_type' : 'pbs',
-                    #                                        'ra_dither': ra_dither, 'dec_dither': dec_dither, 'detname': detname})
-                    new_event = my_job.child_event('new_stips_catalog', tag=eventtag,
-                                                   options={'dp_id': newdpid, 'to_run': total, 'name': comp_name,
-                                                            'ra_dither': ra_dither, 'dec_dither': dec_dither, 'detname': detname})
+                    dithers.append((k, j, ra_dither, dec_dither, dithfilename))
                     dithnum += 1
-                    my_job.logprint(''.join(["Firing event ", str(new_event.event_id), "  new_stips_catalog"]))
-                    new_event.fire()
+            dith_dps = my_config.dataproducts_bulk([dict(filename=dither[-1], relativepath=my_config.procpath,
+                                                         group='raw') for dither in dithers])
+            specs = []
+            for (k, j, ra_dither, dec_dither, dithfilename), _dp in zip(dithers, dith_dps):
+                newdpid = _dp.dp_id
+                eventtag = filtname+'_ra:'+str(k)+'/'+str(ra_dithers)+'_dec:'+str(j)+'/'+str(dec_dithers)
+                #new_event = my_job.child_event('new_stips_catalog', tag=eventtag,
+                #                               options={'dp_id': newdpid, 'to_run': total, 'name': comp_name,'submission_type' : 'pbs',
+                #                                        'ra_dither': ra_dither, 'dec_dither': dec_dither, 'detname': detname})
+                specs.append(dict(name='new_stips_catalog', tag=eventtag,
+                                  options={'dp_id': newdpid, 'to_run': total, 'name': comp_name,
+                                           'ra_dither': ra_dither, 'dec_dither': dec_dither, 'detname': detname}))
+            new_events = my_job.child_events_bulk(specs)
+            for new_event in new_events:
+                my_job.logprint(''.join(["Firing event ", str(new_event.event_id), "  new_stips_catalog"]))
+            wp.Event.fire_many(new_events)
             i += 1
         my_job.logprint("Dither Success")
         print("Dither Success process")
@@ -121,11 +121,12 @@ if __name__ == '__main__':
         DP = wp.DataProduct(this_dp_id)
         tid = DP.target_id
         path = this_conf.procpath
-        #comp_name = 'completed' + this_target.name
-        comp_name = 'completed' + detname
-        options = {comp_name: 0}
-        this_job.options = options
         total = to_run
+        # fires images_prepped once all images of the detector went through prep_image
+        done_event = this_job.child_event('images_prepped', tag=detname,
+                                          options={'target_id': tid, 'detname': detname,
+                                                   'submission_type': 'scheduler'})
+        my_barrier = this_job.barrier('completed' + detname, total, done_event)
         #total = len(image_dps)
         # print(image_dps(0))
         for dps in image_dps:
@@ -135,7 +136,7 @@ if __name__ == '__main__':
             this_job.logprint(''.join(["ID and subtype ", str(dpid), " and ", str(st), "\n"]))
             new_event = this_job.child_event('stips_done', tag=dpid,
                                              options={'target_id': tid, 'dp_id': dpid, 'submission_type': 'scheduler',
-                                                      'name': comp_name, 'to_run': total, 'detname': detname})
+                                                      'barrier_id': my_barrier.barrier_id})
             this_job.logprint(''.join(["event detname is ", str(detname)]))
             new_event.fire()
             #this_job.logprint('stips_done but not firing any events for now\n')